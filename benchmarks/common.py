@@ -0,0 +1,68 @@
+"""
+Common helpers of the benchmarks, which run against a separate SQLite database set up through DATABASE_URL.
+"""
+import os
+import statistics
+import time
+from typing import Callable, Iterable
+
+
+def setup_django(database_path: str):
+    """
+    Points the settings to the benchmark database and sets up Django
+    :param database_path: Path of the SQLite database file
+    :return: None
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(database_path)}"
+    # Responses are measured without the query cache
+    os.environ["QUERY_CACHE_BACKEND"] = "none"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "server_app.settings")
+    import django
+    django.setup()
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+
+def insert_price_paid_rows(rows: Iterable[tuple], batch_size: int = 50000) -> int:
+    """
+    Inserts price paid rows to the house table with the raw batch writer of the importer, to set up large data quickly
+    :param rows: Price paid rows
+    :param batch_size: Count of rows in each batch
+    :return: Count of inserted rows
+    """
+    from django.db import connection
+    from server_app_api.house_importer import HouseBatchWriter, parse_house_fields
+    from server_app_api.models import HousePersistenceModel
+
+    writer: HouseBatchWriter = HouseBatchWriter(HousePersistenceModel, connection)
+    row_count: int = 0
+    batch: list[tuple] = []
+    for fields in rows:
+        batch.append(parse_house_fields(fields))
+        if len(batch) == batch_size:
+            writer.write(batch)
+            row_count = row_count + len(batch)
+            batch = []
+    writer.write(batch)
+    return row_count + len(batch)
+
+
+def measure(func: Callable, repeat: int) -> dict[str, float]:
+    """
+    Runs the function repeatedly and gives the latency statistics in milliseconds
+    :param func: Function to measure
+    :param repeat: Count of runs
+    :return: Latency statistics
+    """
+    latencies: list[float] = []
+    for _ in range(0, repeat):
+        start: float = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {"min_ms": latencies[0],
+            "mean_ms": statistics.fmean(latencies),
+            "p50_ms": latencies[int(0.5 * (len(latencies) - 1))],
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+            "p99_ms": latencies[int(0.99 * (len(latencies) - 1))],
+            "max_ms": latencies[-1]}
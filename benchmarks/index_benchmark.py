@@ -0,0 +1,120 @@
+"""
+Compares query plans and timings of the query services before and after the house indexes, on a synthetic SQLite
+database. Services which read the house table are measured, average prices are answered from the monthly rollups
+whichever house indexes there are. Usage:
+
+    python -m benchmarks.index_benchmark --rows 2000000 --database bench_index.sqlite3
+"""
+import argparse
+import json
+import os
+
+from benchmarks.common import setup_django, insert_price_paid_rows, measure
+from benchmarks.synthetic_data import generate_price_paid_rows
+
+
+def get_query_plans(client, url: str) -> list[dict[str, object]]:
+    """
+    Captures the queries run by the service of the url and explains them
+    :param client: Test client
+    :param url: Url of the service
+    :return: Queries with their plans
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        get_response(client, url)
+    plans: list[dict[str, object]] = []
+    for query in context.captured_queries:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+            plans.append({"sql": query["sql"], "plan": [row[-1] for row in cursor.fetchall()]})
+    return plans
+
+
+def set_house_indexes(enabled: bool):
+    """
+    Adds or removes the indexes of the house model
+    :param enabled: True to add the indexes, False to remove them
+    :return: None
+    """
+    from django.db import connection
+    from server_app_api.models import HousePersistenceModel
+
+    with connection.schema_editor() as schema_editor:
+        for index in HousePersistenceModel._meta.indexes:
+            if enabled:
+                schema_editor.add_index(HousePersistenceModel, index)
+            else:
+                schema_editor.remove_index(HousePersistenceModel, index)
+
+
+def get_response(client, url: str) -> bytes:
+    """
+    Requests the url, and reads the streaming responses to the end so that their queries are measured
+    :param client: Test client
+    :param url: Url of the service
+    :return: Response content
+    """
+    response = client.get(url)
+    return b"".join(response.streaming_content) if response.streaming else response.content
+
+
+def run_urls(urls: list[str], repeat: int) -> dict[str, dict]:
+    from django.test import Client
+
+    client: Client = Client()
+    return {url: {"timing": measure(lambda: get_response(client, url), repeat),
+                  "queries": get_query_plans(client, url)} for url in urls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000000, help="Count of synthetic rows")
+    parser.add_argument("--database", default="bench_index.sqlite3", help="SQLite database file to create")
+    parser.add_argument("--repeat", type=int, default=5, help="Count of runs for each url")
+    parser.add_argument("--output", default="", help="JSON file to write results, prints them if not given")
+    args = parser.parse_args()
+
+    if os.path.exists(args.database):
+        os.remove(args.database)
+    setup_django(args.database)
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    set_house_indexes(False)
+    print("Inserted rows:", insert_price_paid_rows(generate_price_paid_rows(args.rows)))
+    call_command("monthly_rollups", "rebuild", verbosity=0)
+
+    from datetime import datetime, timezone
+    from server_app_api.models import MonthlyRollupPersistenceModel, get_postal_district
+    # Postal code with the most transactions of the measured month, so that the house table is read for it
+    postal_code: str = MonthlyRollupPersistenceModel.objects.filter(
+        month_year_date=datetime(2008, 6, 1, tzinfo=timezone.utc)).order_by("-transaction_count").values_list(
+        "postal_code", flat=True).first()
+    district: str = get_postal_district(postal_code)
+    postal_code = postal_code.replace(" ", "_")
+    urls: list[str] = ["/api/transaction/10/2008_06",
+                       f"/api/transaction/10/2008_06/{postal_code}",
+                       f"/api/transaction/10/2008_06/district/{district}",
+                       f"/api/transaction/10/2008_01/2008_12/{postal_code}",
+                       f"/api/transactions/export/ndjson/2005_01/2010_12/{postal_code}"]
+
+    results: dict[str, dict] = {"rows": args.rows, "before": run_urls(urls, args.repeat)}
+    set_house_indexes(True)
+    results["after"] = run_urls(urls, args.repeat)
+
+    output: str = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+    for url in urls:
+        print(f"{url}: p50 {results['before'][url]['timing']['p50_ms']:.1f} ms -> "
+              f"{results['after'][url]['timing']['p50_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
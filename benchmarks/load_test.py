@@ -0,0 +1,86 @@
+"""
+Measures throughput and latency of the query services under concurrent clients, against a running server. Sync and
+async variants of the services are compared by running the same queries on both url prefixes. Usage:
+
+    gunicorn server_app.asgi:application -k uvicorn.workers.UvicornWorker -w 2
+    python -m benchmarks.load_test --base-url http://127.0.0.1:8000 --clients 32 --requests 2000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUERIES: tuple[str, ...] = ("avgprice/2005_01/2010_12", "avgprice/1995_01/2021_12", "transaction/10/2008_06",
+                                    "transaction/50/2015_03")
+VARIANT_PREFIXES: dict[str, str] = {"sync": "/api/", "async": "/api/async/"}
+
+
+def request(url: str) -> tuple[float, bool]:
+    """
+    Requests the url
+    :param url: Url
+    :return: Latency in milliseconds and success status
+    """
+    start: float = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=120) as response:
+            response.read()
+            success: bool = response.status == 200
+    except (urllib.error.URLError, TimeoutError):
+        success = False
+    return (time.perf_counter() - start) * 1000, success
+
+
+def run_load(urls: list[str], client_count: int, request_count: int, seed: int) -> dict[str, float]:
+    """
+    Requests randomly chosen urls from concurrent clients
+    :param urls: Urls to request
+    :param client_count: Count of concurrent clients
+    :param request_count: Total count of requests
+    :param seed: Random seed for choosing the urls
+    :return: Throughput and latency statistics
+    """
+    rnd: random.Random = random.Random(seed)
+    chosen_urls: list[str] = [rnd.choice(urls) for _ in range(0, request_count)]
+    start: float = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=client_count) as executor:
+        results: list[tuple[float, bool]] = list(executor.map(request, chosen_urls))
+    elapsed_time: float = time.perf_counter() - start
+    latencies: list[float] = sorted(latency for latency, _ in results)
+    return {"requests_per_sec": request_count / elapsed_time,
+            "errors": sum(1 for _, success in results if not success),
+            "mean_ms": statistics.fmean(latencies),
+            "p50_ms": latencies[int(0.5 * (len(latencies) - 1))],
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+            "p99_ms": latencies[int(0.99 * (len(latencies) - 1))]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Url of the running server")
+    parser.add_argument("--clients", type=int, default=32, help="Count of concurrent clients")
+    parser.add_argument("--requests", type=int, default=2000, help="Count of requests for each variant")
+    parser.add_argument("--query", action="append", default=[],
+                        help="Query path after /api/, can be given multiple times")
+    parser.add_argument("--output", default="", help="JSON file to write results")
+    args = parser.parse_args()
+
+    queries: list[str] = args.query or list(DEFAULT_QUERIES)
+    results: dict[str, dict[str, float]] = {}
+    for variant, prefix in VARIANT_PREFIXES.items():
+        results[variant] = run_load([f"{args.base_url}{prefix}{query}" for query in queries], args.clients,
+                                    args.requests, seed=1)
+        print(f"{variant}: {results[variant]['requests_per_sec']:.1f} req/s, p50 {results[variant]['p50_ms']:.1f} ms, "
+              f"p99 {results[variant]['p99_ms']:.1f} ms, errors {results[variant]['errors']}")
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump({"clients": args.clients, "requests": args.requests, "queries": queries, "results": results},
+                      output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
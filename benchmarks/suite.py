@@ -0,0 +1,257 @@
+"""
+Benchmark suite of the importer and the services. For each row count, a deterministic synthetic price paid CSV is
+generated, imported into a new SQLite database with the importer, then latency percentiles are measured for every
+url pattern of server_app/urls.py. Results are written as JSON, and compared with the results of a previous run
+when a baseline is given. Usage:
+
+    python -m benchmarks.suite --rows 100000 --rows 1000000 --rows 10000000 --output bench_results.json
+    python -m benchmarks.suite --rows 100000 --output new.json --baseline bench_results.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Optional
+
+from benchmarks.common import setup_django, measure
+from benchmarks.synthetic_data import write_price_paid_csv
+
+DEFAULT_ROW_COUNTS: tuple[int, ...] = (100000, 1000000, 10000000)
+# Values of the url parameters, routes with other parameters fail the suite so that new routes are not missed
+SAMPLE_VALUES: dict[str, tuple[str, ...]] = {
+    "start_date": ("2005_01",),
+    "end_date": ("2010_12",),
+    "date": ("2008_06",),
+    "bin_count": ("10",),
+    "area_level": ("district", "prefix", "town", "county"),
+    "export_format": ("ndjson", "csv"),
+}
+# Exports are measured on a single month, they return the raw rows
+ROUTE_SAMPLE_VALUES: dict[str, dict[str, tuple[str, ...]]] = {
+    "api/transactions/export/": {"start_date": ("2008_06",), "end_date": ("2008_06",)},
+}
+POST_ROUTES: tuple[str, ...] = ("api/batch",)
+ROUTE_PARAMETER_PATTERN: re.Pattern = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+def get_api_routes() -> list[str]:
+    """
+    Gets the routes of the services from the url configuration
+    :return: Routes, without the admin routes
+    """
+    from django.urls import get_resolver
+
+    return [str(url_pattern.pattern) for url_pattern in get_resolver().url_patterns
+            if str(url_pattern.pattern).startswith("api/")]
+
+
+def get_sample_urls(route: str, postal_code: str, area_names: dict[str, str]) -> list[str]:
+    """
+    Fills the parameters of the route with each combination of the sample values
+    :param route: Route of the url pattern
+    :param postal_code: Postal code to query, its district and prefix are used for the area routes
+    :param area_names: Names of the geographic areas of the postal code's houses, keyed by area level
+    :return: Urls
+    """
+    sample_values: dict[str, tuple[str, ...]] = dict(SAMPLE_VALUES)
+    for route_prefix, route_values in ROUTE_SAMPLE_VALUES.items():
+        if route.startswith(route_prefix):
+            sample_values.update(route_values)
+    parameters: list[str] = ROUTE_PARAMETER_PATTERN.findall(route)
+    # Postal code parameter follows the area level when both are given
+    value_lists: list[tuple[str, ...]] = [("",) if parameter == "postal_code" else sample_values[parameter]
+                                          for parameter in parameters]
+    area_codes: dict[str, str] = {"": postal_code.replace(" ", "_"), "district": postal_code.split(" ")[0],
+                                  "prefix": postal_code[:2],
+                                  **{area_level: name.replace(" ", "_") for area_level, name in area_names.items()}}
+    urls: list[str] = []
+    for values in itertools.product(*value_lists):
+        url_values: dict[str, str] = dict(zip(parameters, values))
+        if "postal_code" in url_values:
+            url_values["postal_code"] = area_codes[url_values.get("area_level", "")]
+        urls.append("/" + ROUTE_PARAMETER_PATTERN.sub(lambda match: url_values[match.group(1)], route))
+    return urls
+
+
+def get_batch_body(postal_codes: list[str]) -> dict[str, list[dict]]:
+    """
+    Gets a batch query body with average price and transaction queries of the postal codes
+    :param postal_codes: Postal codes
+    :return: Batch query body
+    """
+    queries: list[dict] = []
+    for postal_code in [""] + postal_codes:
+        queries.append({"type": "avgprice", "start_date": SAMPLE_VALUES["start_date"][0],
+                        "end_date": SAMPLE_VALUES["end_date"][0], "postal_code": postal_code})
+        queries.append({"type": "transaction", "bin_count": int(SAMPLE_VALUES["bin_count"][0]),
+                        "date": SAMPLE_VALUES["date"][0], "postal_code": postal_code})
+    return {"queries": queries}
+
+
+def benchmark_import(source: str, batch_size: int, worker_count: int) -> dict[str, float]:
+    """
+    Imports the CSV file with the importer, and measures the throughput of writing the rows and the duration of the
+    rollup rebuild after them
+    :param source: Path of the CSV file
+    :param batch_size: Count of lines in each batch
+    :param worker_count: Count of parser processes
+    :return: Import statistics
+    """
+    from server_app_api.house_importer import import_houses
+
+    write_end_time: list[float] = [0.0]
+
+    def log(message: str):
+        if message.startswith("Imported rows"):
+            write_end_time[0] = time.perf_counter()
+
+    start_time: float = time.perf_counter()
+    row_count: int = import_houses(source, batch_size, worker_count, log=log)
+    end_time: float = time.perf_counter()
+    write_seconds: float = write_end_time[0] - start_time
+    return {"rows": row_count,
+            "total_seconds": end_time - start_time,
+            "write_seconds": write_seconds,
+            "write_rows_per_sec": row_count / write_seconds if write_seconds else 0.0,
+            "rollup_seconds": end_time - write_end_time[0]}
+
+
+def benchmark_urls(repeat: int) -> dict[str, dict[str, float]]:
+    """
+    Measures the latencies of the sample urls of every route
+    :param repeat: Count of requests for each url
+    :return: Latency statistics of each url
+    """
+    from django.db.models import Count
+    from django.test import Client
+    from server_app_api.models import HousePersistenceModel, GEOGRAPHIC_AREA_FIELDS
+
+    # Most sold postal codes, which have the most rows to aggregate
+    postal_codes: list[str] = list(HousePersistenceModel.objects.values("postal_code").annotate(
+        count=Count("pk")).order_by("-count").values_list("postal_code", flat=True)[:10])
+    house: HousePersistenceModel = HousePersistenceModel.objects.filter(postal_code=postal_codes[0]).first()
+    area_names: dict[str, str] = {area_level: getattr(house, address_field)
+                                  for area_level, (address_field, _) in GEOGRAPHIC_AREA_FIELDS.items()}
+    client: Client = Client()
+    results: dict[str, dict[str, float]] = {}
+    for route in get_api_routes():
+        for url in get_sample_urls(route, postal_codes[0], area_names):
+            if route in POST_ROUTES:
+                body: str = json.dumps(get_batch_body(postal_codes))
+                response = client.post(url, body, content_type="application/json")
+                results[f"POST {url}"] = measure(
+                    lambda: client.post(url, body, content_type="application/json"), repeat)
+            else:
+                response = client.get(url)
+                # Streaming responses are read fully, as the clients do
+                results[url] = measure(lambda: b"".join(client.get(url)), repeat)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} responded with status {response.status_code}")
+    return results
+
+
+def run_row_count(row_count: int, args: argparse.Namespace) -> dict[str, Any]:
+    """
+    Runs the benchmarks of a row count, in a process of its own so that each row count has its own database
+    :param row_count: Count of synthetic rows
+    :param args: Command line arguments
+    :return: Import and latency results
+    """
+    csv_path: str = os.path.join(args.work_dir, f"price_paid_{row_count}_{args.seed}.csv")
+    if not os.path.exists(csv_path):
+        write_price_paid_csv(csv_path + ".tmp", row_count, args.seed)
+        os.replace(csv_path + ".tmp", csv_path)
+    database_path: str = os.path.join(args.work_dir, f"bench_{row_count}.sqlite3")
+    if os.path.exists(database_path):
+        os.remove(database_path)
+    os.environ["QUERY_ENGINE"] = args.engine
+    setup_django(database_path)
+    from django.core.management import call_command
+
+    call_command("migrate", verbosity=0)
+    return {"import": benchmark_import(csv_path, args.batch_size, args.workers), "urls": benchmark_urls(args.repeat)}
+
+
+def compare_results(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """
+    Compares the median latencies and import throughput with the baseline results
+    :param results: Results of this run
+    :param baseline: Results of a previous run
+    :param threshold: Ratio of slow down that is reported as a regression
+    :return: Descriptions of the regressions
+    """
+    regressions: list[str] = []
+    for row_count, row_count_results in results["row_counts"].items():
+        baseline_results: Optional[dict] = baseline["row_counts"].get(row_count)
+        if baseline_results is None:
+            continue
+        import_ratio: float = baseline_results["import"]["write_rows_per_sec"] / \
+            max(row_count_results["import"]["write_rows_per_sec"], 1e-9)
+        if import_ratio > threshold:
+            regressions.append(f"{row_count} rows: import is {import_ratio:.2f}x slower")
+        for url, timing in row_count_results["urls"].items():
+            baseline_timing: Optional[dict] = baseline_results["urls"].get(url)
+            if baseline_timing is not None and timing["p50_ms"] > baseline_timing["p50_ms"] * threshold:
+                regressions.append(f"{row_count} rows: {url} p50 {baseline_timing['p50_ms']:.1f} ms -> "
+                                   f"{timing['p50_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, action="append", default=[],
+                        help="Count of synthetic rows, can be given multiple times, default 100k, 1M and 10M")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic data")
+    parser.add_argument("--work-dir", default="bench_data", help="Directory of the generated CSV and database files")
+    parser.add_argument("--repeat", type=int, default=20, help="Count of requests for each url")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Batch size of the importer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes of the importer")
+    parser.add_argument("--engine", default="orm", choices=["orm", "columnar"], help="Query engine of the services")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file to write results")
+    parser.add_argument("--baseline", default="", help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slow down ratio reported as a regression")
+    parser.add_argument("--row-count-output", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    if args.row_count_output:
+        with open(args.row_count_output, "w") as output_file:
+            json.dump(run_row_count(args.rows[0], args), output_file)
+        return
+
+    results: dict[str, Any] = {"seed": args.seed, "engine": args.engine, "repeat": args.repeat,
+                               "python": platform.python_version(), "platform": platform.platform(),
+                               "row_counts": {}}
+    for row_count in args.rows or DEFAULT_ROW_COUNTS:
+        row_count_output: str = os.path.join(args.work_dir, f"results_{row_count}.json")
+        subprocess.run([sys.executable, "-m", "benchmarks.suite", "--rows", str(row_count), "--seed", str(args.seed),
+                        "--work-dir", args.work_dir, "--repeat", str(args.repeat), "--batch-size", str(args.batch_size),
+                        "--workers", str(args.workers), "--engine", args.engine,
+                        "--row-count-output", row_count_output], check=True)
+        with open(row_count_output) as row_count_file:
+            results["row_counts"][str(row_count)] = json.load(row_count_file)
+        import_results: dict[str, float] = results["row_counts"][str(row_count)]["import"]
+        print(f"{row_count} rows: import {import_results['write_rows_per_sec']:.0f} rows/s, "
+              f"rollups {import_results['rollup_seconds']:.1f} s")
+        for url, timing in results["row_counts"][str(row_count)]["urls"].items():
+            print(f"  {url}: p50 {timing['p50_ms']:.1f} ms, p95 {timing['p95_ms']:.1f} ms, "
+                  f"p99 {timing['p99_ms']:.1f} ms")
+
+    with open(args.output, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions: list[str] = compare_results(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
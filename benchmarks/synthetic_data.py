@@ -0,0 +1,88 @@
+"""
+Deterministic synthetic price paid data generator, rows are produced in the column order of the Land Registry
+price paid files, so they can be written as CSV or inserted to the house table directly.
+"""
+import csv
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterator
+
+HOUSE_TYPE_WEIGHTS: tuple[tuple[str, float], ...] = (("F", 0.45), ("T", 0.3), ("S", 0.15), ("D", 0.1))
+DISTRICTS: tuple[str, ...] = ("E1", "E14", "N1", "N7", "NW1", "NW3", "SE1", "SE10", "SW1A", "SW3", "SW11", "W1",
+                              "W2", "W11", "WC1", "WC2", "EC1", "EC2", "CR0", "BR1", "HA0", "IG1", "KT1", "TW1")
+TOWNS: tuple[str, ...] = ("LONDON", "CROYDON", "BROMLEY", "WEMBLEY", "ILFORD", "KINGSTON UPON THAMES", "TWICKENHAM")
+COUNTIES: tuple[str, ...] = ("GREATER LONDON", "CITY OF LONDON")
+
+
+def generate_postal_codes(count: int, rnd: random.Random) -> list[str]:
+    """
+    Generates distinct postal codes spread over the London districts
+    :param count: Count of postal codes
+    :param rnd: Random generator
+    :return: Postal codes
+    """
+    postal_codes: set[str] = set()
+    while len(postal_codes) < count:
+        postal_codes.add(f"{rnd.choice(DISTRICTS)} {rnd.randint(1, 9)}{rnd.choice('ABDEFGHJLNPQRSTUWXYZ')}"
+                         f"{rnd.choice('ABDEFGHJLNPQRSTUWXYZ')}")
+    return sorted(postal_codes)
+
+
+def generate_price_paid_rows(row_count: int, seed: int = 42, postal_code_count: int = 20000,
+                             start_date: datetime = datetime(1995, 1, 1), month_count: int = 324) -> \
+        Iterator[tuple]:
+    """
+    Generates price paid rows. Postal codes follow a Zipf like distribution, so a few postal codes have most of the
+    transactions, and prices follow a log normal distribution with a long tail of expensive sales.
+    :param row_count: Count of rows to generate
+    :param seed: Random seed, same seed always generates same rows
+    :param postal_code_count: Count of distinct postal codes
+    :param start_date: Date of the first month
+    :param month_count: Count of months that the sell dates are spread on
+    :return: Iterator of price paid rows
+    """
+    rnd: random.Random = random.Random(seed)
+    postal_codes: list[str] = generate_postal_codes(postal_code_count, rnd)
+    postal_code_weights: list[float] = [1 / (rank + 1) for rank in range(0, postal_code_count)]
+    house_types: list[str] = [house_type for house_type, _ in HOUSE_TYPE_WEIGHTS]
+    house_type_weights: list[float] = [weight for _, weight in HOUSE_TYPE_WEIGHTS]
+    day_count: int = month_count * 30
+
+    batch_size: int = 10000
+    for batch_start in range(0, row_count, batch_size):
+        size: int = min(batch_size, row_count - batch_start)
+        batch_postal_codes: list[str] = rnd.choices(postal_codes, weights=postal_code_weights, k=size)
+        batch_house_types: list[str] = rnd.choices(house_types, weights=house_type_weights, k=size)
+        for postal_code, house_type in zip(batch_postal_codes, batch_house_types):
+            sell_date: datetime = start_date + timedelta(days=rnd.randrange(0, day_count))
+            yield ("{" + str(uuid.UUID(int=rnd.getrandbits(128), version=4)).upper() + "}",
+                   str(max(int(rnd.lognormvariate(12.6, 0.7)), 1000)),
+                   sell_date.strftime("%Y-%m-%d 00:00"),
+                   postal_code,
+                   house_type,
+                   rnd.choice("NY"),
+                   rnd.choice("FL"),
+                   str(rnd.randint(1, 300)),
+                   "" if rnd.random() < 0.7 else f"FLAT {rnd.randint(1, 40)}",
+                   f"STREET {rnd.randint(1, 500)}",
+                   "",
+                   rnd.choice(TOWNS),
+                   rnd.choice(TOWNS),
+                   rnd.choice(COUNTIES),
+                   "A",
+                   "A")
+
+
+def write_price_paid_csv(path: str, row_count: int, seed: int = 42) -> int:
+    """
+    Writes generated price paid rows as a CSV file quoted like the Land Registry files
+    :param path: Path of the CSV file
+    :param row_count: Count of rows to generate
+    :param seed: Random seed, same seed always writes same file
+    :return: Count of written rows
+    """
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file, quoting=csv.QUOTE_ALL, lineterminator="\n")
+        writer.writerows(generate_price_paid_rows(row_count, seed))
+    return row_count
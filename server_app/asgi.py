@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'server_app.settings')
 
 application = get_asgi_application()
+
+# Columnar house data of the columnar query engine is loaded before the worker serves requests
+from server_app_api.columnar import get_columnar_house_data  # noqa: E402
+
+get_columnar_house_data()
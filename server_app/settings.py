@@ -14,6 +14,8 @@ from pathlib import Path
 
 import dj_database_url
 
+from server_app_api.routers import get_database_settings, REPLICA_ALIAS_PREFIX
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'server_app_api.metrics.MetricsMiddleware',
+    'server_app_api.routers.ReadReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,10 +82,64 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+# DATABASE_POOL is "native" for the connection pool of psycopg 3 on Django 5.1+, or "pgbouncer" when connecting through
+# PgBouncer in transaction pooling mode, PostgreSQL connections are kept open for reuse without them
+DATABASE_POOL = os.environ.get('DATABASE_POOL', '')
+db_from_env = dj_database_url.config(conn_max_age=600, conn_health_checks=True)
+DATABASES['default'].update(get_database_settings(db_from_env, DATABASE_POOL))
+
+# Comma separated urls of the read replicas, requests of the services read the house data from a random healthy
+# replica, and from the default database when no replica can be connected. Replicas which failed are retried after
+# READ_REPLICA_RETRY_INTERVAL seconds. Two SQLite files can stand in for the primary and the replica locally, by
+# copying the primary file to the replica after imports.
+for replica_idx, replica_url in enumerate(filter(None, os.environ.get('READ_REPLICA_URLS', '').split(','))):
+    DATABASES[f'{REPLICA_ALIAS_PREFIX}{replica_idx}'] = {
+        **get_database_settings(dj_database_url.parse(replica_url, conn_max_age=600, conn_health_checks=True),
+                                DATABASE_POOL),
+        # Tests read the replicas from the test database of the primary
+        'TEST': {'MIRROR': 'default'},
     }
+DATABASE_ROUTERS = ['server_app_api.routers.ReadReplicaRouter']
+READ_REPLICA_RETRY_INTERVAL = int(os.environ.get('READ_REPLICA_RETRY_INTERVAL', 30))
+
+# Cache of the query service results, which are invalidated by the data version stamp bumped by each import
+# BACKEND is "lru" for in-process cache, "django" for using the Django cache with DJANGO_CACHE_ALIAS, or "none"
+# Data versions are read once in VERSION_TTL seconds, so new imports are served after it by the other processes
+
+QUERY_CACHE = {
+    'BACKEND': os.environ.get('QUERY_CACHE_BACKEND', 'lru'),
+    'MAX_SIZE': int(os.environ.get('QUERY_CACHE_MAX_SIZE', 1024)),
+    'TTL': int(os.environ.get('QUERY_CACHE_TTL', 3600)),
+    'DJANGO_CACHE_ALIAS': os.environ.get('QUERY_CACHE_DJANGO_CACHE_ALIAS', 'default'),
+    'VERSION_TTL': float(os.environ.get('QUERY_CACHE_VERSION_TTL', 2)),
 }
-db_from_env = dj_database_url.config(conn_max_age=600)
-DATABASES['default'].update(db_from_env)
+
+# Engine of the query services, "orm" for SQL queries or "columnar" for in-memory NumPy columns of the house data,
+# which are reloaded when the data version changes, checked once in COLUMNAR_REFRESH_INTERVAL seconds.
+# When COLUMNAR_SNAPSHOT_DIR is given, importer exports the columns there, and workers map them to memory read-only.
+
+QUERY_ENGINE = os.environ.get('QUERY_ENGINE', 'orm')
+COLUMNAR_REFRESH_INTERVAL = int(os.environ.get('COLUMNAR_REFRESH_INTERVAL', 60))
+COLUMNAR_SNAPSHOT_DIR = os.environ.get('COLUMNAR_SNAPSHOT_DIR', '')
+
+# Size of the thread pool that async views run their concurrent queries on
+
+ASYNC_QUERY_WORKERS = int(os.environ.get('ASYNC_QUERY_WORKERS', 8))
+
+# Max count of queries in one batch query request
+
+BATCH_QUERY_LIMIT = int(os.environ.get('BATCH_QUERY_LIMIT', 100))
+
+# Histograms are given as nested arrays, set to give bins and counts as JSON encoded strings in the former format
+
+LEGACY_HISTOGRAM_FORMAT = os.environ.get('LEGACY_HISTOGRAM_FORMAT', '').lower() in ('1', 'true', 'yes')
+
+# Request metrics are served at /api/_metrics, set to add Server-Timing headers with db, serialize and total times
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -20,8 +20,19 @@ from django.urls import path, register_converter
 
 from server_app_api.views import (
     GetAveragePricesView,
-    NumberOfTransactionsView
+    NumberOfTransactionsView,
+    MonthlyTransactionsView,
+    AsyncGetAveragePricesView,
+    AsyncNumberOfTransactionsView,
+    BatchQueryView,
+    TransactionsExportView,
+    PriceQuantilesView,
+    CacheStatsView,
+    MetricsView,
+    NDJSON_EXPORT_FORMAT,
+    CSV_EXPORT_FORMAT
 )
+from server_app_api.models import POSTAL_DISTRICT_AREA, POSTAL_PREFIX_AREA, GEOGRAPHIC_AREA_LEVELS
 
 
 class DateConverter:
@@ -57,10 +68,95 @@ class PostalCodeConverter:
 
 register_converter(PostalCodeConverter, 'ppp_ppp')
 
+
+class AreaLevelConverter:
+    """
+    Area level converter, which takes "district" for the outward code such as "SW1A", or "prefix" for any
+    beginning of the postal codes such as "SW", or "town", "county", "locality" or "city" for the geographic areas of
+    the addresses.
+    """
+    regex: str = "|".join((POSTAL_DISTRICT_AREA, POSTAL_PREFIX_AREA, *GEOGRAPHIC_AREA_LEVELS))
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(AreaLevelConverter, "area")
+
+
+class AreaCodeConverter:
+    """
+    Area code converter, which takes a postal area code, or a geographic area name with underscores for spaces such
+    as "GREATER_LONDON", and converts underscores to spaces. Names may have the other characters of the addresses,
+    such as "STOKE-ON-TRENT".
+    """
+    regex: str = "[^/]+"
+
+    def to_python(self, value):
+        return value.replace("_", " ")
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(AreaCodeConverter, "area_code")
+
+
+class ExportFormatConverter:
+    """
+    Export format converter, which takes "ndjson" or "csv"
+    """
+    regex: str = f"{NDJSON_EXPORT_FORMAT}|{CSV_EXPORT_FORMAT}"
+
+    def to_python(self, value):
+        return value
+
+    def to_url(self, value):
+        return value
+
+
+register_converter(ExportFormatConverter, "export_format")
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>", GetAveragePricesView.as_view()),
     path("api/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<ppp_ppp:postal_code>", GetAveragePricesView.as_view()),
+    path("api/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<area:area_level>/<area_code:postal_code>",
+         GetAveragePricesView.as_view()),
     path("api/transaction/<int:bin_count>/<yyyy_mm:date>", NumberOfTransactionsView.as_view()),
+    # Periods are matched before the postal codes, which would also match dates
+    path("api/transaction/<int:bin_count>/<yyyy_mm:start_date>/<yyyy_mm:end_date>", MonthlyTransactionsView.as_view()),
+    path("api/transaction/<int:bin_count>/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<ppp_ppp:postal_code>",
+         MonthlyTransactionsView.as_view()),
+    path("api/transaction/<int:bin_count>/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<area:area_level>/"
+         "<area_code:postal_code>", MonthlyTransactionsView.as_view()),
     path("api/transaction/<int:bin_count>/<yyyy_mm:date>/<ppp_ppp:postal_code>", NumberOfTransactionsView.as_view()),
+    path("api/transaction/<int:bin_count>/<yyyy_mm:date>/<area:area_level>/<area_code:postal_code>",
+         NumberOfTransactionsView.as_view()),
+    path("api/quantiles/<yyyy_mm:start_date>/<yyyy_mm:end_date>", PriceQuantilesView.as_view()),
+    path("api/quantiles/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<ppp_ppp:postal_code>", PriceQuantilesView.as_view()),
+    path("api/quantiles/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<area:area_level>/<area_code:postal_code>",
+         PriceQuantilesView.as_view()),
+    path("api/async/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>", AsyncGetAveragePricesView.as_view()),
+    path("api/async/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<ppp_ppp:postal_code>",
+         AsyncGetAveragePricesView.as_view()),
+    path("api/async/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>/<area:area_level>/<area_code:postal_code>",
+         AsyncGetAveragePricesView.as_view()),
+    path("api/async/transaction/<int:bin_count>/<yyyy_mm:date>", AsyncNumberOfTransactionsView.as_view()),
+    path("api/async/transaction/<int:bin_count>/<yyyy_mm:date>/<ppp_ppp:postal_code>",
+         AsyncNumberOfTransactionsView.as_view()),
+    path("api/async/transaction/<int:bin_count>/<yyyy_mm:date>/<area:area_level>/<area_code:postal_code>",
+         AsyncNumberOfTransactionsView.as_view()),
+    path("api/transactions/export/<export_format:export_format>/<yyyy_mm:start_date>/<yyyy_mm:end_date>",
+         TransactionsExportView.as_view()),
+    path("api/transactions/export/<export_format:export_format>/<yyyy_mm:start_date>/<yyyy_mm:end_date>/"
+         "<ppp_ppp:postal_code>", TransactionsExportView.as_view()),
+    path("api/transactions/export/<export_format:export_format>/<yyyy_mm:start_date>/<yyyy_mm:end_date>/"
+         "<area:area_level>/<area_code:postal_code>", TransactionsExportView.as_view()),
+    path("api/batch", BatchQueryView.as_view()),
+    path("api/_cache", CacheStatsView.as_view()),
+    path("api/_metrics", MetricsView.as_view()),
 ]
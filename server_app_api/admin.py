@@ -1,7 +1,8 @@
 from django.contrib import admin
 
 # Register your models here.
-from server_app_api.models import HousePersistenceModel, AveragePriceBusinessModel
+from server_app_api.models import HousePersistenceModel, AveragePriceBusinessModel, MonthlyRollupPersistenceModel
 
 admin.site.register(HousePersistenceModel)
 admin.site.register(AveragePriceBusinessModel)
+admin.site.register(MonthlyRollupPersistenceModel)
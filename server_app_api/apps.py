@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ServerAppApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'server_app_api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,304 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import F, Model
+
+from .models import DataVersionPersistenceModel, POSTAL_CODE_AREA
+
+GLOBAL_DATA_SCOPE = ""
+POSTAL_CODE_DATA_SCOPE_PREFIX = "postcode:"
+ALL_POSTAL_CODES_DATA_SCOPE = POSTAL_CODE_DATA_SCOPE_PREFIX + "*"
+LRU_CACHE_BACKEND = "lru"
+DJANGO_CACHE_BACKEND = "django"
+NO_CACHE_BACKEND = "none"
+
+DEFAULT_QUERY_CACHE_SETTINGS: dict[str, Any] = {
+    "BACKEND": LRU_CACHE_BACKEND,
+    "MAX_SIZE": 1024,
+    "TTL": 3600,
+    "DJANGO_CACHE_ALIAS": "default",
+    "VERSION_TTL": 2.0,
+}
+# Memoized data versions are dropped when there are more scopes than this, the expired ones first
+VERSION_MEMO_MAX_SIZE: int = 4096
+
+CACHE_MISS = object()
+
+
+def get_postal_code_scope(postal_code: str, area_level: str = POSTAL_CODE_AREA) -> str:
+    """
+    Gets the data version scope of the queries of a postal code. Queries of wider postal areas share the scope of the
+    queries of all postal codes, which is bumped by every import.
+    :param postal_code: Postal code, empty string for the queries of all postal codes
+    :param area_level: Postal area level of the postal code
+    :return: Scope
+    """
+    if not postal_code or area_level != POSTAL_CODE_AREA:
+        return ALL_POSTAL_CODES_DATA_SCOPE
+    return POSTAL_CODE_DATA_SCOPE_PREFIX + postal_code
+
+
+def get_data_version(scope: str = GLOBAL_DATA_SCOPE) -> int:
+    """
+    Gets the current version of the imported data
+    :param scope: Scope of the version
+    :return: Data version, 0 if data is never imported
+    """
+    return get_data_versions((scope,))[0]
+
+
+def get_data_versions(scopes: tuple[str, ...]) -> tuple[int, ...]:
+    """
+    Gets the current versions of the imported data for multiple scopes with one query
+    :param scopes: Scopes of the versions
+    :return: Data versions in the order of scopes, 0 for the scopes that are never imported
+    """
+    versions: dict[str, int] = dict(DataVersionPersistenceModel.objects.filter(scope__in=scopes).values_list(
+        "scope", "version"))
+    return tuple(versions.get(scope, 0) for scope in scopes)
+
+
+def bump_data_version(data_version_model: type[Model] = DataVersionPersistenceModel,
+                      scope: str = GLOBAL_DATA_SCOPE) -> None:
+    """
+    Increments the version of the imported data, model is given as a parameter to be usable in migrations
+    :param data_version_model: Data version model class
+    :param scope: Scope of the version
+    :return: None
+    """
+    bump_data_versions({scope}, data_version_model)
+
+
+def bump_data_versions(scopes: set[str], data_version_model: type[Model] = DataVersionPersistenceModel) -> None:
+    """
+    Increments the versions of the imported data for the scopes changed by an incremental import
+    :param scopes: Scopes of the versions
+    :param data_version_model: Data version model class
+    :return: None
+    """
+    data_version_model.objects.bulk_create([data_version_model(scope=scope) for scope in scopes],
+                                           ignore_conflicts=True)
+    data_version_model.objects.filter(scope__in=scopes).update(version=F("version") + 1)
+    # Imports of this process are served at once, other processes see them in VERSION_TTL seconds
+    if _query_cache is not None:
+        _query_cache.clear_versions()
+
+
+class LRUCacheBackend:
+    """
+    In-process cache, which evicts the least recently used entries when it is full, and the entries older than TTL
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size: int = max_size
+        self.ttl: int = ttl
+        self.entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            entry: Optional[tuple[float, Any]] = self.entries.get(key)
+            if entry is None:
+                return CACHE_MISS
+            if entry[0] < time.monotonic():
+                del self.entries[key]
+                return CACHE_MISS
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def size(self) -> int:
+        return len(self.entries)
+
+
+class DjangoCacheBackend:
+    """
+    Cache using one of the configured Django cache backends, so that the entries can be shared between workers
+    """
+
+    def __init__(self, alias: str, ttl: int):
+        self.alias: str = alias
+        self.ttl: int = ttl
+
+    def get(self, key: str) -> Any:
+        return caches[self.alias].get(key, CACHE_MISS)
+
+    def set(self, key: str, value: Any) -> None:
+        caches[self.alias].set(key, value, timeout=self.ttl)
+
+    def clear(self) -> None:
+        caches[self.alias].clear()
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class QueryCache:
+    """
+    Cache of the query service results. Keys contain the global data version and the version of the query scope, so
+    entries of the previous imports are never served, and they are evicted by the backend eventually. Full imports bump
+    the global version, incremental imports bump only the scopes they change. Versions are memoized for version_ttl
+    seconds, so that cache hits do not query the database.
+    """
+
+    def __init__(self, backend_name: str, backend: Optional[object],
+                 version_ttl: float = DEFAULT_QUERY_CACHE_SETTINGS["VERSION_TTL"]):
+        self.backend_name: str = backend_name
+        self.backend = backend
+        self.version_ttl: float = version_ttl
+        self.versions: dict[str, tuple[float, tuple[int, ...]]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def from_settings() -> "QueryCache":
+        """
+        Creates the cache using QUERY_CACHE setting
+        :return: Query cache
+        """
+        cache_settings: dict[str, Any] = {**DEFAULT_QUERY_CACHE_SETTINGS, **getattr(settings, "QUERY_CACHE", {})}
+        backend_name: str = cache_settings["BACKEND"]
+        if backend_name == LRU_CACHE_BACKEND:
+            return QueryCache(backend_name, LRUCacheBackend(cache_settings["MAX_SIZE"], cache_settings["TTL"]),
+                              cache_settings["VERSION_TTL"])
+        if backend_name == DJANGO_CACHE_BACKEND:
+            return QueryCache(backend_name, DjangoCacheBackend(cache_settings["DJANGO_CACHE_ALIAS"],
+                                                               cache_settings["TTL"]), cache_settings["VERSION_TTL"])
+        if backend_name == NO_CACHE_BACKEND:
+            return QueryCache(backend_name, None)
+        raise ValueError(f"Unknown query cache backend: {backend_name}")
+
+    def get_or_compute(self, key_parts: tuple, compute: Callable[[], Any], scope: str = GLOBAL_DATA_SCOPE) -> Any:
+        """
+        Gets the cached result of the query, or computes and caches it
+        :param key_parts: Normalized query parameters, first one is the name of the query
+        :param compute: Function to compute the result
+        :param scope: Data version scope of the query
+        :return: Query result
+        """
+        key, value = self.lookup(key_parts, scope)
+        if value is CACHE_MISS:
+            value = compute()
+            self.store(key, value)
+        return value
+
+    def lookup(self, key_parts: tuple, scope: str = GLOBAL_DATA_SCOPE) -> tuple[Optional[str], Any]:
+        """
+        Looks up the cached result of the query, for callers computing the result on their own
+        :param key_parts: Normalized query parameters, first one is the name of the query
+        :param scope: Data version scope of the query
+        :return: Cache key and cached result, CACHE_MISS as the result if it is not cached
+        """
+        if self.backend is None:
+            return None, CACHE_MISS
+        versions: tuple[int, ...] = self.get_versions(scope)
+        # Spaces of postal codes are replaced, as some cache backends do not accept keys with spaces
+        key: str = ":".join(["query", *[str(version) for version in versions],
+                             *[str(part) for part in key_parts]]).replace(" ", "_")
+        value: Any = self.backend.get(key)
+        with self.lock:
+            if value is CACHE_MISS:
+                self.misses = self.misses + 1
+            else:
+                self.hits = self.hits + 1
+        return key, value
+
+    def get_versions(self, scope: str) -> tuple[int, ...]:
+        """
+        Gets the global data version and the version of the scope, they are read from the database once in
+        version_ttl seconds
+        :param scope: Data version scope of the query
+        :return: Global and scope data versions
+        """
+        now: float = time.monotonic()
+        with self.lock:
+            memo: Optional[tuple[float, tuple[int, ...]]] = self.versions.get(scope)
+        if memo is not None and memo[0] > now:
+            return memo[1]
+        versions: tuple[int, ...] = get_data_versions((GLOBAL_DATA_SCOPE, scope))
+        with self.lock:
+            if len(self.versions) >= VERSION_MEMO_MAX_SIZE:
+                self.versions = {memo_scope: memo for memo_scope, memo in self.versions.items() if memo[0] > now}
+                if len(self.versions) >= VERSION_MEMO_MAX_SIZE:
+                    self.versions.clear()
+            self.versions[scope] = (now + self.version_ttl, versions)
+        return versions
+
+    def clear_versions(self) -> None:
+        """
+        Drops the memoized data versions, so that they are read on the next lookup
+        :return: None
+        """
+        with self.lock:
+            self.versions.clear()
+
+    def store(self, key: Optional[str], value: Any) -> None:
+        """
+        Caches the result of the query
+        :param key: Cache key given by lookup
+        :param value: Query result
+        :return: None
+        """
+        if self.backend is not None and key is not None:
+            self.backend.set(key, value)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+        with self.lock:
+            self.versions.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def is_process_local(self) -> bool:
+        """
+        Checks whether the entries are kept in the memory of this process only, so that other processes do not
+        share them and they are dropped when the process exits. The local memory cache of Django is used when
+        CACHES setting is not configured.
+        :return: True for the in-process cache and the local memory Django cache
+        """
+        if isinstance(self.backend, LRUCacheBackend):
+            return True
+        return isinstance(self.backend, DjangoCacheBackend) and isinstance(caches[self.backend.alias], LocMemCache)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Gets the hit/miss statistics of the cache
+        :return: Statistics
+        """
+        requests: int = self.hits + self.misses
+        return {"backend": self.backend_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "size": self.backend.size() if self.backend is not None else 0}
+
+
+_query_cache: Optional[QueryCache] = None
+
+
+def get_query_cache() -> QueryCache:
+    """
+    Gets the query cache of the process, it is created on first use
+    :return: Query cache
+    """
+    global _query_cache
+    if _query_cache is None:
+        _query_cache = QueryCache.from_settings()
+    return _query_cache
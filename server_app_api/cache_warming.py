@@ -0,0 +1,147 @@
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connections
+from django.db.models import Max, Sum
+from django.test import RequestFactory
+from django.urls import Resolver404, resolve
+
+from .models import MonthlyRollupPersistenceModel
+
+# Request line and status code of the common and combined log formats of the web servers
+ACCESS_LOG_PATTERN: re.Pattern = re.compile(r'"GET (?P<path>/api/[^ "]*) HTTP/[\d.]+" (?P<status>\d{3}) ')
+# Routes which do not query the house data, and the exports which stream the rows without caching them
+UNCACHED_PATH_PREFIXES: tuple[str, ...] = ("/api/_", "/api/batch", "/api/transactions/export/")
+DEFAULT_BIN_COUNT: int = 10
+DEFAULT_MONTH_COUNT: int = 12
+
+
+def get_top_paths_of_access_logs(lines: Iterable[str], limit: int) -> list[str]:
+    """
+    Gets the most frequent query paths of the successful requests of the services in the access logs
+    :param lines: Lines of the access logs
+    :param limit: Count of paths
+    :return: Paths with query strings, most frequent first
+    """
+    path_counts: Counter = Counter()
+    for line in lines:
+        match: Optional[re.Match] = ACCESS_LOG_PATTERN.search(line)
+        if match is not None and match.group("status") == "200" and \
+                not match.group("path").startswith(UNCACHED_PATH_PREFIXES):
+            path_counts[match.group("path")] += 1
+    return [path for path, _ in path_counts.most_common(limit)]
+
+
+def get_top_paths_of_postal_codes(limit: int, bin_count: int = DEFAULT_BIN_COUNT,
+                                  month_count: int = DEFAULT_MONTH_COUNT) -> list[str]:
+    """
+    Gets the query paths of the postal codes with the most transactions when no access log is recorded: average
+    prices and monthly histograms of the last months, and the histogram of the last month, of all postal codes first
+    :param limit: Count of paths
+    :param bin_count: Bin count of the histograms
+    :param month_count: Count of the last months of the periods
+    :return: Paths
+    """
+    last_month: Optional[datetime] = MonthlyRollupPersistenceModel.objects.aggregate(
+        last_month=Max("month_year_date"))["last_month"]
+    if last_month is None or limit <= 0:
+        return []
+    first_month_ordinal: int = last_month.year * 12 + last_month.month - month_count
+    start_date: str = f"{first_month_ordinal // 12:04d}_{first_month_ordinal % 12 + 1:02d}"
+    end_date: str = last_month.strftime("%Y_%m")
+    shapes: tuple[str, ...] = (f"/api/avgprice/{start_date}/{end_date}",
+                               f"/api/transaction/{bin_count}/{start_date}/{end_date}",
+                               f"/api/transaction/{bin_count}/{end_date}")
+    # Each postal code gives a path of every shape
+    postal_codes: list[str] = list(MonthlyRollupPersistenceModel.objects.values("postal_code").annotate(
+        transaction_count=Sum("transaction_count")).order_by("-transaction_count", "postal_code").values_list(
+        "postal_code", flat=True)[:-(-limit // len(shapes)) - 1])
+    paths: list[str] = list(shapes)
+    for postal_code in postal_codes:
+        paths.extend(f"{shape}/{postal_code.replace(' ', '_')}" for shape in shapes)
+    return paths[:limit]
+
+
+def request_in_process(path: str) -> int:
+    """
+    Runs the view of the path in this process, so that its results are written to the query cache and the columnar
+    data of this process. Middlewares are not run.
+    :param path: Path with query string
+    :return: Status code of the response, 404 if no view matches the path
+    """
+    request = RequestFactory().get(path)
+    try:
+        resolver_match = resolve(request.path_info)
+    except Resolver404:
+        return 404
+    view: Callable = resolver_match.func
+    if iscoroutinefunction(view):
+        view = async_to_sync(view)
+    return view(request, *resolver_match.args, **resolver_match.kwargs).status_code
+
+
+def get_url_requester(base_url: str, timeout: float) -> Callable[[str], int]:
+    """
+    Gets a function which requests the paths from a running server, so that its workers cache the results
+    :param base_url: Url of the server, such as http://localhost:8000
+    :param timeout: Timeout of each request in seconds
+    :return: Function which requests a path, and gives the status code of the response
+    """
+
+    def request_url(path: str) -> int:
+        try:
+            with urlopen(base_url.rstrip("/") + path, timeout=timeout) as response:
+                response.read()
+                return response.status
+        except HTTPError as error:
+            return error.code
+
+    return request_url
+
+
+def warm_cache(paths: list[str], worker_count: int,
+               request: Callable[[str], int] = request_in_process) -> list[tuple[str, int, float]]:
+    """
+    Requests the paths with a bounded count of threads, which take the next path when their request is done. Each path
+    is requested once, more frequent paths first.
+    :param paths: Paths with query strings
+    :param worker_count: Count of concurrent requests, 1 to request in the calling thread
+    :param request: Function which requests a path and gives the status code of the response
+    :return: Path, status code and duration in seconds of each request, in the order of the paths
+    """
+    results: list[Optional[tuple[str, int, float]]] = [None] * len(paths)
+    path_indexes: Iterator[int] = iter(range(len(paths)))
+    path_indexes_lock: threading.Lock = threading.Lock()
+
+    def request_paths():
+        while True:
+            with path_indexes_lock:
+                path_index: Optional[int] = next(path_indexes, None)
+            if path_index is None:
+                return
+            start_time: float = time.perf_counter()
+            status_code: int = request(paths[path_index])
+            results[path_index] = (paths[path_index], status_code, time.perf_counter() - start_time)
+
+    def request_paths_in_thread():
+        try:
+            request_paths()
+        finally:
+            # Connections of the threads are not closed by the request finished signal
+            connections.close_all()
+
+    if worker_count <= 1:
+        request_paths()
+    else:
+        with ThreadPoolExecutor(max_workers=worker_count) as executor:
+            for future in [executor.submit(request_paths_in_thread) for _ in range(min(worker_count, len(paths)))]:
+                future.result()
+    return results
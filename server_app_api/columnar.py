@@ -0,0 +1,493 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterator, Optional
+
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.db.models import Sum
+
+from .histograms import get_linear_bin_ranges, get_bin_edges, get_bin_ranges_of_edges, LINEAR_BINNING, \
+    QUANTILE_BINNING, EDGES_BINNING
+from .models import DataVersionPersistenceModel, HousePersistenceModel, HOUSE_TYPES, \
+    POSTAL_CODE_AREA, POSTAL_DISTRICT_AREA
+from .renderers import get_monthly_means_data
+from .sketches import PriceSketch
+
+ORM_QUERY_ENGINE = "orm"
+COLUMNAR_QUERY_ENGINE = "columnar"
+
+HOUSE_TYPE_CODES: dict[str, int] = {house_type: code for code, (house_type, _) in enumerate(HOUSE_TYPES)}
+LOAD_CHUNK_SIZE: int = 100000
+POSTAL_CODE_DTYPE: str = "U10"
+
+SNAPSHOT_FORMAT_VERSION: int = 1
+SNAPSHOT_COLUMNS: tuple[str, ...] = ("month_ordinals", "postal_code_ids", "house_type_codes", "sell_prices",
+                                     "postal_codes", "month_offsets")
+SNAPSHOT_META_FILE: str = "meta.json"
+SNAPSHOT_CURRENT_FILE: str = "CURRENT"
+
+
+def get_month_ordinal(date: datetime) -> int:
+    """
+    Gets the count of months since year 0, which is used to store sell dates compactly
+    :param date: Date
+    :return: Month ordinal
+    """
+    return date.year * 12 + date.month - 1
+
+
+def get_month_date(month_ordinal: int) -> datetime:
+    """
+    Gets the first moment of the month of the month ordinal
+    :param month_ordinal: Month ordinal
+    :return: Date of the month
+    """
+    return datetime(month_ordinal // 12, month_ordinal % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def get_data_version_total() -> int:
+    """
+    Gets the total of data versions of all scopes, which changes after every full or incremental import
+    :return: Data version total
+    """
+    return DataVersionPersistenceModel.objects.aggregate(total=Sum("version"))["total"] or 0
+
+
+class ColumnarHouseData:
+    """
+    In-memory columns of the house data for answering the query services with vectorized operations instead of SQL.
+    Rows are sorted by month, and month offsets give the row range of each month. Postal codes are dictionary encoded
+    with a sorted dictionary, house types are stored as their index in HOUSE_TYPES.
+    Columns can be saved as a snapshot directory of fixed width arrays, which workers map to memory read-only, so
+    that all workers share one page cache copy of the data.
+    """
+
+    def __init__(self, month_ordinals: np.ndarray, postal_code_ids: np.ndarray, house_type_codes: np.ndarray,
+                 sell_prices: np.ndarray, postal_codes: np.ndarray, month_offsets: np.ndarray, first_month: int,
+                 data_version: int):
+        self.month_ordinals: np.ndarray = month_ordinals
+        self.postal_code_ids: np.ndarray = postal_code_ids
+        self.house_type_codes: np.ndarray = house_type_codes
+        self.sell_prices: np.ndarray = sell_prices
+        self.postal_codes: np.ndarray = postal_codes
+        self.month_offsets: np.ndarray = month_offsets
+        self.first_month: int = first_month
+        self.data_version: int = data_version
+
+    @staticmethod
+    def load(data_version: Optional[int] = None) -> "ColumnarHouseData":
+        """
+        Loads the columns of all houses from the database. Rows are read in chunks into preallocated typed arrays,
+        and postal codes are dictionary encoded while reading, so that no Python object is kept for each row.
+        :param data_version: Data version total read before loading, it is read if not given
+        :return: Columnar house data
+        """
+        if data_version is None:
+            data_version = get_data_version_total()
+        # Houses imported while loading are added by growing the arrays
+        capacity: int = HousePersistenceModel.objects.count()
+        month_ordinals: np.ndarray = np.empty(capacity, dtype=np.int32)
+        postal_code_ids: np.ndarray = np.empty(capacity, dtype=np.int32)
+        house_type_codes: np.ndarray = np.empty(capacity, dtype=np.int8)
+        sell_prices: np.ndarray = np.empty(capacity, dtype=np.int64)
+        # Postal codes get ids in the order they are read, they are renumbered in sorted order after reading
+        read_postal_code_ids: dict[str, int] = {}
+        row_count: int = 0
+        rows: Iterator[tuple] = HousePersistenceModel.objects.values_list(
+            "postal_code", "sell_date", "house_type", "sell_price").iterator(chunk_size=LOAD_CHUNK_SIZE)
+        while chunk := list(islice(rows, LOAD_CHUNK_SIZE)):
+            chunk_end: int = row_count + len(chunk)
+            if chunk_end > month_ordinals.size:
+                month_ordinals, postal_code_ids, house_type_codes, sell_prices = (
+                    np.resize(column, max(chunk_end, month_ordinals.size * 2))
+                    for column in (month_ordinals, postal_code_ids, house_type_codes, sell_prices))
+            month_ordinals[row_count:chunk_end] = np.fromiter(
+                (get_month_ordinal(sell_date) for _, sell_date, _, _ in chunk), dtype=np.int32, count=len(chunk))
+            postal_code_ids[row_count:chunk_end] = np.fromiter(
+                (read_postal_code_ids.setdefault(postal_code, len(read_postal_code_ids))
+                 for postal_code, _, _, _ in chunk), dtype=np.int32, count=len(chunk))
+            house_type_codes[row_count:chunk_end] = np.fromiter(
+                (HOUSE_TYPE_CODES.get(house_type, -1) for _, _, house_type, _ in chunk), dtype=np.int8,
+                count=len(chunk))
+            sell_prices[row_count:chunk_end] = np.fromiter(
+                (sell_price for _, _, _, sell_price in chunk), dtype=np.int64, count=len(chunk))
+            row_count = chunk_end
+
+        read_postal_codes: np.ndarray = np.array(list(read_postal_code_ids), dtype=POSTAL_CODE_DTYPE)
+        postal_code_order: np.ndarray = np.argsort(read_postal_codes)
+        sorted_postal_code_ids: np.ndarray = np.empty(read_postal_codes.size, dtype=np.int32)
+        sorted_postal_code_ids[postal_code_order] = np.arange(read_postal_codes.size, dtype=np.int32)
+        month_order: np.ndarray = np.argsort(month_ordinals[:row_count], kind="stable")
+        sorted_month_ordinals: np.ndarray = month_ordinals[:row_count][month_order]
+        first_month: int = int(sorted_month_ordinals[0]) if sorted_month_ordinals.size else 0
+        last_month: int = int(sorted_month_ordinals[-1]) if sorted_month_ordinals.size else -1
+        return ColumnarHouseData(month_ordinals=sorted_month_ordinals,
+                                 postal_code_ids=sorted_postal_code_ids[postal_code_ids[:row_count][month_order]],
+                                 house_type_codes=house_type_codes[:row_count][month_order],
+                                 sell_prices=sell_prices[:row_count][month_order],
+                                 postal_codes=read_postal_codes[postal_code_order],
+                                 month_offsets=np.searchsorted(sorted_month_ordinals,
+                                                               np.arange(first_month, last_month + 2)),
+                                 first_month=first_month,
+                                 data_version=data_version)
+
+    def save_snapshot(self, directory: str) -> str:
+        """
+        Saves the columns as a new snapshot, and makes it the current snapshot of the directory atomically. Previous
+        snapshots are kept until the next one, workers may still be using them.
+        :param directory: Snapshot directory
+        :return: Path of the snapshot
+        """
+        os.makedirs(directory, exist_ok=True)
+        name: str = f"snapshot-{self.data_version}-{time.time_ns()}"
+        temp_path: str = os.path.join(directory, f".{name}")
+        os.makedirs(temp_path)
+        for column in SNAPSHOT_COLUMNS:
+            np.save(os.path.join(temp_path, f"{column}.npy"), getattr(self, column))
+        with open(os.path.join(temp_path, SNAPSHOT_META_FILE), "w") as meta_file:
+            json.dump({"format_version": SNAPSHOT_FORMAT_VERSION, "first_month": self.first_month,
+                       "data_version": self.data_version}, meta_file)
+        os.rename(temp_path, os.path.join(directory, name))
+
+        current_path: str = os.path.join(directory, SNAPSHOT_CURRENT_FILE)
+        previous_name: Optional[str] = get_current_snapshot_name(directory)
+        with open(f"{current_path}.tmp", "w") as current_file:
+            current_file.write(name)
+        os.replace(f"{current_path}.tmp", current_path)
+
+        for entry in os.listdir(directory):
+            if entry.startswith("snapshot-") and entry not in (name, previous_name):
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+        return os.path.join(directory, name)
+
+    @staticmethod
+    def open_snapshot(directory: str) -> Optional["ColumnarHouseData"]:
+        """
+        Maps the columns of the current snapshot of the directory to memory read-only
+        :param directory: Snapshot directory
+        :return: Columnar house data, None if directory has no snapshot
+        """
+        name: Optional[str] = get_current_snapshot_name(directory)
+        if name is None:
+            return None
+        path: str = os.path.join(directory, name)
+        with open(os.path.join(path, SNAPSHOT_META_FILE)) as meta_file:
+            meta: dict = json.load(meta_file)
+        if meta["format_version"] != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar snapshot format version: {meta['format_version']}")
+        columns: dict[str, np.ndarray] = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+                                          for column in SNAPSHOT_COLUMNS}
+        return ColumnarHouseData(first_month=meta["first_month"], data_version=meta["data_version"], **columns)
+
+    def get_postal_code_id(self, postal_code: str) -> Optional[int]:
+        """
+        Finds the postal code in the sorted dictionary
+        :param postal_code: Postal code
+        :return: Postal code id, None if postal code does not exist
+        """
+        postal_code_id: int = int(np.searchsorted(self.postal_codes, postal_code))
+        if postal_code_id < len(self.postal_codes) and self.postal_codes[postal_code_id] == postal_code:
+            return postal_code_id
+        return None
+
+    def get_postal_code_id_range(self, postal_code: str, area_level: str) -> tuple[int, int]:
+        """
+        Finds the postal codes of a postal area, which are contiguous in the sorted dictionary
+        :param postal_code: Postal area code of the area level
+        :param area_level: Postal area level, district or prefix
+        :return: First postal code id and the id after the last one
+        """
+        # Postal codes of a district are the district itself and the ones starting with the district and a space,
+        # the end of the range is the first code greater than them
+        end_code: str = postal_code + "!" if area_level == POSTAL_DISTRICT_AREA else \
+            postal_code[:-1] + chr(ord(postal_code[-1]) + 1)
+        return int(np.searchsorted(self.postal_codes, postal_code)), int(np.searchsorted(self.postal_codes, end_code))
+
+    def get_rows(self, start_date: datetime, end_date: datetime, postal_code: str,
+                 area_level: str = POSTAL_CODE_AREA) -> Optional[tuple[slice, np.ndarray]]:
+        """
+        Common filter method to be used for both average price and histogram capabilities.
+        :param start_date: Start date
+        :param end_date: End date, excluded
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :return: Row range of the months and mask of the selected houses in it, None if postal code does not exist
+        """
+        month_count: int = len(self.month_offsets) - 1
+        start_index: int = min(max(get_month_ordinal(start_date) - self.first_month, 0), month_count)
+        end_index: int = min(max(get_month_ordinal(end_date) - self.first_month, start_index), month_count)
+        rows: slice = slice(int(self.month_offsets[start_index]), int(self.month_offsets[end_index]))
+        # Houses of other types than HOUSE_TYPES are selected, they are counted in the histograms as the SQL queries do
+        mask: np.ndarray = np.ones(rows.stop - rows.start, dtype=bool)
+        if postal_code and area_level != POSTAL_CODE_AREA:
+            first_id, end_id = self.get_postal_code_id_range(postal_code, area_level)
+            if first_id == end_id:
+                return None
+            postal_code_ids: np.ndarray = self.postal_code_ids[rows]
+            mask &= (postal_code_ids >= first_id) & (postal_code_ids < end_id)
+        elif postal_code:
+            postal_code_id: Optional[int] = self.get_postal_code_id(postal_code)
+            if postal_code_id is None:
+                return None
+            mask &= self.postal_code_ids[rows] == postal_code_id
+        return rows, mask
+
+    def get_data_for_house_types(self, start_date: datetime, end_date: datetime, postal_code: str = "",
+                                 area_level: str = POSTAL_CODE_AREA) -> dict[str, list]:
+        """
+        Gets monthly means of all house types, in the same form as GetAveragePricesView
+        :param start_date: Start date
+        :param end_date: End date, excluded
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :return: Serialized data of each house type, keyed by house type description
+        """
+        selection: Optional[tuple[slice, np.ndarray]] = self.get_rows(start_date, end_date, postal_code, area_level)
+        if selection is None:
+            return get_monthly_means_data(())
+        rows, mask = selection
+        # Means are given for the house types of HOUSE_TYPES only
+        mask &= self.house_type_codes[rows] >= 0
+        start_month: int = get_month_ordinal(start_date)
+        # Each month and house type pair gets its own group index
+        group_indexes: np.ndarray = (self.month_ordinals[rows][mask] - start_month) * len(HOUSE_TYPES) + \
+            self.house_type_codes[rows][mask]
+        counts: list[int] = np.bincount(group_indexes).tolist()
+        sums: list[int] = np.bincount(group_indexes, weights=self.sell_prices[rows][mask]).astype(np.int64).tolist()
+        return get_monthly_means_data(
+            (HOUSE_TYPES[group_index % len(HOUSE_TYPES)][0],
+             get_month_date(start_month + group_index // len(HOUSE_TYPES)), sums[group_index] / count)
+            for group_index, count in enumerate(counts) if count)
+
+    def get_data_for_histogram(self, bin_count: int, date: datetime, postal_code: str,
+                               area_level: str = POSTAL_CODE_AREA, binning: str = LINEAR_BINNING,
+                               bin_edges: Optional[list[int]] = None) -> \
+            Optional[tuple[list[tuple[int, int]], list[int]]]:
+        """
+        Gets the histogram of the transactions of the month, in the same form as NumberOfTransactionsView
+        :param bin_count: Bin count
+        :param date: Date of the month
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :param binning: Binning strategy
+        :param bin_edges: Caller supplied bin edges of the edges binning strategy
+        :return: Bin ranges and transaction counts of each bin, None if there is no transaction
+        """
+        histograms_data: Optional[tuple[list[tuple[int, int]], list[list[int]]]] = self.get_data_for_histograms(
+            bin_count, date, get_month_date(get_month_ordinal(date) + 1), postal_code, area_level, binning, bin_edges)
+        if histograms_data is None:
+            return None
+        return histograms_data[0], histograms_data[1][0]
+
+    def get_data_for_histograms(self, bin_count: int, start_date: datetime, end_date: datetime, postal_code: str,
+                                area_level: str = POSTAL_CODE_AREA, binning: str = LINEAR_BINNING,
+                                bin_edges: Optional[list[int]] = None) -> \
+            Optional[tuple[list[tuple[int, int]], list[list[int]]]]:
+        """
+        Gets the histograms of the transactions of each month with the bins of the whole period, in the same form as
+        MonthlyTransactionsView
+        :param bin_count: Bin count
+        :param start_date: Start date
+        :param end_date: End date, excluded
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :param binning: Binning strategy
+        :param bin_edges: Caller supplied bin edges of the edges binning strategy
+        :return: Bin ranges and transaction counts of each bin of each month, None if there is no transaction
+        """
+        start_month: int = get_month_ordinal(start_date)
+        month_count: int = get_month_ordinal(end_date) - start_month
+        selection: Optional[tuple[slice, np.ndarray]] = self.get_rows(start_date, end_date, postal_code, area_level)
+        # Caller supplied bins are given even without transactions, as the SQL histogram does
+        rows, mask = selection if selection is not None else (slice(0, 0), np.zeros(0, dtype=bool))
+        prices: np.ndarray = self.sell_prices[rows][mask]
+        if binning != EDGES_BINNING:
+            if prices.size == 0:
+                return None
+            min_price: int = int(prices.min())
+            max_price: int = int(prices.max())
+            sketch: Optional[PriceSketch] = None
+            if binning == QUANTILE_BINNING:
+                # Same sketch as the merged sketches of the monthly rollups, so that the engines give the same bins
+                sketch = PriceSketch()
+                for price, count in zip(*np.unique(prices, return_counts=True)):
+                    sketch.add(int(price), int(count))
+            bin_edges = get_bin_edges(binning, bin_count, min_price, max_price, sketch)
+
+        if binning == LINEAR_BINNING:
+            bins: list[tuple[int, int]] = get_linear_bin_ranges(bin_count, bin_edges[0], bin_edges[-1])
+            # Same exact integer bin assignment as the SQL histogram, bins are half-open except the last one
+            bin_indexes: np.ndarray = np.minimum(
+                (prices - bin_edges[0]) * bin_count // max(bin_edges[-1] - bin_edges[0], 1), bin_count - 1)
+            in_edges: np.ndarray = np.ones(prices.size, dtype=bool)
+        else:
+            bins = get_bin_ranges_of_edges(bin_edges)
+            in_edges = (prices >= bin_edges[0]) & (prices <= bin_edges[-1])
+            bin_indexes = np.minimum(np.searchsorted(np.asarray(bin_edges), prices, side="right") - 1, len(bins) - 1)
+        # Each month and bin pair gets its own group index
+        group_indexes: np.ndarray = (self.month_ordinals[rows][mask][in_edges] - start_month) * len(bins) + \
+            bin_indexes[in_edges]
+        return bins, np.bincount(group_indexes, minlength=month_count * len(bins)).reshape(
+            month_count, len(bins)).tolist()
+
+
+def get_current_snapshot_name(directory: str) -> Optional[str]:
+    """
+    Gets the name of the current snapshot of the directory
+    :param directory: Snapshot directory
+    :return: Snapshot name, None if directory has no snapshot
+    """
+    try:
+        with open(os.path.join(directory, SNAPSHOT_CURRENT_FILE)) as current_file:
+            return current_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def get_current_snapshot_data_version(directory: str) -> Optional[int]:
+    """
+    Gets the data version of the current snapshot of the directory
+    :param directory: Snapshot directory
+    :return: Data version, None if directory has no snapshot
+    """
+    name: Optional[str] = get_current_snapshot_name(directory)
+    if name is None:
+        return None
+    with open(os.path.join(directory, name, SNAPSHOT_META_FILE)) as meta_file:
+        return json.load(meta_file)["data_version"]
+
+
+def export_columnar_snapshot(stale_only: bool = False) -> Optional[str]:
+    """
+    Exports the house data as the current snapshot of COLUMNAR_SNAPSHOT_DIR setting
+    :param stale_only: Keeps the current snapshot if it has the current data version
+    :return: Path of the current snapshot, None if snapshots are not configured
+    """
+    directory: str = getattr(settings, "COLUMNAR_SNAPSHOT_DIR", "")
+    if not directory:
+        return None
+    if stale_only and get_current_snapshot_data_version(directory) == get_data_version_total():
+        return os.path.join(directory, get_current_snapshot_name(directory))
+    return ColumnarHouseData.load().save_snapshot(directory)
+
+
+_columnar_house_data: Optional[ColumnarHouseData] = None
+_columnar_house_data_version: Optional[object] = None
+_columnar_house_data_checked_at: float = 0.0
+_columnar_house_data_reloading: Optional[threading.Thread] = None
+# Lock of the references above, it is not held while the data is read
+_columnar_house_data_lock: threading.Lock = threading.Lock()
+# Lock of the first load of the process, requests wait for it as there is no data to serve before it
+_columnar_house_data_first_load_lock: threading.Lock = threading.Lock()
+
+
+def get_columnar_house_data_version() -> object:
+    """
+    Gets the version of the data that the columnar engine should serve, which is the current snapshot name when
+    COLUMNAR_SNAPSHOT_DIR setting is given, or the data version total of the database
+    :return: Data version
+    """
+    directory: str = getattr(settings, "COLUMNAR_SNAPSHOT_DIR", "")
+    return get_current_snapshot_name(directory) if directory else get_data_version_total()
+
+
+def read_columnar_house_data(version: object) -> ColumnarHouseData:
+    """
+    Reads the columnar house data of the version, mapped from the current snapshot when COLUMNAR_SNAPSHOT_DIR setting
+    is given, or loaded from the database until the first snapshot is exported
+    :param version: Data version given by get_columnar_house_data_version
+    :return: Columnar house data
+    """
+    directory: str = getattr(settings, "COLUMNAR_SNAPSHOT_DIR", "")
+    columnar_house_data: Optional[ColumnarHouseData] = ColumnarHouseData.open_snapshot(
+        directory) if directory else None
+    return columnar_house_data or ColumnarHouseData.load(None if directory else version)
+
+
+def set_columnar_house_data(columnar_house_data: ColumnarHouseData, version: object) -> None:
+    """
+    Swaps the columnar house data of the process, requests which hold the previous data keep using it
+    :param columnar_house_data: Columnar house data
+    :param version: Data version of the columnar house data
+    :return: None
+    """
+    global _columnar_house_data, _columnar_house_data_version
+    with _columnar_house_data_lock:
+        _columnar_house_data = columnar_house_data
+        _columnar_house_data_version = version
+
+
+def reload_columnar_house_data(version: object) -> None:
+    """
+    Reloads the columnar house data in the background thread, previous data is served until it is swapped
+    :param version: Data version to load
+    :return: None
+    """
+    global _columnar_house_data_reloading
+    try:
+        set_columnar_house_data(read_columnar_house_data(version), version)
+    finally:
+        with _columnar_house_data_lock:
+            _columnar_house_data_reloading = None
+        # Connection of the thread is not closed by the request finished signal
+        connections.close_all()
+
+
+def get_columnar_house_data() -> Optional[ColumnarHouseData]:
+    """
+    Gets the columnar house data of the process when QUERY_ENGINE setting selects the columnar engine. Data is mapped
+    from the current snapshot when COLUMNAR_SNAPSHOT_DIR setting is given, and loaded from the database otherwise.
+    New snapshots and data versions are checked once in COLUMNAR_REFRESH_INTERVAL seconds, so workers swap to new
+    data without restarting. New snapshots are mapped at once, database loads run in a background thread while the
+    previous data is served. The first load is run at worker startup by the WSGI and ASGI applications.
+    :return: Columnar house data, None if ORM engine is selected
+    """
+    global _columnar_house_data_checked_at, _columnar_house_data_reloading
+    if getattr(settings, "QUERY_ENGINE", ORM_QUERY_ENGINE) != COLUMNAR_QUERY_ENGINE:
+        return None
+    if _columnar_house_data is None:
+        with _columnar_house_data_first_load_lock:
+            if _columnar_house_data is None:
+                version: object = get_columnar_house_data_version()
+                set_columnar_house_data(read_columnar_house_data(version), version)
+                _columnar_house_data_checked_at = time.monotonic()
+
+    with _columnar_house_data_lock:
+        columnar_house_data: ColumnarHouseData = _columnar_house_data
+        loaded_version: object = _columnar_house_data_version
+        now: float = time.monotonic()
+        if _columnar_house_data_reloading is not None or \
+                now - _columnar_house_data_checked_at < getattr(settings, "COLUMNAR_REFRESH_INTERVAL", 60):
+            return columnar_house_data
+        _columnar_house_data_checked_at = now
+    version = get_columnar_house_data_version()
+    if version == loaded_version:
+        return columnar_house_data
+    if getattr(settings, "COLUMNAR_SNAPSHOT_DIR", ""):
+        # Snapshots are mapped to memory, their pages are read on use
+        columnar_house_data = read_columnar_house_data(version)
+        set_columnar_house_data(columnar_house_data, version)
+        return columnar_house_data
+    with _columnar_house_data_lock:
+        if _columnar_house_data_reloading is None:
+            _columnar_house_data_reloading = threading.Thread(target=reload_columnar_house_data, args=(version,),
+                                                              name="columnar-house-data-reload", daemon=True)
+            _columnar_house_data_reloading.start()
+    return columnar_house_data
+
+
+def reset_columnar_house_data() -> None:
+    """
+    Drops the columnar house data of the process, so that it is reloaded on next use
+    :return: None
+    """
+    global _columnar_house_data, _columnar_house_data_version
+    with _columnar_house_data_lock:
+        _columnar_house_data = None
+        _columnar_house_data_version = None
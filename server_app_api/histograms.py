@@ -0,0 +1,96 @@
+from typing import Optional
+
+from .sketches import PriceSketch
+
+LINEAR_BINNING = "linear"
+LOG_BINNING = "log"
+QUANTILE_BINNING = "quantile"
+EDGES_BINNING = "edges"
+BINNING_STRATEGIES: tuple[str, ...] = (LINEAR_BINNING, LOG_BINNING, QUANTILE_BINNING, EDGES_BINNING)
+
+
+def get_linear_bin_ranges(bin_count: int, min_price: int, max_price: int) -> list[tuple[int, int]]:
+    """
+    Gets the equal width bins between the min and max prices. Each bin starts at the smallest price that the integer
+    arithmetic of get_histogram_of_price_counts assigns to it, so the half-open bins contain the prices they count.
+    :param bin_count: Bin count
+    :param min_price: Min price
+    :param max_price: Max price
+    :return: Start and end prices of each bin
+    """
+    price_range: int = max(max_price - min_price, 1)
+    # Smallest price of each bin index is min + ceil(index * range / bin count), the last bin ends at the max price
+    bin_starts: list[int] = [min(min_price - (-idx * price_range // bin_count), max_price)
+                             for idx in range(0, bin_count)] + [max_price]
+    return list(zip(bin_starts, bin_starts[1:]))
+
+
+def get_histogram_of_price_counts(price_counts: list[tuple[int, int]], bin_count: int, min_price: int,
+                                  max_price: int) -> list[int]:
+    """
+    Assigns transaction counts of prices to equal width bins, with the same half-open bins as the SQL histogram
+    :param price_counts: Prices and their transaction counts
+    :param bin_count: Bin count
+    :param min_price: Min price
+    :param max_price: Max price
+    :return: Transaction counts of each bin
+    """
+    price_range: int = max(max_price - min_price, 1)
+    histogram: list[int] = [0] * bin_count
+    for price, transaction_count in price_counts:
+        histogram[min((price - min_price) * bin_count // price_range, bin_count - 1)] += transaction_count
+    return histogram
+
+
+def get_bin_edges(binning: str, bin_count: int, min_price: int, max_price: int,
+                  sketch: Optional[PriceSketch] = None) -> list[int]:
+    """
+    Gets the bin edges of the binning strategy between the min and max prices. Linear bins are given with the min and
+    max prices only, they are assigned with the exact integer arithmetic of get_linear_bin_ranges. Edges of log and
+    quantile bins are rounded to prices, so bins which would be narrower than a price are merged.
+    :param binning: Binning strategy, other than caller supplied edges
+    :param bin_count: Bin count
+    :param min_price: Min price
+    :param max_price: Max price
+    :param sketch: Price sketch of the transactions, needed for quantile bins
+    :return: Ascending bin edges, from the min to the max price
+    """
+    if binning == LINEAR_BINNING:
+        return [min_price, max_price]
+    if binning == LOG_BINNING:
+        # Prices are at least 1 for the logarithmic scale
+        low_price: int = max(min_price, 1)
+        inner_edges: list[int] = [round(low_price * (max(max_price, 1) / low_price) ** (idx / bin_count))
+                                  for idx in range(1, bin_count)]
+    else:
+        # Estimated quantiles are within the relative accuracy of the sketch, so bins have nearly equal counts
+        inner_edges = [round(sketch.get_quantile(idx / bin_count)) for idx in range(1, bin_count)]
+    edges: list[int] = [min_price] + sorted({edge for edge in inner_edges if min_price < edge < max_price}) + \
+        [max_price]
+    return edges
+
+
+def parse_bin_edges(value: str) -> list[int]:
+    """
+    Parses the caller supplied bin edges
+    :param value: Comma separated prices
+    :return: Bin edges
+    :raise ValueError: If the edges are not integers, or they are not strictly ascending, or there are less than two
+    """
+    try:
+        edges: list[int] = [int(edge) for edge in value.split(",")]
+    except ValueError:
+        edges = []
+    if len(edges) < 2 or any(low_edge >= high_edge for low_edge, high_edge in zip(edges, edges[1:])):
+        raise ValueError("Edges parameter should be at least two strictly ascending comma separated prices.")
+    return edges
+
+
+def get_bin_ranges_of_edges(edges: list[int]) -> list[tuple[int, int]]:
+    """
+    Gets the bins between the edges
+    :param edges: Ascending bin edges
+    :return: Start and end prices of each bin
+    """
+    return list(zip(edges, edges[1:]))
+
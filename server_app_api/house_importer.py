@@ -1,10 +1,430 @@
-from datetime import datetime
+import csv
+import io
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from multiprocessing import Pool
+from typing import Iterator, Iterable, Callable, Optional
 
 import requests
+from django.db.models import Case, When, Value, OuterRef, Subquery
+from django.db.models.functions import Least, Substr, StrIndex
 # Data may have too many rows, and we may want to limit the imported rows for migration
 # Give import limit as -1, not to limit the rows to be imported
 from requests import Response
 
+from server_app_api.cache import bump_data_version, bump_data_versions, get_postal_code_scope
+from server_app_api.models import GEOGRAPHIC_AREA_FIELDS, POSTAL_DISTRICT_LENGTH, get_postal_district
+from server_app_api.rollups import rebuild_monthly_rollups, refresh_monthly_rollups, rebuild_area_monthly_rollups, \
+    refresh_area_monthly_rollups, get_month
+
+RECORD_STATUS_COLUMN = 15
+ADDED_RECORD_STATUS = "A"
+CHANGED_RECORD_STATUS = "C"
+DELETED_RECORD_STATUS = "D"
+
+# House model fields in the order of the values parsed from price paid rows
+HOUSE_FIELDS: tuple[str, ...] = ("house_uuid", "postal_code", "primary_addressable_object_name",
+                                 "secondary_addressable_object_name", "sell_price", "sell_date", "address_street",
+                                 "address_locality", "address_town", "address_county", "address_city", "house_type",
+                                 "postal_district")
+
+# Dictionary encoded address columns which are written after the parsed house fields
+HOUSE_AREA_FIELDS: tuple[str, ...] = tuple(area_field for _, area_field in GEOGRAPHIC_AREA_FIELDS.values())
+AREA_NAME_CHUNK_SIZE: int = 500
+# Marker of null values in the CSV data of COPY, unquoted empty fields are null in the CSV format of PostgreSQL
+COPY_NULL: str = "\\N"
+# Count of the batches which are read and parsed ahead of the writer for each parser process
+IN_FLIGHT_BATCHES_PER_WORKER: int = 2
+
+
+def parse_house_fields(fields: list[str]) -> tuple:
+    """
+    Parses the columns of a price paid row into house field values
+    :param fields: Columns of the price paid row
+    :return: Values in the order of HOUSE_FIELDS
+    """
+    return (fields[0].replace("{", "").replace("}", ""),
+            fields[3],
+            fields[8],
+            fields[10],
+            int(fields[1]),
+            datetime.strptime(fields[2], "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc),
+            fields[9],
+            fields[10],
+            fields[11],
+            fields[12],
+            fields[13],
+            fields[4],
+            get_postal_district(fields[3]))
+
+
+def parse_house_lines(lines: list[str]) -> list[tuple]:
+    """
+    Parses price paid CSV lines, quoted columns may contain commas
+    :param lines: CSV lines
+    :return: House field values of each line
+    """
+    return [parse_house_fields(fields) for fields in csv.reader(lines) if fields]
+
+
+def parse_house_update_lines(lines: list[str]) -> list[tuple[str, tuple]]:
+    """
+    Parses price paid monthly update CSV lines, which contain added, changed and deleted records
+    :param lines: CSV lines
+    :return: Record status and house field values of each line
+    """
+    return [(fields[RECORD_STATUS_COLUMN], parse_house_fields(fields)) for fields in csv.reader(lines) if fields]
+
+
+def get_rollup_group(postal_code: str, sell_date: datetime, house_type: str) -> tuple:
+    """
+    Gets the monthly rollup group of a house
+    :param postal_code: Postal code
+    :param sell_date: Sell date
+    :param house_type: House type
+    :return: Rollup group as (postal_code, month_year_date, house_type)
+    """
+    return postal_code, get_month(sell_date), house_type
+
+
+def read_lines(source: str) -> Iterator[str]:
+    """
+    Streams the lines of a price paid file
+    :param source: Url or local path of the file
+    :return: Iterator of lines
+    """
+    if source.startswith(("http://", "https://")):
+        req: Response = requests.get(source, stream=True)
+        req.raise_for_status()
+        for chunk in req.iter_lines():
+            if chunk:
+                yield chunk.decode("utf-8")
+    else:
+        with open(source, encoding="utf-8", newline="") as source_file:
+            for line in source_file:
+                if line.strip():
+                    yield line
+
+
+def read_batches(lines: Iterable[str], batch_size: int, skip_count: int = 0, import_limit: int = -1) -> \
+        Iterator[list[str]]:
+    """
+    Groups the lines into batches
+    :param lines: Lines
+    :param batch_size: Count of lines in each batch
+    :param skip_count: Count of leading lines to skip, which are imported before
+    :param import_limit: Count of lines to import after the skipped ones, -1 for limitless import
+    :return: Iterator of batches
+    """
+    batch: list[str] = []
+    read_count: int = 0
+    for line_index, line in enumerate(lines):
+        if line_index < skip_count:
+            continue
+        if import_limit != -1 and read_count >= import_limit:
+            break
+        batch.append(line)
+        read_count = read_count + 1
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class GeographicAreaDictionary:
+    """
+    Ids of the names of the geographic areas, kept for the whole import. Areas of the names which are not in the
+    dictionary are created for each batch with one insert.
+    """
+
+    def __init__(self, area_model, connection):
+        self.area_model = area_model
+        self.alias: str = connection.alias
+        self.address_indexes: list[tuple[str, int]] = [(area_level, HOUSE_FIELDS.index(address_field))
+                                                       for area_level, (address_field, _)
+                                                       in GEOGRAPHIC_AREA_FIELDS.items()]
+        self.area_ids: dict[tuple[str, str], int] = {}
+
+    def encode(self, rows: list[tuple]) -> list[tuple]:
+        """
+        Appends the area ids of the address columns to the house field values, empty names have no area
+        :param rows: House field values
+        :return: House field values followed by the values of HOUSE_AREA_FIELDS
+        """
+        missing_names: set[tuple[str, str]] = {(area_level, row[index]) for area_level, index in self.address_indexes
+                                               for row in rows if row[index]} - self.area_ids.keys()
+        if missing_names:
+            areas = self.area_model.objects.using(self.alias)
+            areas.bulk_create([self.area_model(level=area_level, name=name) for area_level, name in missing_names],
+                              ignore_conflicts=True)
+            # Ids are read back, as they are not returned for ignored conflicts
+            for area_level, _ in self.address_indexes:
+                names: list[str] = sorted(name for name_level, name in missing_names if name_level == area_level)
+                for chunk_start in range(0, len(names), AREA_NAME_CHUNK_SIZE):
+                    for area_id, name in areas.filter(level=area_level, name__in=names[
+                            chunk_start:chunk_start + AREA_NAME_CHUNK_SIZE]).values_list("pk", "name"):
+                        self.area_ids[(area_level, name)] = area_id
+        return [row + tuple(self.area_ids.get((area_level, row[index])) for area_level, index in self.address_indexes)
+                for row in rows]
+
+
+class HouseBatchWriter:
+    """
+    Writes batches of house field values with raw SQL, bypassing model instance creation. PostgreSQL uses COPY, other
+    databases use executemany, each batch is written in its own transaction. Address columns are dictionary encoded
+    while writing.
+    """
+
+    def __init__(self, house_model, connection):
+        self.connection = connection
+        self.table: str = connection.ops.quote_name(house_model._meta.db_table)
+        self.columns: list[str] = [connection.ops.quote_name(house_model._meta.get_field(field).column)
+                                   for field in HOUSE_FIELDS + HOUSE_AREA_FIELDS]
+        self.date_index: int = HOUSE_FIELDS.index("sell_date")
+        self.area_dictionary: GeographicAreaDictionary = GeographicAreaDictionary(
+            house_model._meta.get_field(HOUSE_AREA_FIELDS[0]).related_model, connection)
+
+    def write(self, rows: list[tuple]) -> None:
+        from django.db import transaction
+
+        with transaction.atomic(using=self.connection.alias):
+            self.insert(rows)
+
+    def write_updates(self, house_model, updates: list[tuple[str, tuple]]) -> set[tuple]:
+        """
+        Applies the records of a monthly update in one transaction, changed and deleted houses are found by their
+        uuids and deleted, then added and changed houses are inserted
+        :param house_model: House model class
+        :param updates: Record status and house field values of each record
+        :return: Monthly rollup groups of the houses before and after the update
+        """
+        from django.db import transaction
+
+        uuid_index: int = HOUSE_FIELDS.index("house_uuid")
+        group_indexes: tuple[int, ...] = tuple(HOUSE_FIELDS.index(field)
+                                               for field in ("postal_code", "sell_date", "house_type"))
+        uuids: list[str] = [values[uuid_index] for _, values in updates]
+        rows: list[tuple] = [values for record_status, values in updates if record_status != DELETED_RECORD_STATUS]
+        with transaction.atomic(using=self.connection.alias):
+            existing_houses = house_model.objects.using(self.connection.alias).filter(house_uuid__in=uuids)
+            groups: set[tuple] = {get_rollup_group(*values) for values in existing_houses.values_list(
+                "postal_code", "sell_date", "house_type")}
+            existing_houses.delete()
+            self.insert(rows)
+        groups.update(get_rollup_group(*[row[index] for index in group_indexes]) for row in rows)
+        return groups
+
+    def insert(self, rows: list[tuple]) -> None:
+        rows = self.area_dictionary.encode(rows)
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == "postgresql":
+                self.copy(cursor, rows)
+            else:
+                self.execute_many(cursor, rows)
+
+    def execute_many(self, cursor, rows: list[tuple]) -> None:
+        statement: str = f"INSERT INTO {self.table} ({', '.join(self.columns)}) " \
+                         f"VALUES ({', '.join(['%s'] * len(self.columns))})"
+        adapt_date: Callable = self.connection.ops.adapt_datetimefield_value
+        cursor.executemany(statement, [row[:self.date_index] + (adapt_date(row[self.date_index]),) +
+                                       row[self.date_index + 1:] for row in rows])
+
+    def copy(self, cursor, rows: list[tuple]) -> None:
+        buffer: io.StringIO = io.StringIO()
+        # Empty strings are written unquoted, so nulls are given by their own marker
+        csv.writer(buffer).writerows(tuple(COPY_NULL if value is None else value for value in row) for row in rows)
+        statement: str = f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN " \
+                         f"WITH (FORMAT csv, NULL '{COPY_NULL}')"
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, "copy_expert"):
+            # psycopg2
+            buffer.seek(0)
+            raw_cursor.copy_expert(statement, buffer)
+        else:
+            # psycopg 3
+            with raw_cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+
+
+class ImportCheckpoint:
+    """
+    Count of the imported lines of a source, stored in a file to resume the import after a failure
+    """
+
+    def __init__(self, path: str, source: str):
+        self.path: str = path
+        self.source: str = source
+
+    def load(self) -> int:
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as checkpoint_file:
+            checkpoint: dict = json.load(checkpoint_file)
+        return checkpoint["offset"] if checkpoint.get("source") == self.source else 0
+
+    def save(self, offset: int) -> None:
+        if not self.path:
+            return
+        temp_path: str = f"{self.path}.tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump({"source": self.source, "offset": offset}, checkpoint_file)
+        os.replace(temp_path, self.path)
+
+    def clear(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def parse_batches_in_pool(pool: Pool, parse: Callable[[list[str]], list], batches: Iterable[list[str]],
+                          in_flight_count: int) -> Iterator[list]:
+    """
+    Parses the batches in the worker pool in their order. Only a bounded count of batches is read ahead of the
+    consumer, so the lines of a large file are not all read into memory when the writer is slower than the parsers.
+    :param pool: Worker pool
+    :param parse: Function which parses the lines of a batch
+    :param batches: Batches of lines
+    :param in_flight_count: Count of the batches which are read and not yet consumed
+    :return: Parsed rows of each batch
+    """
+    pending_results: deque = deque()
+    for batch in batches:
+        pending_results.append(pool.apply_async(parse, (batch,)))
+        if len(pending_results) >= in_flight_count:
+            yield pending_results.popleft().get()
+    while pending_results:
+        yield pending_results.popleft().get()
+
+
+def rebuild_rollups(log: Callable[[str], None] = print) -> None:
+    """
+    Rebuilds the monthly rollups of the postal codes and of the geographic areas from the house data
+    :param log: Function to report progress
+    :return: None
+    """
+    from server_app_api.models import HousePersistenceModel, MonthlyRollupPersistenceModel, \
+        AreaMonthlyRollupPersistenceModel
+
+    log(f"Rebuilding monthly rollups: {rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)}")
+    log(f"Rebuilding area monthly rollups: "
+        f"{rebuild_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel)}")
+
+
+def import_houses(source: str, batch_size: int, worker_count: int, checkpoint_path: str = "",
+                  import_limit: int = -1, incremental: bool = False, log: Callable[[str], None] = print) -> int:
+    """
+    Imports houses from a price paid file, lines are parsed in a worker pool and written in batches. Progress is saved
+    to the checkpoint after each batch, and import resumes from the checkpoint of the same source.
+    Incremental imports apply monthly update files, then refresh only the changed rollups and cached queries.
+    :param source: Url or local path of the file
+    :param batch_size: Count of lines in each batch
+    :param worker_count: Count of parser processes, 1 to parse in the importing process
+    :param checkpoint_path: Path of the checkpoint file, empty not to use checkpoints
+    :param import_limit: Line limit for import, -1 for limitless import
+    :param incremental: True if the file is a monthly update file with added, changed and deleted records
+    :param log: Function to report progress
+    :return: Count of imported rows
+    """
+    from django.db import connection
+    from server_app_api.columnar import export_columnar_snapshot
+    from server_app_api.models import HousePersistenceModel, MonthlyRollupPersistenceModel, \
+        AreaMonthlyRollupPersistenceModel, ImportRunPersistenceModel
+
+    checkpoint: ImportCheckpoint = ImportCheckpoint(checkpoint_path, source)
+    offset: int = checkpoint.load()
+    if offset:
+        log(f"Resuming import from line {offset}")
+    writer: HouseBatchWriter = HouseBatchWriter(HousePersistenceModel, connection)
+    batches: Iterator[list[str]] = read_batches(read_lines(source), batch_size, offset, import_limit)
+    parse: Callable[[list[str]], list] = parse_house_update_lines if incremental else parse_house_lines
+
+    pool: Optional[Pool] = Pool(worker_count) if worker_count > 1 else None
+    imported_count: int = 0
+    changed_groups: set[tuple] = set()
+    start_time: float = time.perf_counter()
+    try:
+        parsed_batches: Iterable[list] = parse_batches_in_pool(
+            pool, parse, batches, worker_count * IN_FLIGHT_BATCHES_PER_WORKER) if pool else map(parse, batches)
+        for rows in parsed_batches:
+            if incremental:
+                changed_groups.update(writer.write_updates(HousePersistenceModel, rows))
+            else:
+                writer.write(rows)
+            imported_count = imported_count + len(rows)
+            checkpoint.save(offset + imported_count)
+            elapsed_time: float = time.perf_counter() - start_time
+            log(f"Imported rows: {offset + imported_count} ({imported_count / elapsed_time:.0f} rows/sec)")
+    finally:
+        if pool:
+            pool.terminate()
+    write_seconds: float = time.perf_counter() - start_time
+
+    if incremental:
+        # Changed groups of a resumed import before the failure are not known, so they are refreshed on a full
+        # rollup rebuild
+        if offset:
+            rebuild_rollups(log)
+            bump_data_version()
+        else:
+            log(f"Refreshing monthly rollups: "
+                f"{refresh_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel, changed_groups)}")
+            area_rollup_count: int = refresh_area_monthly_rollups(HousePersistenceModel,
+                                                                  AreaMonthlyRollupPersistenceModel,
+                                                                  {group[1] for group in changed_groups})
+            log(f"Refreshing area monthly rollups: {area_rollup_count}")
+            bump_data_versions({get_postal_code_scope(group[0]) for group in changed_groups} |
+                               {get_postal_code_scope("")})
+    else:
+        rebuild_rollups(log)
+        bump_data_version()
+    snapshot_path: Optional[str] = export_columnar_snapshot()
+    if snapshot_path:
+        log(f"Exported columnar snapshot: {snapshot_path}")
+    checkpoint.clear()
+    # Throughput of the last import is served by the metrics endpoint
+    ImportRunPersistenceModel.objects.create(source=source[:500], incremental=incremental, row_count=imported_count,
+                                             duration_seconds=write_seconds)
+    return imported_count
+
+
+def fill_postal_districts(apps, schema_editor):
+    """
+    Method for filling the postal districts of the imported houses and rollups during the migration process
+    :param apps: apps container
+    :param schema_editor: schema editor instance
+    :return: None
+    """
+    for model_name in ("HousePersistenceModel", "MonthlyRollupPersistenceModel"):
+        model = apps.get_model("server_app_api", model_name)
+        # District is the part of the postal code before the space, or the whole postal code if it has no space,
+        # truncated to the length of the outward codes as get_postal_district does
+        model.objects.update(postal_district=Case(
+            When(postal_code__contains=" ", then=Substr("postal_code", 1, Least(
+                StrIndex("postal_code", Value(" ")) - 1, Value(POSTAL_DISTRICT_LENGTH)))),
+            default=Substr("postal_code", 1, POSTAL_DISTRICT_LENGTH)))
+
+
+def fill_geographic_areas(apps, schema_editor):
+    """
+    Method for filling the dictionary of the geographic areas from the address columns of the imported houses, and
+    the area ids of the houses during the migration process
+    :param apps: apps container
+    :param schema_editor: schema editor instance
+    :return: None
+    """
+    house_model = apps.get_model("server_app_api", "HousePersistenceModel")
+    area_model = apps.get_model("server_app_api", "GeographicAreaPersistenceModel")
+    for area_level, (address_field, area_field) in GEOGRAPHIC_AREA_FIELDS.items():
+        names: Iterable[str] = house_model.objects.exclude(**{address_field: ""}).values_list(
+            address_field, flat=True).distinct().order_by().iterator()
+        area_model.objects.bulk_create([area_model(level=area_level, name=name) for name in names],
+                                       batch_size=AREA_NAME_CHUNK_SIZE, ignore_conflicts=True)
+        house_model.objects.update(**{area_field: Subquery(area_model.objects.filter(
+            level=area_level, name=OuterRef(address_field)).values("pk")[:1])})
+
 
 def import_house_items(apps, schema_editor, import_limit: int, bulk_commit_size: int, file_url: str):
     """
@@ -15,37 +435,23 @@ def import_house_items(apps, schema_editor, import_limit: int, bulk_commit_size:
     :param file_url: url to import data from
     :return: None
     """
+    if not file_url:
+        print("No url is given to import data from, skipping the import.")
+        return
     if import_limit != -1:
         print("Importing limited count of rows:", import_limit)
     HousePersistenceModel = apps.get_model("server_app_api", "HousePersistenceModel")
-    req: Response = requests.get(file_url, stream=True)
+    # Historical model of the migration may not have the fields added by the later migrations, which fill them
+    model_fields: set[str] = {model_field.name for model_field in HousePersistenceModel._meta.get_fields()}
+    field_indexes: list[tuple[str, int]] = [(field, index) for index, field in enumerate(HOUSE_FIELDS)
+                                            if field in model_fields]
     total_record_count: int = 0
 
-    bulk_elements: list[HousePersistenceModel] = []
-    for chunk in req.iter_lines():
-        # writing one chunk at a time to db
-        if chunk:
-            data: str = chunk.decode("utf-8")
-            fields: [str] = data.replace("\"", "").split(",")
-            bulk_elements.append(HousePersistenceModel(house_uuid=fields[0].replace("{", "").replace("}", ""),
-                                                       postal_code=fields[3],
-                                                       primary_addressable_object_name=fields[8],
-                                                       secondary_addressable_object_name=fields[10],
-                                                       sell_price=int(fields[1]),
-                                                       sell_date=datetime.strptime(fields[2], "%Y-%m-%d %H:%M"),
-                                                       address_street=fields[9],
-                                                       address_locality=fields[10],
-                                                       address_town=fields[11],
-                                                       address_county=fields[12],
-                                                       address_city=fields[13],
-                                                       house_type=fields[4],
-                                                       ))
-            total_record_count = total_record_count + 1
-            if total_record_count % bulk_commit_size == 0:
-                HousePersistenceModel.objects.bulk_create(bulk_elements)
-                bulk_elements = []
-                print("Importing row:", total_record_count)
-                if import_limit != -1 and total_record_count > import_limit:
-                    break
-    # import trailing bulk
-    HousePersistenceModel.objects.bulk_create(bulk_elements)
+    # writing one batch at a time to db
+    for batch in read_batches(read_lines(file_url), bulk_commit_size, import_limit=import_limit):
+        HousePersistenceModel.objects.bulk_create([HousePersistenceModel(**{field: values[index]
+                                                                            for field, index in field_indexes})
+                                                   for values in parse_house_lines(batch)])
+        total_record_count = total_record_count + len(batch)
+        print("Importing row:", total_record_count)
+    # Rollups of the imported houses are built by the later migrations which create them, 0005, 0009 and 0011
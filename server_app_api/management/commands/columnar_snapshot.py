@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from server_app_api.columnar import ColumnarHouseData
+
+
+class Command(BaseCommand):
+    help = "Exports the house data as a columnar snapshot, which is swapped in by the workers without restarting."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", default="",
+                            help="Snapshot directory, COLUMNAR_SNAPSHOT_DIR setting is used if not given")
+
+    def handle(self, *args, **options):
+        directory: str = options["directory"] or settings.COLUMNAR_SNAPSHOT_DIR
+        if not directory:
+            raise CommandError("Snapshot directory should be given with --directory or COLUMNAR_SNAPSHOT_DIR.")
+        self.stdout.write(self.style.SUCCESS(f"Exported {ColumnarHouseData.load().save_snapshot(directory)}"))
@@ -0,0 +1,27 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from server_app_api.house_importer import import_houses
+
+
+class Command(BaseCommand):
+    help = "Imports houses from a price paid CSV file, given as a url or a local path."
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="Url or local path of the price paid CSV file")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Count of rows written in each transaction")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Count of parser processes, 1 to parse in the importing process")
+        parser.add_argument("--checkpoint", default="",
+                            help="File to save the import progress, import resumes from it after a failure")
+        parser.add_argument("--limit", type=int, default=-1, help="Row limit for import, -1 for limitless import")
+        parser.add_argument("--incremental", action="store_true",
+                            help="Applies a monthly update file, whose records are added, changed or deleted by uuid")
+
+    def handle(self, *args, **options):
+        imported_count: int = import_houses(source=options["source"], batch_size=options["batch_size"],
+                                            worker_count=options["workers"], checkpoint_path=options["checkpoint"],
+                                            import_limit=options["limit"], incremental=options["incremental"],
+                                            log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported_count} rows."))
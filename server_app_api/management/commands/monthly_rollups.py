@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from server_app_api.cache import bump_data_version
+from server_app_api.models import HousePersistenceModel, MonthlyRollupPersistenceModel, \
+    AreaMonthlyRollupPersistenceModel
+from server_app_api.rollups import rebuild_monthly_rollups, rebuild_area_monthly_rollups, validate_monthly_rollups, \
+    validate_area_monthly_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds or validates the monthly rollups of the postal codes and the geographic areas against the house " \
+           "data."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["rebuild", "validate"], help="Action to run on the monthly rollups")
+
+    def handle(self, *args, **options):
+        if options["action"] == "rebuild":
+            rollup_count: int = rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+            area_rollup_count: int = rebuild_area_monthly_rollups(HousePersistenceModel,
+                                                                  AreaMonthlyRollupPersistenceModel)
+            bump_data_version()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {rollup_count} monthly rollups and {area_rollup_count} "
+                                                 f"area monthly rollups."))
+            return
+
+        mismatches: list[str] = validate_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel) + \
+            validate_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel)
+        for mismatch in mismatches:
+            self.stderr.write(mismatch)
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} monthly rollups do not match the house data.")
+        self.stdout.write(self.style.SUCCESS("Monthly rollups match the house data."))
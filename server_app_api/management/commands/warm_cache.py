@@ -0,0 +1,77 @@
+import os
+from typing import Callable, Iterator, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+
+from server_app_api.cache import get_query_cache
+from server_app_api.cache_warming import get_top_paths_of_access_logs, get_top_paths_of_postal_codes, \
+    get_url_requester, request_in_process, warm_cache, DEFAULT_BIN_COUNT, DEFAULT_MONTH_COUNT
+from server_app_api.columnar import export_columnar_snapshot, get_columnar_house_data
+
+
+class Command(BaseCommand):
+    help = "Replays the most frequent queries after an import, so that their results are cached before the users " \
+           "request them. Queries are taken from the access logs, or made for the postal codes with the most " \
+           "transactions. Query cache should be shared by the workers of the server, with the django query cache " \
+           "backend and a shared cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--access-log", action="append", default=[],
+                            help="Access log file of the web server, can be given multiple times")
+        parser.add_argument("--top", type=int, default=100, help="Count of the most frequent queries to replay")
+        parser.add_argument("--workers", type=int, default=4, help="Count of concurrent requests")
+        parser.add_argument("--base-url", default="",
+                            help="Url of the running server to request, such as http://localhost:8000, queries run "
+                                 "in this process if not given")
+        parser.add_argument("--server-workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", 1)),
+                            help="Count of the worker processes of the server, WEB_CONCURRENCY by default as gunicorn "
+                                 "does")
+        parser.add_argument("--timeout", type=float, default=60.0, help="Timeout of each request in seconds")
+        parser.add_argument("--bin-count", type=int, default=DEFAULT_BIN_COUNT,
+                            help="Bin count of the histogram queries made for the postal codes")
+        parser.add_argument("--months", type=int, default=DEFAULT_MONTH_COUNT,
+                            help="Count of the last months of the period queries made for the postal codes")
+
+    @staticmethod
+    def read_lines(file_paths: list[str]) -> Iterator[str]:
+        """
+        Reads the lines of the files one by one, so that large logs are not kept in memory
+        :param file_paths: Paths of the files
+        :return: Lines
+        """
+        for file_path in file_paths:
+            with open(file_path, errors="replace") as lines:
+                yield from lines
+
+    def handle(self, *args, **options):
+        # Entries of a process local cache are served only by the process which computed them, so a server with
+        # more workers would stay cold in the workers which did not serve the warming requests
+        if get_query_cache().is_process_local() and (not options["base_url"] or options["server_workers"] > 1):
+            raise CommandError("Query cache is kept in each process, warmed queries would be served only by the "
+                               "process which ran them. Use the django query cache backend with a shared cache such "
+                               "as Redis or Memcached, or give the url of a single worker server with --base-url.")
+        snapshot_path: Optional[str] = export_columnar_snapshot(stale_only=True)
+        if snapshot_path:
+            self.stdout.write(f"Columnar snapshot is current: {snapshot_path}")
+
+        if options["access_log"]:
+            paths: list[str] = get_top_paths_of_access_logs(self.read_lines(options["access_log"]), options["top"])
+        else:
+            paths = get_top_paths_of_postal_codes(options["top"], options["bin_count"], options["months"])
+
+        if options["base_url"]:
+            request: Callable[[str], int] = get_url_requester(options["base_url"], options["timeout"])
+        else:
+            # Columnar data is loaded once before the threads request it
+            get_columnar_house_data()
+            request = request_in_process
+        failed_count: int = 0
+        for path, status_code, seconds in warm_cache(paths, options["workers"], request):
+            if status_code != 200:
+                failed_count = failed_count + 1
+                self.stderr.write(f"{path} responded with status {status_code}")
+            elif options["verbosity"] > 1:
+                self.stdout.write(f"{path}: {seconds * 1000:.1f} ms")
+        if failed_count:
+            raise CommandError(f"{failed_count} of {len(paths)} queries failed.")
+        self.stdout.write(self.style.SUCCESS(f"Warmed {len(paths)} queries."))
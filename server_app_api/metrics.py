@@ -0,0 +1,290 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+LATENCY_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS: tuple[float, ...] = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RequestMetrics:
+    """
+    Database and serialization time of a request. It is shared by the threads that the request runs its queries on,
+    so it is updated under a lock.
+    """
+
+    def __init__(self):
+        self.query_count: int = 0
+        self.db_seconds: float = 0.0
+        self.serialize_seconds: float = 0.0
+        self.lock: threading.Lock = threading.Lock()
+
+    def add_query(self, seconds: float):
+        """
+        Counts a database query
+        :param seconds: Time of the query
+        """
+        with self.lock:
+            self.query_count = self.query_count + 1
+            self.db_seconds = self.db_seconds + seconds
+
+    def add_serialization(self, seconds: float):
+        """
+        Adds the time of encoding a response
+        :param seconds: Time of the encoding
+        """
+        with self.lock:
+            self.serialize_seconds = self.serialize_seconds + seconds
+
+
+_request_metrics: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("request_metrics",
+                                                                                         default=None)
+
+
+def get_request_metrics() -> Optional[RequestMetrics]:
+    """
+    Gets the metrics of the current request, context is copied to the threads of the async views' queries
+    :return: Request metrics, None out of requests
+    """
+    return _request_metrics.get()
+
+
+def record_query(execute: Callable, sql: str, params: Any, many: bool, context: dict) -> Any:
+    """
+    Database execute wrapper, which counts the queries and their time in the metrics of the current request
+    :param execute: Next execute function
+    :param sql: SQL of the query
+    :param params: Parameters of the query
+    :param many: True for executemany
+    :param context: Connection and cursor of the query
+    :return: Result of the execute function
+    """
+    request_metrics: Optional[RequestMetrics] = _request_metrics.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    start_time: float = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        request_metrics.add_query(time.perf_counter() - start_time)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """
+    Adds the query recorder to each new database connection, including the connections of the async query threads
+    :param sender: Database wrapper class
+    :param connection: Database wrapper of the connection
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the form of Prometheus histograms
+    """
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets: tuple[float, ...] = buckets
+        self.bucket_counts: list[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float):
+        """
+        Counts the value in its bucket
+        :param value: Observed value
+        """
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.sum = self.sum + value
+        self.count = self.count + 1
+
+    def get_lines(self, name: str, labels: str) -> list[str]:
+        """
+        Gets the sample lines of the histogram
+        :param name: Metric name
+        :param labels: Formatted labels of the histogram, without braces
+        :return: Bucket, sum and count lines
+        """
+        lines: list[str] = []
+        cumulative_count: int = 0
+        for bucket, bucket_count in zip((*self.buckets, "+Inf"), self.bucket_counts):
+            cumulative_count = cumulative_count + bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative_count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def format_label(value: str) -> str:
+    """
+    Escapes a label value of the Prometheus text format
+    :param value: Label value
+    :return: Escaped value
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """
+    Request metrics of the serving process by route. Each process keeps its own metrics, as the query cache does.
+    """
+
+    def __init__(self):
+        self.request_counts: dict[tuple[str, str, int], int] = {}
+        self.latencies: dict[str, Histogram] = {}
+        self.query_counts: dict[str, Histogram] = {}
+        self.db_latencies: dict[str, Histogram] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def observe_request(self, route: str, method: str, status_code: int, seconds: float,
+                        request_metrics: RequestMetrics):
+        """
+        Records a finished request
+        :param route: Route of the matched url pattern, empty for unmatched urls
+        :param method: HTTP method
+        :param status_code: Response status code
+        :param seconds: Total time of the request
+        :param request_metrics: Database metrics of the request
+        """
+        with self.lock:
+            key: tuple[str, str, int] = (route, method, status_code)
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+            if route not in self.latencies:
+                self.latencies[route] = Histogram(LATENCY_BUCKETS)
+                self.query_counts[route] = Histogram(QUERY_COUNT_BUCKETS)
+                self.db_latencies[route] = Histogram(LATENCY_BUCKETS)
+            self.latencies[route].observe(seconds)
+            self.query_counts[route].observe(request_metrics.query_count)
+            self.db_latencies[route].observe(request_metrics.db_seconds)
+
+    def clear(self):
+        """
+        Clears all metrics
+        """
+        with self.lock:
+            self.request_counts.clear()
+            self.latencies.clear()
+            self.query_counts.clear()
+            self.db_latencies.clear()
+
+    def get_lines(self) -> list[str]:
+        """
+        Gets the request metrics in Prometheus text format
+        :return: Lines of the metrics
+        """
+        with self.lock:
+            lines: list[str] = ["# HELP http_requests_total Count of the requests by route, method and status code.",
+                                "# TYPE http_requests_total counter"]
+            for (route, method, status_code), count in sorted(self.request_counts.items()):
+                lines.append(f'http_requests_total{{route="{format_label(route)}",method="{method}",'
+                             f'status="{status_code}"}} {count}')
+            for name, description, histograms in (
+                    ("http_request_duration_seconds", "Latency of the requests by route.", self.latencies),
+                    ("http_request_db_queries", "Count of the database queries of each request by route.",
+                     self.query_counts),
+                    ("http_request_db_duration_seconds", "Database time of each request by route.",
+                     self.db_latencies)):
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for route, histogram in sorted(histograms.items()):
+                    lines.extend(histogram.get_lines(name, f'route="{format_label(route)}"'))
+        return lines
+
+
+metrics_registry: MetricsRegistry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """
+    Records the latency, database query count and database time of each request by route. When SERVER_TIMING setting
+    is set, responses get a Server-Timing header with the db, serialize and total times. Queries of streaming responses
+    run after the response is returned, so they are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable):
+        self.get_response: Callable = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics: RequestMetrics = RequestMetrics()
+        token: contextvars.Token = _request_metrics.set(request_metrics)
+        start_time: float = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        return self.finish(request, response, request_metrics, time.perf_counter() - start_time)
+
+    async def __acall__(self, request):
+        request_metrics: RequestMetrics = RequestMetrics()
+        token: contextvars.Token = _request_metrics.set(request_metrics)
+        start_time: float = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        return self.finish(request, response, request_metrics, time.perf_counter() - start_time)
+
+    @staticmethod
+    def finish(request, response, request_metrics: RequestMetrics, seconds: float):
+        """
+        Records the request and adds the Server-Timing header
+        :param request: Request
+        :param response: Response
+        :param request_metrics: Database and serialization metrics of the request
+        :param seconds: Total time of the request
+        :return: Response
+        """
+        resolver_match = getattr(request, "resolver_match", None)
+        metrics_registry.observe_request(resolver_match.route if resolver_match else "", request.method,
+                                         response.status_code, seconds, request_metrics)
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = f"db;dur={request_metrics.db_seconds * 1000:.2f}, " \
+                                        f"serialize;dur={request_metrics.serialize_seconds * 1000:.2f}, " \
+                                        f"total;dur={seconds * 1000:.2f}"
+        return response
+
+
+def get_metrics_text() -> str:
+    """
+    Gets the metrics of the serving process in Prometheus text format: request metrics by route, query cache
+    statistics, and the throughput of the last house import
+    :return: Metrics text
+    """
+    from .cache import get_query_cache
+    from .models import ImportRunPersistenceModel
+
+    lines: list[str] = metrics_registry.get_lines()
+    cache_stats: dict[str, Any] = get_query_cache().stats()
+    backend: str = format_label(cache_stats["backend"])
+    for name, metric_type, description, value in (
+            ("query_cache_hits_total", "counter", "Count of the query cache hits.", cache_stats["hits"]),
+            ("query_cache_misses_total", "counter", "Count of the query cache misses.", cache_stats["misses"]),
+            ("query_cache_hit_ratio", "gauge", "Ratio of the query cache hits.", cache_stats["hit_rate"]),
+            ("query_cache_entries", "gauge", "Count of the query cache entries.", cache_stats["size"] or 0)):
+        lines.extend([f"# HELP {name} {description}", f"# TYPE {name} {metric_type}",
+                      f'{name}{{backend="{backend}"}} {value}'])
+
+    last_import: Optional[ImportRunPersistenceModel] = ImportRunPersistenceModel.objects.order_by("-id").first()
+    if last_import is not None:
+        labels: str = f'incremental="{str(last_import.incremental).lower()}"'
+        for name, description, value in (
+                ("house_import_rows", "Count of the rows of the last house import.", last_import.row_count),
+                ("house_import_duration_seconds", "Duration of the last house import.", last_import.duration_seconds),
+                ("house_import_rows_per_second", "Throughput of the last house import.",
+                 last_import.row_count / last_import.duration_seconds if last_import.duration_seconds else 0.0),
+                ("house_import_finished_timestamp_seconds", "Time that the last house import finished.",
+                 last_import.finished_at.timestamp())):
+            lines.extend([f"# HELP {name} {description}", f"# TYPE {name} gauge", f"{name}{{{labels}}} {value}"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0003_auto_20220412_1334'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['postal_code', 'sell_date', 'house_type', 'sell_price'], name='house_postcode_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['sell_date', 'house_type', 'sell_price'], name='house_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['house_type', 'sell_date'], name='house_type_date_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+from server_app_api.rollups import rebuild_monthly_rollups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0004_house_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollupPersistenceModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('postal_code', models.CharField(max_length=10)),
+                ('month_year_date', models.DateTimeField()),
+                ('house_type', models.CharField(choices=[('F', 'flats'), ('S', 'semi-detached'), ('D', 'detached'), ('T', 'terraced')], default='F', max_length=1)),
+                ('transaction_count', models.PositiveIntegerField()),
+                ('sum_sell_price', models.BigIntegerField()),
+                ('min_sell_price', models.PositiveIntegerField()),
+                ('max_sell_price', models.PositiveIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month_year_date', 'house_type'], name='rollup_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrolluppersistencemodel',
+            constraint=models.UniqueConstraint(fields=('postal_code', 'month_year_date', 'house_type'), name='rollup_unique_group'),
+        ),
+        migrations.RunPython(
+            lambda apps, schema_editor: rebuild_monthly_rollups(
+                house_model=apps.get_model("server_app_api", "HousePersistenceModel"),
+                rollup_model=apps.get_model("server_app_api", "MonthlyRollupPersistenceModel")),
+            reverse_code=migrations.RunPython.noop),
+    ]
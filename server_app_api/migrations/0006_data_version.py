@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0005_monthly_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersionPersistenceModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(default='', max_length=20, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
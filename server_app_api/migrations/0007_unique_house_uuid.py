@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0006_data_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='housepersistencemodel',
+            name='house_uuid',
+            field=models.CharField(default='', max_length=40, unique=True),
+        ),
+    ]
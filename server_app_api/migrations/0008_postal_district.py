@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+from server_app_api.house_importer import fill_postal_districts
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0007_unique_house_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='housepersistencemodel',
+            name='postal_district',
+            field=models.CharField(default='', max_length=4),
+        ),
+        migrations.AddField(
+            model_name='monthlyrolluppersistencemodel',
+            name='postal_district',
+            field=models.CharField(default='', max_length=4),
+        ),
+        migrations.RunPython(fill_postal_districts, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['postal_district', 'sell_date', 'house_type', 'sell_price'], name='house_district_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrolluppersistencemodel',
+            index=models.Index(fields=['postal_district', 'month_year_date'], name='rollup_district_date_idx'),
+        ),
+    ]
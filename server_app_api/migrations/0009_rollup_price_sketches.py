@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+from server_app_api.rollups import rebuild_monthly_rollups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0008_postal_district'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceQuantilesBusinessModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_year_date', models.DateTimeField()),
+                ('transaction_count', models.PositiveIntegerField()),
+                ('p10_sell_price', models.PositiveIntegerField()),
+                ('p50_sell_price', models.PositiveIntegerField()),
+                ('p90_sell_price', models.PositiveIntegerField()),
+            ],
+            options={
+                'managed': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='monthlyrolluppersistencemodel',
+            name='price_sketch',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(
+            lambda apps, schema_editor: rebuild_monthly_rollups(
+                house_model=apps.get_model("server_app_api", "HousePersistenceModel"),
+                rollup_model=apps.get_model("server_app_api", "MonthlyRollupPersistenceModel")),
+            reverse_code=migrations.RunPython.noop),
+    ]
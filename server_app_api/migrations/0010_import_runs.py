@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0009_rollup_price_sketches'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRunPersistenceModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500)),
+                ('incremental', models.BooleanField(default=False)),
+                ('row_count', models.PositiveBigIntegerField()),
+                ('duration_seconds', models.FloatField()),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from server_app_api.house_importer import fill_geographic_areas
+from server_app_api.rollups import rebuild_area_monthly_rollups
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('server_app_api', '0010_import_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeographicAreaPersistenceModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('town', 'town'), ('county', 'county'), ('locality', 'locality'), ('city', 'city')], max_length=10)),
+                ('name', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='geographicareapersistencemodel',
+            constraint=models.UniqueConstraint(fields=('level', 'name'), name='geographic_area_unique_name'),
+        ),
+        migrations.CreateModel(
+            name='AreaMonthlyRollupPersistenceModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('area', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='server_app_api.geographicareapersistencemodel')),
+                ('month_year_date', models.DateTimeField()),
+                ('house_type', models.CharField(choices=[('F', 'flats'), ('S', 'semi-detached'), ('D', 'detached'), ('T', 'terraced')], default='F', max_length=1)),
+                ('transaction_count', models.PositiveIntegerField()),
+                ('sum_sell_price', models.BigIntegerField()),
+                ('min_sell_price', models.PositiveIntegerField()),
+                ('max_sell_price', models.PositiveIntegerField()),
+                ('price_sketch', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='areamonthlyrolluppersistencemodel',
+            constraint=models.UniqueConstraint(fields=('area', 'month_year_date', 'house_type'), name='area_rollup_unique_group'),
+        ),
+        migrations.AddField(
+            model_name='housepersistencemodel',
+            name='town_area',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='server_app_api.geographicareapersistencemodel'),
+        ),
+        migrations.AddField(
+            model_name='housepersistencemodel',
+            name='county_area',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='server_app_api.geographicareapersistencemodel'),
+        ),
+        migrations.AddField(
+            model_name='housepersistencemodel',
+            name='locality_area',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='server_app_api.geographicareapersistencemodel'),
+        ),
+        migrations.AddField(
+            model_name='housepersistencemodel',
+            name='city_area',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='server_app_api.geographicareapersistencemodel'),
+        ),
+        migrations.RunPython(fill_geographic_areas, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['town_area', 'sell_date', 'house_type', 'sell_price'], name='house_town_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['county_area', 'sell_date', 'house_type', 'sell_price'], name='house_county_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['locality_area', 'sell_date', 'house_type', 'sell_price'], name='house_locality_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housepersistencemodel',
+            index=models.Index(fields=['city_area', 'sell_date', 'house_type', 'sell_price'], name='house_city_date_idx'),
+        ),
+        migrations.RunPython(
+            lambda apps, schema_editor: rebuild_area_monthly_rollups(
+                house_model=apps.get_model("server_app_api", "HousePersistenceModel"),
+                area_rollup_model=apps.get_model("server_app_api", "AreaMonthlyRollupPersistenceModel")),
+            reverse_code=migrations.RunPython.noop),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from typing import Iterable, Optional
+
+from django.db import DEFAULT_DB_ALIAS, models, router
 
 TERRACE_HOME_TYPE = "T"
 DETACHED_HOME_TYPE = "D"
@@ -12,12 +14,47 @@ HOUSE_TYPES = (
     (TERRACE_HOME_TYPE, "terraced")
 )
 
+# Levels of the postal areas that the query services aggregate on, district is the outward code of the postal code,
+# such as "E14", and prefix is the start of a district, such as "SW1" for "SW1A", "SW1E" and others, or the start of
+# the postal codes of a district, such as "BR1 1"
+POSTAL_CODE_AREA = "postcode"
+POSTAL_DISTRICT_AREA = "district"
+POSTAL_PREFIX_AREA = "prefix"
+# Outward codes have at most 4 characters
+POSTAL_DISTRICT_LENGTH: int = 4
+
+# Levels of the geographic areas of the address columns. Houses and their rollups refer to the areas by the ids of
+# their names, so that the free text address columns are not scanned.
+TOWN_AREA = "town"
+COUNTY_AREA = "county"
+LOCALITY_AREA = "locality"
+CITY_AREA = "city"
+GEOGRAPHIC_AREA_LEVELS: tuple[str, ...] = (TOWN_AREA, COUNTY_AREA, LOCALITY_AREA, CITY_AREA)
+# Address field that the names of each level are taken from, and the house field that refers to their areas
+GEOGRAPHIC_AREA_FIELDS: dict[str, tuple[str, str]] = {
+    TOWN_AREA: ("address_town", "town_area"),
+    COUNTY_AREA: ("address_county", "county_area"),
+    LOCALITY_AREA: ("address_locality", "locality_area"),
+    CITY_AREA: ("address_city", "city_area"),
+}
+
+
+def get_postal_district(postal_code: str) -> str:
+    """
+    Gets the district of the postal code, which is its outward code before the space. Postal codes without a space
+    are given as they are. Districts are truncated to the length of the outward codes, as fill_postal_districts does.
+    :param postal_code: Postal code
+    :return: Postal district
+    """
+    return postal_code.split(" ", 1)[0][:POSTAL_DISTRICT_LENGTH]
+
 
 class HousePersistenceModel(models.Model):
-    house_uuid = models.CharField(max_length=40, default="")
+    house_uuid = models.CharField(max_length=40, default="", unique=True)
     primary_addressable_object_name = models.CharField(max_length=50)
     secondary_addressable_object_name = models.CharField(max_length=50)
     postal_code = models.CharField(max_length=10)
+    postal_district = models.CharField(max_length=POSTAL_DISTRICT_LENGTH, default="")
     sell_price = models.PositiveIntegerField()
     sell_date = models.DateTimeField()
     address_street = models.CharField(max_length=50)
@@ -27,6 +64,88 @@ class HousePersistenceModel(models.Model):
     address_city = models.CharField(max_length=50)
 
     house_type = models.CharField(max_length=1, choices=HOUSE_TYPES, default=FLATS_HOME_TYPE)
+    # Dictionary encoded address columns, empty names have no area
+    town_area = models.ForeignKey("GeographicAreaPersistenceModel", null=True, on_delete=models.PROTECT,
+                                  related_name="+", db_index=False)
+    county_area = models.ForeignKey("GeographicAreaPersistenceModel", null=True, on_delete=models.PROTECT,
+                                    related_name="+", db_index=False)
+    locality_area = models.ForeignKey("GeographicAreaPersistenceModel", null=True, on_delete=models.PROTECT,
+                                      related_name="+", db_index=False)
+    city_area = models.ForeignKey("GeographicAreaPersistenceModel", null=True, on_delete=models.PROTECT,
+                                  related_name="+", db_index=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        house: "HousePersistenceModel" = super().from_db(db, field_names, values)
+        # Area ids of the loaded houses are the areas of their loaded address names
+        house.area_names = {area_field: (db, getattr(house, address_field))
+                            for address_field, area_field in GEOGRAPHIC_AREA_FIELDS.values()
+                            if address_field in field_names and f"{area_field}_id" in field_names}
+        return house
+
+    def save(self, *args, **kwargs):
+        self.postal_district = get_postal_district(self.postal_code)
+        update_fields: Optional[Iterable[str]] = kwargs.get("update_fields")
+        update_fields = None if update_fields is None else set(update_fields)
+        # Areas are created in the database of the house
+        using: str = kwargs.get("using") or router.db_for_write(HousePersistenceModel, instance=self)
+        # Database and address name that each area id is resolved for, areas are resolved again when they change
+        area_names: dict[str, tuple[str, str]] = self.__dict__.setdefault("area_names", {})
+        for area_level, (address_field, area_field) in GEOGRAPHIC_AREA_FIELDS.items():
+            if update_fields is not None and area_field not in update_fields and \
+                    f"{area_field}_id" not in update_fields:
+                continue
+            area_name: tuple[str, str] = (using, getattr(self, address_field))
+            if area_names.get(area_field) != area_name:
+                setattr(self, f"{area_field}_id", GeographicAreaPersistenceModel.get_area_id(
+                    area_level, area_name[1], using))
+                area_names[area_field] = area_name
+        super().save(*args, **kwargs)
+
+    class Meta:
+        # Indexes follow the access paths of the query services: date range filtering with or without postal code,
+        # then grouping by house type. Trailing columns make them covering, so aggregates are read from the index.
+        indexes = [
+            models.Index(fields=["postal_code", "sell_date", "house_type", "sell_price"],
+                         name="house_postcode_date_idx"),
+            models.Index(fields=["postal_district", "sell_date", "house_type", "sell_price"],
+                         name="house_district_date_idx"),
+            models.Index(fields=["sell_date", "house_type", "sell_price"], name="house_date_idx"),
+            models.Index(fields=["house_type", "sell_date"], name="house_type_date_idx"),
+            models.Index(fields=["town_area", "sell_date", "house_type", "sell_price"], name="house_town_date_idx"),
+            models.Index(fields=["county_area", "sell_date", "house_type", "sell_price"],
+                         name="house_county_date_idx"),
+            models.Index(fields=["locality_area", "sell_date", "house_type", "sell_price"],
+                         name="house_locality_date_idx"),
+            models.Index(fields=["city_area", "sell_date", "house_type", "sell_price"], name="house_city_date_idx"),
+        ]
+
+
+class GeographicAreaPersistenceModel(models.Model):
+    """
+    Dictionary of the names of the geographic areas of each level, which the houses and the area rollups refer to
+    """
+    level = models.CharField(max_length=10, choices=[(area_level, area_level)
+                                                     for area_level in GEOGRAPHIC_AREA_LEVELS])
+    name = models.CharField(max_length=50)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["level", "name"], name="geographic_area_unique_name"),
+        ]
+
+    @staticmethod
+    def get_area_id(area_level: str, name: str, using: str = DEFAULT_DB_ALIAS) -> Optional[int]:
+        """
+        Gets the id of the area of the name, the area is created if it is not in the dictionary
+        :param area_level: Geographic area level
+        :param name: Name of the area
+        :param using: Database alias
+        :return: Area id, None for empty names
+        """
+        if not name:
+            return None
+        return GeographicAreaPersistenceModel.objects.using(using).get_or_create(level=area_level, name=name)[0].pk
 
 
 class AveragePriceBusinessModel(models.Model):
@@ -38,3 +157,84 @@ class AveragePriceBusinessModel(models.Model):
 
     class Meta:
         managed = False
+
+
+class PriceQuantilesBusinessModel(models.Model):
+    month_year_date = models.DateTimeField()
+    transaction_count = models.PositiveIntegerField()
+    p10_sell_price = models.PositiveIntegerField()
+    p50_sell_price = models.PositiveIntegerField()
+    p90_sell_price = models.PositiveIntegerField()
+
+    def save(self, *args, **kwargs):
+        pass
+
+    class Meta:
+        managed = False
+
+
+class MonthlyRollupPersistenceModel(models.Model):
+    """
+    Monthly sell price aggregates of each postal code and house type, precomputed from the house data after import
+    """
+    postal_code = models.CharField(max_length=10)
+    postal_district = models.CharField(max_length=POSTAL_DISTRICT_LENGTH, default="")
+    month_year_date = models.DateTimeField()
+    house_type = models.CharField(max_length=1, choices=HOUSE_TYPES, default=FLATS_HOME_TYPE)
+    transaction_count = models.PositiveIntegerField()
+    sum_sell_price = models.BigIntegerField()
+    min_sell_price = models.PositiveIntegerField()
+    max_sell_price = models.PositiveIntegerField()
+    # Bucket and count pairs of the PriceSketch of the sell prices
+    price_sketch = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["postal_code", "month_year_date", "house_type"],
+                                    name="rollup_unique_group"),
+        ]
+        indexes = [
+            models.Index(fields=["month_year_date", "house_type"], name="rollup_date_idx"),
+            models.Index(fields=["postal_district", "month_year_date"], name="rollup_district_date_idx"),
+        ]
+
+
+class AreaMonthlyRollupPersistenceModel(models.Model):
+    """
+    Monthly sell price aggregates of each geographic area and house type, precomputed from the house data after import
+    """
+    area = models.ForeignKey(GeographicAreaPersistenceModel, on_delete=models.CASCADE, related_name="+")
+    month_year_date = models.DateTimeField()
+    house_type = models.CharField(max_length=1, choices=HOUSE_TYPES, default=FLATS_HOME_TYPE)
+    transaction_count = models.PositiveIntegerField()
+    sum_sell_price = models.BigIntegerField()
+    min_sell_price = models.PositiveIntegerField()
+    max_sell_price = models.PositiveIntegerField()
+    # Bucket and count pairs of the PriceSketch of the sell prices
+    price_sketch = models.JSONField(default=list)
+
+    class Meta:
+        # Unique constraint is the index of the area and month range filters
+        constraints = [
+            models.UniqueConstraint(fields=["area", "month_year_date", "house_type"],
+                                    name="area_rollup_unique_group"),
+        ]
+
+
+class DataVersionPersistenceModel(models.Model):
+    """
+    Version stamp of the imported data, it is incremented after each import to invalidate the cached responses
+    """
+    scope = models.CharField(max_length=20, unique=True, default="")
+    version = models.PositiveBigIntegerField(default=0)
+
+
+class ImportRunPersistenceModel(models.Model):
+    """
+    Statistics of a finished house import, the last one is served by the metrics endpoint
+    """
+    source = models.CharField(max_length=500)
+    incremental = models.BooleanField(default=False)
+    row_count = models.PositiveBigIntegerField()
+    duration_seconds = models.FloatField()
+    finished_at = models.DateTimeField(auto_now_add=True)
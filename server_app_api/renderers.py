@@ -0,0 +1,115 @@
+import json
+import time
+from datetime import datetime, tzinfo
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+
+from .metrics import RequestMetrics, get_request_metrics
+from .models import HOUSE_TYPES
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional, standard json encoder is used without it
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Encodes the data as compact JSON, with orjson when it is installed. Encoding time is added to the metrics of the
+    current request.
+    :param data: Data of lists, dicts, strings and numbers
+    :return: UTF-8 encoded JSON
+    """
+    start_time: float = time.perf_counter()
+    if orjson is not None:
+        encoded_data: bytes = orjson.dumps(data)
+    else:
+        encoded_data = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    request_metrics: Optional[RequestMetrics] = get_request_metrics()
+    if request_metrics is not None:
+        request_metrics.add_serialization(time.perf_counter() - start_time)
+    return encoded_data
+
+
+def format_datetime(value: datetime, time_zone: Optional[tzinfo]) -> str:
+    """
+    Formats the date in the same form as the DateTimeField of the serializers
+    :param value: Date
+    :param time_zone: Current time zone, None when time zone support is not active
+    :return: ISO 8601 date in the time zone, UTC is given with Z
+    """
+    if time_zone is not None:
+        value = value.astimezone(time_zone) if timezone.is_aware(value) else timezone.make_aware(value, time_zone)
+    formatted_value: str = value.isoformat()
+    return formatted_value[:-6] + "Z" if formatted_value.endswith("+00:00") else formatted_value
+
+
+def get_monthly_means_data(monthly_means: Iterable[tuple[str, datetime, float]]) -> dict[str, list]:
+    """
+    Gets the data of the monthly means in the same form as AveragePricesBusinessModelSerializer, without creating
+    models. Each month is formatted once for all house types.
+    :param monthly_means: House type, month and mean sell price of each group, ordered by month
+    :return: Monthly means of each house type, keyed by house type description
+    """
+    time_zone: Optional[tzinfo] = timezone.get_current_timezone() if settings.USE_TZ else None
+    formatted_months: dict[datetime, str] = {}
+    model_outputs: dict[str, list[dict]] = {house_type: [] for house_type, _ in HOUSE_TYPES}
+    for house_type, month_year_date, mean_sell_price in monthly_means:
+        if house_type in model_outputs:
+            formatted_month: Optional[str] = formatted_months.get(month_year_date)
+            if formatted_month is None:
+                formatted_month = formatted_months[month_year_date] = format_datetime(month_year_date, time_zone)
+            # Means are truncated as the integer field of the serializer does
+            model_outputs[house_type].append({"month_year_date": formatted_month,
+                                              "mean_sell_price": int(mean_sell_price)})
+    return {house_type_desc: model_outputs[house_type] for house_type, house_type_desc in HOUSE_TYPES}
+
+
+def get_histogram_data(histogram_data: Optional[tuple[list[tuple[int, int]], list[int]]]) -> dict[str, Any]:
+    """
+    Gets the response data of a histogram. Bins and counts are given as nested arrays, or as JSON encoded strings
+    inside the response when LEGACY_HISTOGRAM_FORMAT is set for the clients of the former format.
+    :param histogram_data: Bin ranges and transaction counts of each bin, None if there is no transaction
+    :return: Histogram data with bins_range and data
+    """
+    if settings.LEGACY_HISTOGRAM_FORMAT:
+        if histogram_data is None:
+            return {"bins_range": "", "data": ""}
+        bins, histogram = histogram_data
+        return {"bins_range": json.dumps(bins), "data": json.dumps(histogram)}
+    if histogram_data is None:
+        return {"bins_range": [], "data": []}
+    bins, histogram = histogram_data
+    return {"bins_range": bins, "data": histogram}
+
+
+def get_monthly_histograms_data(months: list[datetime],
+                                histograms_data: Optional[tuple[list[tuple[int, int]], list[list[int]]]]) -> \
+        dict[str, Any]:
+    """
+    Gets the response data of the histograms of a period. Months are given with their transaction counts, and the
+    transaction counts of each bin which are empty if there is no transaction in the period.
+    :param months: First day of each month of the period
+    :param histograms_data: Bin ranges and transaction counts of each bin of each month, None if there is no
+    transaction
+    :return: Histograms data with bins_range and months
+    """
+    time_zone: Optional[tzinfo] = timezone.get_current_timezone() if settings.USE_TZ else None
+    bins, histograms = histograms_data if histograms_data is not None else ([], [[] for _ in months])
+    return {"bins_range": bins,
+            "months": [{"month_year_date": format_datetime(month, time_zone), "transaction_count": sum(histogram),
+                        "data": histogram} for month, histogram in zip(months, histograms)]}
+
+
+class FastJSONResponse(HttpResponse):
+    """
+    JSON response encoded directly from plain data, without the content negotiation and renderers of the framework
+    """
+
+    def __init__(self, data: Any, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=dumps(data), **kwargs)
@@ -0,0 +1,283 @@
+from datetime import datetime, timedelta, tzinfo
+from itertools import groupby
+from typing import Any, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, Min, Max, Model, QuerySet
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import GEOGRAPHIC_AREA_FIELDS, get_postal_district
+from .sketches import PriceSketch
+
+# Postal district depends on the postal code, so grouping by it does not split the groups
+ROLLUP_GROUP_FIELDS: tuple[str, ...] = ("postal_code", "postal_district", "month_year_date", "house_type")
+ROLLUP_AGGREGATE_FIELDS: tuple[str, ...] = ("transaction_count", "sum_sell_price", "min_sell_price", "max_sell_price")
+ROLLUP_SKETCH_FIELD: str = "price_sketch"
+AREA_ROLLUP_GROUP_FIELDS: tuple[str, ...] = ("area_id", "month_year_date", "house_type")
+REFRESH_POSTAL_CODE_CHUNK_SIZE: int = 500
+ROLLUP_ITERATOR_CHUNK_SIZE: int = 10000
+
+
+def get_month(date: datetime) -> datetime:
+    """
+    Gets the month of the date as it is stored in the rollups
+    :param date: Date
+    :return: First moment of the month
+    """
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def get_group_fields(rollup_model: type[Model]) -> tuple[str, ...]:
+    """
+    Gets the group fields that the rollup model has, rollup models of the earlier migrations do not have all of them
+    :param rollup_model: Monthly rollup model class
+    :return: Group fields
+    """
+    model_fields: set[str] = {field.name for field in rollup_model._meta.get_fields()}
+    return tuple(field for field in ROLLUP_GROUP_FIELDS if field in model_fields)
+
+
+def aggregate_houses(houses: QuerySet, group_fields: tuple[str, ...] = ROLLUP_GROUP_FIELDS) -> QuerySet:
+    """
+    Aggregates the houses into monthly rollup groups
+    :param houses: Query set of houses
+    :param group_fields: Fields of the rollup groups
+    :return: Query set of rollup group values
+    """
+    return houses.annotate(month_year_date=TruncMonth("sell_date")).values(*group_fields).annotate(
+        transaction_count=Count("pk"), sum_sell_price=Sum("sell_price"), min_sell_price=Min("sell_price"),
+        max_sell_price=Max("sell_price")).order_by()
+
+
+def add_price(groups: dict[Any, tuple[list[int], PriceSketch]], key: Any, sell_price: int, has_sketches: bool) -> None:
+    """
+    Adds the sell price of a house to the aggregates and the price sketch of its rollup group
+    :param groups: Aggregates and price sketch of each rollup group, count, sum, min and max are the aggregates
+    :param key: Key of the rollup group of the house
+    :param sell_price: Sell price
+    :param has_sketches: False not to add the price to the sketch
+    :return: None
+    """
+    group: Optional[tuple[list[int], PriceSketch]] = groups.get(key)
+    if group is None:
+        groups[key] = group = ([1, sell_price, sell_price, sell_price], PriceSketch())
+    else:
+        aggregates: list[int] = group[0]
+        aggregates[0] = aggregates[0] + 1
+        aggregates[1] = aggregates[1] + sell_price
+        aggregates[2] = min(aggregates[2], sell_price)
+        aggregates[3] = max(aggregates[3], sell_price)
+    if has_sketches:
+        group[1].add(sell_price)
+
+
+def get_rollup_groups(houses: QuerySet, rollup_model: type[Model]) -> Iterator[dict]:
+    """
+    Aggregates the houses into the monthly rollup groups of the rollup model, with their price sketches when the model
+    has them. Houses are streamed in the order of the postal code index, so the groups of each postal code and month
+    are completed one after another, and only their aggregates are kept in memory.
+    :param houses: Query set of houses
+    :param rollup_model: Monthly rollup model class
+    :return: Rollup group values
+    """
+    group_fields: tuple[str, ...] = get_group_fields(rollup_model)
+    has_sketches: bool = ROLLUP_SKETCH_FIELD in {field.name for field in rollup_model._meta.get_fields()}
+    # Months are truncated in the current time zone, as TruncMonth does
+    time_zone: Optional[tzinfo] = timezone.get_current_timezone() if settings.USE_TZ else None
+    rows: Iterator[tuple] = houses.values_list("postal_code", "sell_date", "house_type", "sell_price").order_by(
+        "postal_code", "sell_date").iterator(chunk_size=ROLLUP_ITERATOR_CHUNK_SIZE)
+    for (postal_code, month_year_date), month_rows in groupby(rows, key=lambda row: (
+            row[0], get_month(row[1].astimezone(time_zone) if time_zone else row[1]))):
+        house_type_groups: dict[str, tuple[list[int], PriceSketch]] = {}
+        for _, _, house_type, sell_price in month_rows:
+            add_price(house_type_groups, house_type, sell_price, has_sketches)
+        group_values: dict[str, Any] = {"postal_code": postal_code, "postal_district": get_postal_district(postal_code),
+                                        "month_year_date": month_year_date}
+        for house_type, (aggregates, sketch) in house_type_groups.items():
+            group: dict[str, Any] = {field: group_values[field] for field in group_fields if field != "house_type"}
+            group.update(house_type=house_type, **dict(zip(ROLLUP_AGGREGATE_FIELDS, aggregates)))
+            if has_sketches:
+                group[ROLLUP_SKETCH_FIELD] = sketch.to_data()
+            yield group
+
+
+def get_area_rollup_groups(houses: QuerySet) -> Iterator[dict]:
+    """
+    Aggregates the houses into the monthly rollup groups of their geographic areas of every level, with their price
+    sketches. Houses are streamed in the order of the sell date, so the groups of each month are completed one after
+    another, and only the aggregates of the areas of one month are kept in memory.
+    :param houses: Query set of houses
+    :return: Area rollup group values
+    """
+    area_id_fields: list[str] = [f"{area_field}_id" for _, area_field in GEOGRAPHIC_AREA_FIELDS.values()]
+    time_zone: Optional[tzinfo] = timezone.get_current_timezone() if settings.USE_TZ else None
+    rows: Iterator[tuple] = houses.values_list("sell_date", "house_type", "sell_price", *area_id_fields).order_by(
+        "sell_date").iterator(chunk_size=ROLLUP_ITERATOR_CHUNK_SIZE)
+    for month_year_date, month_rows in groupby(rows, key=lambda row: get_month(
+            row[0].astimezone(time_zone) if time_zone else row[0])):
+        area_groups: dict[tuple[int, str], tuple[list[int], PriceSketch]] = {}
+        for _, house_type, sell_price, *area_ids in month_rows:
+            for area_id in area_ids:
+                # Houses with empty names have no area of the level
+                if area_id is not None:
+                    add_price(area_groups, (area_id, house_type), sell_price, True)
+        for (area_id, house_type), (aggregates, sketch) in area_groups.items():
+            yield {"area_id": area_id, "month_year_date": month_year_date, "house_type": house_type,
+                   **dict(zip(ROLLUP_AGGREGATE_FIELDS, aggregates)), ROLLUP_SKETCH_FIELD: sketch.to_data()}
+
+
+def create_rollups(rollup_model: type[Model], groups: Iterable[dict], bulk_commit_size: int) -> int:
+    """
+    Creates the rollups of the groups in bulk inserts
+    :param rollup_model: Rollup model class
+    :param groups: Rollup group values
+    :param bulk_commit_size: Count of rollups created in each bulk insert
+    :return: Count of created rollups
+    """
+    rollup_count: int = 0
+    bulk_elements: list[Model] = []
+    for group in groups:
+        bulk_elements.append(rollup_model(**group))
+        if len(bulk_elements) == bulk_commit_size:
+            rollup_model.objects.bulk_create(bulk_elements)
+            rollup_count = rollup_count + len(bulk_elements)
+            bulk_elements = []
+    rollup_model.objects.bulk_create(bulk_elements)
+    return rollup_count + len(bulk_elements)
+
+
+def rebuild_monthly_rollups(house_model: type[Model], rollup_model: type[Model], bulk_commit_size: int = 1000) -> int:
+    """
+    Rebuilds the monthly rollups from the house data, models are given as parameters to be usable in migrations
+    :param house_model: House model class
+    :param rollup_model: Monthly rollup model class
+    :param bulk_commit_size: Count of rollups created in each bulk insert
+    :return: Count of created rollups
+    """
+    with transaction.atomic():
+        rollup_model.objects.all().delete()
+        return create_rollups(rollup_model, get_rollup_groups(house_model.objects.all(), rollup_model),
+                              bulk_commit_size)
+
+
+def rebuild_area_monthly_rollups(house_model: type[Model], area_rollup_model: type[Model],
+                                 bulk_commit_size: int = 1000) -> int:
+    """
+    Rebuilds the monthly rollups of the geographic areas from the house data, models are given as parameters to be
+    usable in migrations
+    :param house_model: House model class
+    :param area_rollup_model: Area monthly rollup model class
+    :param bulk_commit_size: Count of rollups created in each bulk insert
+    :return: Count of created rollups
+    """
+    with transaction.atomic():
+        area_rollup_model.objects.all().delete()
+        return create_rollups(area_rollup_model, get_area_rollup_groups(house_model.objects.all()),
+                              bulk_commit_size)
+
+
+def refresh_monthly_rollups(house_model: type[Model], rollup_model: type[Model], groups: set[tuple]) -> int:
+    """
+    Recomputes only the rollups of the given groups' postal codes and months from the house data, used after
+    incremental imports
+    :param house_model: House model class
+    :param rollup_model: Monthly rollup model class
+    :param groups: Changed rollup groups as (postal_code, month_year_date, house_type) tuples
+    :return: Count of refreshed rollups
+    """
+    postal_codes: list[str] = sorted({group[0] for group in groups})
+    rollup_count: int = 0
+    with transaction.atomic():
+        for chunk_start in range(0, len(postal_codes), REFRESH_POSTAL_CODE_CHUNK_SIZE):
+            chunk_postal_codes: list[str] = postal_codes[chunk_start:chunk_start + REFRESH_POSTAL_CODE_CHUNK_SIZE]
+            months: list[datetime] = sorted({group[1] for group in groups if group[0] in set(chunk_postal_codes)})
+            houses: QuerySet = house_model.objects.filter(postal_code__in=chunk_postal_codes,
+                                                          sell_date__gte=months[0],
+                                                          sell_date__lt=get_month(months[-1] + timedelta(days=31)))
+            # Rollups of all house types in the months of the postal codes are recreated, which is a superset of the
+            # changed groups
+            refreshed_groups: list[dict] = [group for group in get_rollup_groups(houses, rollup_model)
+                                            if group["month_year_date"] in set(months)]
+            rollup_model.objects.filter(postal_code__in=chunk_postal_codes, month_year_date__in=months).delete()
+            rollup_model.objects.bulk_create([rollup_model(**group) for group in refreshed_groups])
+            rollup_count = rollup_count + len(refreshed_groups)
+    return rollup_count
+
+
+def refresh_area_monthly_rollups(house_model: type[Model], area_rollup_model: type[Model], months: set[datetime],
+                                 bulk_commit_size: int = 1000) -> int:
+    """
+    Recomputes only the area rollups of the given months from the house data, used after incremental imports
+    :param house_model: House model class
+    :param area_rollup_model: Area monthly rollup model class
+    :param months: Months of the changed houses
+    :param bulk_commit_size: Count of rollups created in each bulk insert
+    :return: Count of refreshed rollups
+    """
+    rollup_count: int = 0
+    with transaction.atomic():
+        for month in sorted(months):
+            houses: QuerySet = house_model.objects.filter(sell_date__gte=month,
+                                                          sell_date__lt=get_month(month + timedelta(days=31)))
+            area_rollup_model.objects.filter(month_year_date=month).delete()
+            rollup_count = rollup_count + create_rollups(area_rollup_model, get_area_rollup_groups(houses),
+                                                         bulk_commit_size)
+    return rollup_count
+
+
+def compare_rollups(expected_groups: dict[tuple, tuple], rollups: Iterable[dict],
+                    group_fields: tuple[str, ...]) -> list[str]:
+    """
+    Compares the rollups with the expected aggregates of their groups
+    :param expected_groups: Aggregates of each group, keyed by the values of the group fields
+    :param rollups: Values of the rollups with their group fields and aggregates
+    :param group_fields: Fields of the rollup groups
+    :return: Descriptions of mismatching rollup groups, empty if rollups are valid
+    """
+    mismatches: list[str] = []
+    for group in rollups:
+        key: tuple = tuple(group[field] for field in group_fields)
+        aggregates: tuple = tuple(group[field] for field in ROLLUP_AGGREGATE_FIELDS)
+        expected_aggregates = expected_groups.pop(key, None)
+        if expected_aggregates is None:
+            mismatches.append(f"Unexpected rollup {key}: {aggregates}")
+        elif expected_aggregates != aggregates:
+            mismatches.append(f"Rollup {key} is {aggregates}, expected {expected_aggregates}")
+    for key, expected_aggregates in expected_groups.items():
+        mismatches.append(f"Missing rollup {key}: expected {expected_aggregates}")
+    return mismatches
+
+
+def validate_monthly_rollups(house_model: type[Model], rollup_model: type[Model]) -> list[str]:
+    """
+    Compares the monthly rollups with the aggregates of the house data
+    :param house_model: House model class
+    :param rollup_model: Monthly rollup model class
+    :return: Descriptions of mismatching rollup groups, empty if rollups are valid
+    """
+    expected_groups: dict[tuple, tuple] = {
+        tuple(group[field] for field in ROLLUP_GROUP_FIELDS): tuple(group[field] for field in ROLLUP_AGGREGATE_FIELDS)
+        for group in aggregate_houses(house_model.objects.all()).iterator()}
+    return compare_rollups(expected_groups, rollup_model.objects.values(
+        *ROLLUP_GROUP_FIELDS, *ROLLUP_AGGREGATE_FIELDS).iterator(), ROLLUP_GROUP_FIELDS)
+
+
+def validate_area_monthly_rollups(house_model: type[Model], area_rollup_model: type[Model]) -> list[str]:
+    """
+    Compares the monthly rollups of the geographic areas with the aggregates of the house data of each level
+    :param house_model: House model class
+    :param area_rollup_model: Area monthly rollup model class
+    :return: Descriptions of mismatching rollup groups, empty if rollups are valid
+    """
+    expected_groups: dict[tuple, tuple] = {}
+    for _, area_field in GEOGRAPHIC_AREA_FIELDS.values():
+        area_id_field: str = f"{area_field}_id"
+        houses: QuerySet = house_model.objects.filter(**{f"{area_id_field}__isnull": False})
+        expected_groups.update(
+            (tuple(group[field] for field in (area_id_field, "month_year_date", "house_type")),
+             tuple(group[field] for field in ROLLUP_AGGREGATE_FIELDS))
+            for group in aggregate_houses(houses, (area_id_field, "month_year_date", "house_type")).iterator())
+    return compare_rollups(expected_groups, area_rollup_model.objects.values(
+        *AREA_ROLLUP_GROUP_FIELDS, *ROLLUP_AGGREGATE_FIELDS).iterator(), AREA_ROLLUP_GROUP_FIELDS)
@@ -0,0 +1,144 @@
+import contextvars
+import random
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+REPLICA_ALIAS_PREFIX = "replica_"
+# Requests of the services only read, they are sent to the replicas
+READ_REPLICA_PATH_PREFIX = "/api/"
+ROUTED_APP_LABEL = "server_app_api"
+NATIVE_DATABASE_POOL = "native"
+PGBOUNCER_DATABASE_POOL = "pgbouncer"
+POSTGRESQL_ENGINE = "django.db.backends.postgresql"
+
+_read_database: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("read_database", default=None)
+_unhealthy_replicas: dict[str, float] = {}
+_unhealthy_replicas_lock: threading.Lock = threading.Lock()
+
+
+def get_database_settings(database: dict[str, Any], pool: str = "") -> dict[str, Any]:
+    """
+    Adds the connection pool options to the settings of a PostgreSQL database. Native pools of psycopg need Django 5.1,
+    PgBouncer in transaction pooling mode needs server-side cursors to be disabled. Other databases keep persistent
+    connections.
+    :param database: Database settings
+    :param pool: "native", "pgbouncer", or empty string not to pool connections
+    :return: Database settings
+    :raise ImproperlyConfigured: If the pool is unknown, or native pool is not supported by Django
+    """
+    if not pool or database.get("ENGINE") != POSTGRESQL_ENGINE:
+        return database
+    if pool == PGBOUNCER_DATABASE_POOL:
+        return {**database, "DISABLE_SERVER_SIDE_CURSORS": True}
+    if pool == NATIVE_DATABASE_POOL:
+        import django
+
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured("Native database pool needs Django 5.1 or later.")
+        # Pooled connections are returned to the pool after each request instead of being kept open
+        return {**database, "CONN_MAX_AGE": 0, "OPTIONS": {**database.get("OPTIONS", {}), "pool": True}}
+    raise ImproperlyConfigured(f"Unknown database pool: {pool}")
+
+
+def get_replica_aliases() -> list[str]:
+    """
+    Gets the aliases of the read replicas in the database settings
+    :return: Replica aliases
+    """
+    return [alias for alias in settings.DATABASES if alias.startswith(REPLICA_ALIAS_PREFIX)]
+
+
+def is_replica_healthy(alias: str) -> bool:
+    """
+    Checks that a connection can be made to the replica. Failed replicas are not tried again for
+    READ_REPLICA_RETRY_INTERVAL seconds.
+    :param alias: Replica alias
+    :return: True if the replica is connected
+    """
+    with _unhealthy_replicas_lock:
+        if _unhealthy_replicas.get(alias, 0.0) > time.monotonic():
+            return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        with _unhealthy_replicas_lock:
+            _unhealthy_replicas[alias] = time.monotonic() + settings.READ_REPLICA_RETRY_INTERVAL
+        return False
+    return True
+
+
+def choose_read_database() -> str:
+    """
+    Chooses a random healthy replica to read from, so that reads are spread over the replicas
+    :return: Replica alias, or the default database alias if no replica is healthy
+    """
+    replica_aliases: list[str] = get_replica_aliases()
+    random.shuffle(replica_aliases)
+    for alias in replica_aliases:
+        if is_replica_healthy(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class ReadReplicaRouter:
+    """
+    Routes the reads of the house data to the replica chosen for the current request. Writes, and the reads out of
+    the requests of the services such as imports and migrations, use the default database.
+    """
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        if model._meta.app_label != ROUTED_APP_LABEL:
+            return None
+        return _read_database.get()
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # Replicas hold the same data as the default database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> Optional[bool]:
+        # Replicas get the schema and data of the default database by replication
+        return False if db.startswith(REPLICA_ALIAS_PREFIX) else None
+
+
+class ReadReplicaMiddleware:
+    """
+    Chooses a replica for each request of the services. All queries of a request read from the same replica, so that
+    data versions and the house data they stamp are read consistently.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable):
+        self.get_response: Callable = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path_info.startswith(READ_REPLICA_PATH_PREFIX) or not get_replica_aliases():
+            return self.get_response(request)
+        token: contextvars.Token = _read_database.set(choose_read_database())
+        try:
+            return self.get_response(request)
+        finally:
+            _read_database.reset(token)
+
+    async def __acall__(self, request):
+        if not request.path_info.startswith(READ_REPLICA_PATH_PREFIX) or not get_replica_aliases():
+            return await self.get_response(request)
+        # Replica connection is checked in the thread of the sync views
+        token: contextvars.Token = _read_database.set(await sync_to_async(choose_read_database)())
+        try:
+            return await self.get_response(request)
+        finally:
+            _read_database.reset(token)
@@ -1,9 +1,74 @@
+from datetime import datetime
+
+from django.conf import settings
 from rest_framework import serializers
 
-from .models import AveragePriceBusinessModel
+from .models import AveragePriceBusinessModel, PriceQuantilesBusinessModel
 
 
 class AveragePricesBusinessModelSerializer(serializers.ModelSerializer):
     class Meta:
         model = AveragePriceBusinessModel
         fields = ["month_year_date", "mean_sell_price"]
+
+
+class PriceQuantilesBusinessModelSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PriceQuantilesBusinessModel
+        fields = ["month_year_date", "transaction_count", "p10_sell_price", "p50_sell_price", "p90_sell_price"]
+
+
+AVERAGE_PRICE_QUERY = "avgprice"
+TRANSACTION_QUERY = "transaction"
+
+
+class MonthField(serializers.Field):
+    """
+    Year and month field in the form of the date parameters of the services, such as 2021_10
+    """
+
+    def to_internal_value(self, data):
+        try:
+            return datetime.strptime(str(data), "%Y_%m")
+        except ValueError:
+            raise serializers.ValidationError("Date should be given as year and month, such as 2021_10.")
+
+    def to_representation(self, value):
+        return value.strftime("%Y_%m")
+
+
+class BatchQueryItemSerializer(serializers.Serializer):
+    """
+    One query of a batch, with the parameters of its own service
+    """
+    type = serializers.ChoiceField(choices=[AVERAGE_PRICE_QUERY, TRANSACTION_QUERY])
+    postal_code = serializers.CharField(max_length=10, required=False, allow_blank=True, default="")
+    start_date = MonthField(required=False)
+    end_date = MonthField(required=False)
+    date = MonthField(required=False)
+    bin_count = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_postal_code(self, value):
+        # Postal codes can be given in the url form of the services too
+        return value.replace("_", " ")
+
+    def validate(self, attrs):
+        if attrs["type"] == AVERAGE_PRICE_QUERY:
+            if "start_date" not in attrs or "end_date" not in attrs:
+                raise serializers.ValidationError("Average price queries need start_date and end_date.")
+            if attrs["end_date"] < attrs["start_date"]:
+                raise serializers.ValidationError("End date should be later than start date.")
+        elif "date" not in attrs or "bin_count" not in attrs:
+            raise serializers.ValidationError("Transaction queries need date and bin_count.")
+        return attrs
+
+
+class BatchQuerySerializer(serializers.Serializer):
+    queries = BatchQueryItemSerializer(many=True)
+
+    def validate_queries(self, value):
+        if not value:
+            raise serializers.ValidationError("At least one query should be given.")
+        if len(value) > settings.BATCH_QUERY_LIMIT:
+            raise serializers.ValidationError(f"At most {settings.BATCH_QUERY_LIMIT} queries can be given.")
+        return value
@@ -0,0 +1,71 @@
+import math
+from typing import Iterable
+
+# Estimated quantiles are within 1% of the sell prices at their ranks
+SKETCH_RELATIVE_ACCURACY: float = 0.01
+SKETCH_GAMMA: float = (1 + SKETCH_RELATIVE_ACCURACY) / (1 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_LOG_GAMMA: float = math.log(SKETCH_GAMMA)
+QUANTILES: tuple[float, ...] = (0.1, 0.5, 0.9)
+
+
+def get_sketch_bucket(price: int) -> int:
+    """
+    Gets the logarithmic bucket of the price, bucket i holds the prices in (gamma^(i-1), gamma^i]
+    :param price: Sell price
+    :return: Bucket index
+    """
+    return math.ceil(math.log(max(price, 1)) / SKETCH_LOG_GAMMA)
+
+
+class PriceSketch:
+    """
+    Mergeable quantile sketch of sell prices with relative error guarantee, in the style of DDSketch. Prices are
+    counted in logarithmic buckets, so merging the sketches of postal codes and months only sums the bucket counts, and
+    merged sketches are identical to the sketch of all of their prices.
+    """
+
+    def __init__(self):
+        self.bucket_counts: dict[int, int] = {}
+        self.count: int = 0
+
+    def add(self, price: int, count: int = 1):
+        """
+        Adds sell prices to the sketch
+        :param price: Sell price
+        :param count: Count of the sales with the price
+        """
+        bucket: int = get_sketch_bucket(price)
+        self.bucket_counts[bucket] = self.bucket_counts.get(bucket, 0) + count
+        self.count = self.count + count
+
+    def merge(self, sketch_data: Iterable[list[int]]):
+        """
+        Merges the stored data of another sketch into this one
+        :param sketch_data: Bucket and count pairs, as given by to_data
+        """
+        for bucket, count in sketch_data:
+            self.bucket_counts[bucket] = self.bucket_counts.get(bucket, 0) + count
+            self.count = self.count + count
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        Estimates the price at the rank of the quantile
+        :param quantile: Quantile between 0 and 1
+        :return: Estimated price, nan if the sketch is empty
+        """
+        if self.count == 0:
+            return math.nan
+        rank: float = quantile * (self.count - 1)
+        cumulative_count: int = 0
+        for bucket in sorted(self.bucket_counts):
+            cumulative_count = cumulative_count + self.bucket_counts[bucket]
+            if cumulative_count > rank:
+                break
+        return 2 * SKETCH_GAMMA ** bucket / (SKETCH_GAMMA + 1)
+
+    def to_data(self) -> list[list[int]]:
+        """
+        Gets the sketch in a JSON serializable form, to be stored in the monthly rollups
+        :return: Bucket and count pairs, ordered by bucket
+        """
+        return [[bucket, self.bucket_counts[bucket]] for bucket in sorted(self.bucket_counts)]
@@ -1,3 +1,1041 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from multiprocessing import Pool
+from typing import Optional
+from unittest import mock
+from datetime import datetime, timezone
 
-# Create your tests here.
+from django.db.models import Avg
+from django.db.models.functions import TruncMonth
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command, CommandError
+from django.apps import apps as django_apps
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+from asgiref.sync import async_to_sync
+from django.test import TestCase, TransactionTestCase, override_settings
+
+import numpy as np
+
+from .columnar import ColumnarHouseData, COLUMNAR_QUERY_ENGINE, get_columnar_house_data, get_current_snapshot_name, \
+    export_columnar_snapshot, reset_columnar_house_data
+from .histograms import BINNING_STRATEGIES, EDGES_BINNING
+from .house_importer import HOUSE_FIELDS, HOUSE_AREA_FIELDS, COPY_NULL, HouseBatchWriter, ImportCheckpoint, \
+    parse_batches_in_pool, parse_house_lines, import_house_items, fill_postal_districts
+from .models import HousePersistenceModel, AveragePriceBusinessModel, MonthlyRollupPersistenceModel, HOUSE_TYPES, \
+    FLATS_HOME_TYPE, DETACHED_HOME_TYPE, TERRACE_HOME_TYPE, SEMI_DETACHED_HOME_TYPE, POSTAL_CODE_AREA, \
+    POSTAL_DISTRICT_AREA, POSTAL_PREFIX_AREA, DataVersionPersistenceModel, AreaMonthlyRollupPersistenceModel, \
+    GeographicAreaPersistenceModel, get_postal_district
+from .metrics import metrics_registry
+from .cache import get_query_cache, get_data_version, bump_data_version, LRUCacheBackend, QueryCache, \
+    LRU_CACHE_BACKEND, DjangoCacheBackend, DJANGO_CACHE_BACKEND
+from . import cache_warming, columnar, routers
+from .routers import get_database_settings
+from .rollups import rebuild_monthly_rollups, rebuild_area_monthly_rollups, validate_monthly_rollups, \
+    validate_area_monthly_rollups
+from .serializers import AveragePricesBusinessModelSerializer
+from .sketches import PriceSketch, QUANTILES, SKETCH_RELATIVE_ACCURACY
+from .views import ViewCommon, GetAveragePricesView, NumberOfTransactionsView, MonthlyTransactionsView, \
+    BatchQueryView, EXPORT_FIELDS
+
+
+def create_house(postal_code: str, sell_price: int, sell_date: datetime, house_type: str,
+                 **address_fields: str) -> HousePersistenceModel:
+    return HousePersistenceModel.objects.create(house_uuid=f"{postal_code}-{sell_price}-{sell_date.isoformat()}",
+                                                primary_addressable_object_name="1",
+                                                secondary_addressable_object_name="",
+                                                postal_code=postal_code,
+                                                sell_price=sell_price,
+                                                sell_date=sell_date,
+                                                house_type=house_type,
+                                                **{"address_street": "STREET",
+                                                   "address_locality": "",
+                                                   "address_town": "LONDON",
+                                                   "address_county": "GREATER LONDON",
+                                                   "address_city": "GREATER LONDON",
+                                                   **address_fields})
+
+
+class HouseDataTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        house_types: list[str] = [FLATS_HOME_TYPE, DETACHED_HOME_TYPE, TERRACE_HOME_TYPE, SEMI_DETACHED_HOME_TYPE]
+        for month in range(1, 13):
+            for idx in range(0, 9):
+                create_house(postal_code=("SW1A 1AA", "E14 5AB", "N1 9GU")[idx % 3],
+                             sell_price=100000 + (month * 7919 + idx * 104729) % 900000,
+                             sell_date=datetime(2020, month, 1 + idx * 3, 12, 30, tzinfo=timezone.utc),
+                             house_type=house_types[(month + idx) % len(house_types) if idx != 8 else 0])
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        rebuild_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel)
+
+    def setUp(self):
+        get_query_cache().clear()
+
+
+class AveragePricesViewTestCase(HouseDataTestCase):
+    @staticmethod
+    def get_legacy_data(start_date: datetime, end_date: datetime, postal_code: str = "",
+                        postal_codes: tuple[str, ...] = ()) -> dict[str, list]:
+        """
+        Reference implementation running one query per house type, as the view did before
+        """
+        result: dict[str, list] = {}
+        for house_type, house_type_desc in HOUSE_TYPES:
+            filtered_data = ViewCommon.get_houses_filtered_by_date(start_date, ViewCommon.get_next_month(end_date),
+                                                                   postal_code).filter(house_type__exact=house_type)
+            if postal_codes:
+                filtered_data = filtered_data.filter(postal_code__in=postal_codes)
+            grouped_data = filtered_data.annotate(month_year_date=TruncMonth("sell_date")).values(
+                "month_year_date").annotate(mean_sell_price=Avg("sell_price")).order_by("month_year_date")
+            result[house_type_desc] = AveragePricesBusinessModelSerializer(
+                [AveragePriceBusinessModel(**data) for data in grouped_data], many=True).data
+        return result
+
+    def test_output_is_identical_to_per_house_type_queries(self):
+        for url_postfix, postal_code in (("", ""), ("/SW1A_1AA", "SW1A 1AA"), ("/E14_5AB", "E14 5AB"),
+                                         ("/XX1_1XX", "XX1 1XX")):
+            response = self.client.get(f"/api/avgprice/2020_02/2020_11{url_postfix}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), self.get_legacy_data(datetime(2020, 2, 1), datetime(2020, 11, 1),
+                                                                   postal_code))
+            if postal_code != "XX1 1XX":
+                self.assertTrue(any(response.json().values()))
+
+    def test_postal_district_and_prefix(self):
+        create_house("SW1A 2BB", 250000, datetime(2020, 3, 5, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        create_house("SW1 1AA", 400000, datetime(2020, 3, 5, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        create_house("SW10 1AA", 900000, datetime(2020, 3, 5, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        for url_postfix, postal_codes in (("/district/sw1a", ("SW1A 1AA", "SW1A 2BB")), ("/district/SW1", ("SW1 1AA",)),
+                                          ("/prefix/SW1", ("SW1A 1AA", "SW1A 2BB", "SW1 1AA", "SW10 1AA")),
+                                          ("/prefix/N", ("N1 9GU",)), ("/district/XX1", ("XX1 1XX",)),
+                                          ("/prefix/SW1A_2", ("SW1A 2BB",))):
+            response = self.client.get(f"/api/avgprice/2020_02/2020_11{url_postfix}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), self.get_legacy_data(datetime(2020, 2, 1), datetime(2020, 11, 1),
+                                                                   postal_codes=postal_codes))
+
+    def test_single_query_is_run(self):
+        # Data version is read for the cache key at first
+        with self.assertNumQueries(2):
+            self.client.get("/api/avgprice/2020_01/2020_12")
+
+    def test_end_date_before_start_date(self):
+        response = self.client.get("/api/avgprice/2020_05/2020_01")
+        self.assertEqual(response.status_code, 400)
+
+
+class MonthlyRollupsTestCase(HouseDataTestCase):
+    def test_rollups_match_house_data(self):
+        rollup = MonthlyRollupPersistenceModel.objects.get(postal_code="SW1A 1AA",
+                                                           month_year_date=datetime(2020, 1, 1, tzinfo=timezone.utc),
+                                                           house_type=FLATS_HOME_TYPE)
+        houses = HousePersistenceModel.objects.filter(postal_code="SW1A 1AA", sell_date__year=2020,
+                                                      sell_date__month=1, house_type=FLATS_HOME_TYPE)
+        prices: list[int] = [house.sell_price for house in houses]
+        self.assertEqual((rollup.transaction_count, rollup.sum_sell_price, rollup.min_sell_price,
+                          rollup.max_sell_price), (len(prices), sum(prices), min(prices), max(prices)))
+
+    def test_validate_and_rebuild_command(self):
+        call_command("monthly_rollups", "validate", stdout=io.StringIO())
+        create_house("W1 1AA", 250000, datetime(2021, 3, 10, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        with self.assertRaises(CommandError):
+            call_command("monthly_rollups", "validate", stdout=io.StringIO(), stderr=io.StringIO())
+        call_command("monthly_rollups", "rebuild", stdout=io.StringIO())
+        call_command("monthly_rollups", "validate", stdout=io.StringIO())
+
+
+class PostalDistrictTestCase(TestCase):
+    def test_migration_fills_districts_of_get_postal_district(self):
+        postal_codes: tuple[str, ...] = ("E14 5AB", "SW1A 1AA", "SW1A1AA", "ABCDE1 2XY", "")
+        HousePersistenceModel.objects.bulk_create([HousePersistenceModel(
+            house_uuid=postal_code, postal_code=postal_code, sell_price=1, house_type=FLATS_HOME_TYPE,
+            sell_date=datetime(2020, 1, 1, tzinfo=timezone.utc)) for postal_code in postal_codes])
+        fill_postal_districts(django_apps, None)
+        self.assertEqual(dict(HousePersistenceModel.objects.values_list("postal_code", "postal_district")),
+                         {postal_code: get_postal_district(postal_code) for postal_code in postal_codes})
+        self.assertEqual(get_postal_district("ABCDE1 2XY"), "ABCD")
+
+
+class GeographicAreasTestCase(HouseDataTestCase):
+    def add_kent_houses(self) -> list[int]:
+        prices: list[int] = [150000, 275000, 320000, 480000]
+        for idx, price in enumerate(prices):
+            create_house("ME2 4AA", price, datetime(2020, 6, 5 + idx, tzinfo=timezone.utc),
+                         (FLATS_HOME_TYPE, DETACHED_HOME_TYPE)[idx % 2], address_locality="STROOD",
+                         address_town="ROCHESTER", address_county="MEDWAY", address_city="KENT")
+        create_house("ST4 1AA", 120000, datetime(2020, 6, 3, tzinfo=timezone.utc), FLATS_HOME_TYPE,
+                     address_town="STOKE-ON-TRENT", address_county="STOKE-ON-TRENT", address_city="STOKE-ON-TRENT")
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        rebuild_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel)
+        bump_data_version()
+        return prices
+
+    def test_address_columns_are_dictionary_encoded(self):
+        self.add_kent_houses()
+        house = HousePersistenceModel.objects.get(postal_code="ME2 4AA", sell_price=150000)
+        self.assertEqual([(area.level, area.name) for area in (house.town_area, house.county_area,
+                                                               house.locality_area, house.city_area)],
+                         [("town", "ROCHESTER"), ("county", "MEDWAY"), ("locality", "STROOD"), ("city", "KENT")])
+        # Empty localities have no area, and names are shared by the houses
+        self.assertEqual(HousePersistenceModel.objects.filter(locality_area__isnull=True).count(), 109)
+        self.assertEqual(GeographicAreaPersistenceModel.objects.filter(name="STOKE-ON-TRENT").count(), 3)
+        self.assertEqual(GeographicAreaPersistenceModel.objects.count(), 10)
+        self.assertEqual(validate_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel),
+                         [])
+
+    def test_areas_are_resolved_only_for_changed_names(self):
+        house: HousePersistenceModel = HousePersistenceModel.objects.filter(postal_code="E14 5AB").first()
+        # Only the updated columns are written, addresses of the loaded house are resolved
+        with self.assertNumQueries(1):
+            house.sell_price = 123456
+            house.save(update_fields=["sell_price"])
+        with self.assertNumQueries(1):
+            house.save()
+        house.address_town = "ROCHESTER"
+        house.save()
+        self.assertEqual(HousePersistenceModel.objects.get(pk=house.pk).town_area.name, "ROCHESTER")
+        with self.assertNumQueries(1):
+            house.save()
+        house.address_county = "MEDWAY"
+        house.save(update_fields=["sell_price"])
+        self.assertEqual(HousePersistenceModel.objects.get(pk=house.pk).county_area.name, "GREATER LONDON")
+        house.save(update_fields=["address_county", "county_area"])
+        self.assertEqual(HousePersistenceModel.objects.get(pk=house.pk).county_area.name, "MEDWAY")
+
+    def test_average_prices_by_area(self):
+        london_response = self.client.get("/api/avgprice/2020_01/2020_12").json()
+        prices: list[int] = self.add_kent_houses()
+        for engine in ("orm", COLUMNAR_QUERY_ENGINE):
+            with self.subTest(engine=engine), override_settings(QUERY_ENGINE=engine):
+                get_query_cache().clear()
+                self.assertEqual(self.client.get("/api/avgprice/2020_01/2020_12/county/greater_london").json(),
+                                 london_response)
+                self.assertEqual(self.client.get("/api/avgprice/2020_01/2020_12/town/LONDON").json(),
+                                 london_response)
+                kent_response = self.client.get("/api/avgprice/2020_06/2020_06/city/KENT").json()
+                self.assertEqual([(house_type, [data["mean_sell_price"] for data in monthly_means])
+                                  for house_type, monthly_means in kent_response.items() if monthly_means],
+                                 [("flats", [(prices[0] + prices[2]) // 2]),
+                                  ("detached", [(prices[1] + prices[3]) // 2])])
+                self.assertEqual(self.client.get("/api/avgprice/2020_06/2020_06/locality/STROOD").json(),
+                                 kent_response)
+                self.assertEqual(self.client.get("/api/avgprice/2020_06/2020_06/town/STOKE-ON-TRENT").json()[
+                                     "flats"][0]["mean_sell_price"], 120000)
+        self.assertEqual(self.client.get("/api/avgprice/2020_06/2020_06/county/NOWHERE").json(),
+                         {house_type_desc: [] for _, house_type_desc in HOUSE_TYPES})
+
+    def test_transactions_by_area(self):
+        london_histogram = self.client.get("/api/transaction/10/2020_06").json()
+        london_histograms = self.client.get("/api/transaction/10/2020_01/2020_12").json()
+        prices: list[int] = self.add_kent_houses()
+        get_query_cache().clear()
+        self.assertEqual(self.client.get("/api/transaction/10/2020_06/city/GREATER_LONDON").json(), london_histogram)
+        self.assertEqual(self.client.get("/api/transaction/10/2020_01/2020_12/city/GREATER_LONDON").json(),
+                         london_histograms)
+        self.assertEqual(self.client.get("/api/transaction/3/2020_06/county/MEDWAY").json(),
+                         {"bins_range": [[prices[0], prices[0] + 110000], [prices[0] + 110000, prices[0] + 220000],
+                                         [prices[0] + 220000, prices[3]]], "data": [1, 2, 1]})
+        # Bin edges are read from the area rollups, so houses are read only to count the bins, data versions of the
+        # cache key are memoized
+        with self.assertNumQueries(2):
+            self.client.get("/api/transaction/10/2020_06/county/GREATER_LONDON?binning=quantile")
+
+
+class PriceQuantilesViewTestCase(HouseDataTestCase):
+    def test_quantiles_are_within_relative_accuracy(self):
+        for url_postfix, postal_codes in (("", ("SW1A 1AA", "E14 5AB", "N1 9GU")), ("/SW1A_1AA", ("SW1A 1AA",)),
+                                          ("/district/E14", ("E14 5AB",)), ("/prefix/N", ("N1 9GU",))):
+            response = self.client.get(f"/api/quantiles/2020_01/2020_12{url_postfix}")
+            self.assertEqual(response.status_code, 200)
+            for house_type, house_type_desc in HOUSE_TYPES:
+                for month_data in response.json()[house_type_desc]:
+                    month: datetime = datetime.fromisoformat(month_data["month_year_date"])
+                    prices: list[int] = sorted(HousePersistenceModel.objects.filter(
+                        postal_code__in=postal_codes, house_type=house_type, sell_date__gte=month,
+                        sell_date__lt=ViewCommon.get_next_month(month).replace(tzinfo=timezone.utc)).values_list(
+                        "sell_price", flat=True))
+                    self.assertEqual(month_data["transaction_count"], len(prices))
+                    for quantile, field in zip(QUANTILES, ("p10_sell_price", "p50_sell_price", "p90_sell_price")):
+                        exact_price: int = prices[int(quantile * (len(prices) - 1))]
+                        self.assertLessEqual(abs(month_data[field] - exact_price),
+                                             SKETCH_RELATIVE_ACCURACY * exact_price + 1)
+
+    def test_merged_sketches_are_identical_to_sketch_of_all_prices(self):
+        merged_sketch: PriceSketch = PriceSketch()
+        for sketch_data in MonthlyRollupPersistenceModel.objects.values_list("price_sketch", flat=True):
+            merged_sketch.merge(sketch_data)
+        sketch: PriceSketch = PriceSketch()
+        for price in HousePersistenceModel.objects.values_list("sell_price", flat=True):
+            sketch.add(price)
+        self.assertEqual(merged_sketch.to_data(), sketch.to_data())
+        self.assertEqual(merged_sketch.count, 108)
+
+    def test_end_date_before_start_date(self):
+        self.assertEqual(self.client.get("/api/quantiles/2020_05/2020_01").status_code, 400)
+
+
+class TransactionsExportViewTestCase(HouseDataTestCase):
+    def get_export(self, url: str) -> tuple[bytes, dict]:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content), response.headers
+
+    def get_expected_ids(self, postal_code: str = "") -> list[int]:
+        return list(ViewCommon.get_houses_filtered_by_date(datetime(2020, 2, 1), datetime(2020, 12, 1), postal_code)
+                    .order_by("sell_date", "id").values_list("id", flat=True))
+
+    def test_ndjson_export(self):
+        content, headers = self.get_export("/api/transactions/export/ndjson/2020_02/2020_11/E14_5AB")
+        self.assertEqual(headers["Content-Type"], "application/x-ndjson")
+        rows: list[dict] = [json.loads(line) for line in content.decode("utf-8").splitlines()]
+        self.assertEqual([row["id"] for row in rows], self.get_expected_ids("E14 5AB"))
+        house: HousePersistenceModel = HousePersistenceModel.objects.get(id=rows[0]["id"])
+        self.assertEqual(rows[0]["sell_date"], house.sell_date.isoformat().replace("+00:00", "Z"))
+        self.assertEqual((rows[0]["sell_price"], rows[0]["postal_code"]), (house.sell_price, "E14 5AB"))
+
+    def test_csv_export(self):
+        content, headers = self.get_export("/api/transactions/export/csv/2020_02/2020_11")
+        self.assertEqual(headers["Content-Type"], "text/csv")
+        rows: list[list[str]] = list(csv.reader(io.StringIO(content.decode("utf-8"))))
+        self.assertEqual(tuple(rows[0]), EXPORT_FIELDS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], self.get_expected_ids())
+
+    def test_keyset_pagination(self):
+        # Houses sold at the same time are ordered by their ids
+        for sell_price in range(100, 105):
+            create_house("E14 5AB", sell_price, datetime(2020, 6, 15, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        exported_ids: list[int] = []
+        cursor: str = ""
+        while True:
+            content, headers = self.get_export(
+                f"/api/transactions/export/ndjson/2020_02/2020_11?limit=7{f'&after={cursor}' if cursor else ''}")
+            exported_ids.extend(json.loads(line)["id"] for line in content.decode("utf-8").splitlines())
+            if "X-Next-Cursor" not in headers:
+                break
+            cursor = headers["X-Next-Cursor"]
+        self.assertEqual(exported_ids, self.get_expected_ids())
+        with mock.patch("server_app_api.views.EXPORT_PAGE_SIZE", 4):
+            content, _ = self.get_export("/api/transactions/export/ndjson/2020_02/2020_11")
+        self.assertEqual([json.loads(line)["id"] for line in content.decode("utf-8").splitlines()],
+                         self.get_expected_ids())
+
+    def test_invalid_parameters(self):
+        for url_postfix in ("2020_05/2020_01", "2020_01/2020_05?limit=0", "2020_01/2020_05?after=abc"):
+            self.assertEqual(self.client.get(f"/api/transactions/export/csv/{url_postfix}").status_code, 400)
+
+
+class QueryCacheTestCase(HouseDataTestCase):
+    def test_responses_are_cached_until_data_version_changes(self):
+        first_response = self.client.get("/api/avgprice/2020_01/2020_12").json()
+        # Cache hits do not query the database, data versions are memoized
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get("/api/avgprice/2020_01/2020_12").json(), first_response)
+        self.client.get("/api/transaction/10/2020_06")
+        self.client.get("/api/transaction/10/2020_06")
+        self.assertEqual(self.client.get("/api/_cache").json(),
+                         {"backend": "lru", "hits": 2, "misses": 2, "hit_rate": 0.5, "size": 2})
+
+        create_house("SW1A 1AA", 900000, datetime(2020, 6, 3, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        bump_data_version()
+        self.assertNotEqual(self.client.get("/api/avgprice/2020_01/2020_12").json(), first_response)
+        self.assertEqual(get_query_cache().stats()["misses"], 3)
+
+    def test_data_versions_are_memoized(self):
+        query_cache: QueryCache = QueryCache(LRU_CACHE_BACKEND, LRUCacheBackend(max_size=10, ttl=3600),
+                                             version_ttl=3600)
+        with self.assertNumQueries(1):
+            first_key, _ = query_cache.lookup(("avgprice", 1), "postcode:E14 5AB")
+            query_cache.lookup(("avgprice", 2), "postcode:E14 5AB")
+        # Imports of other processes are seen when the versions expire, imports of this process at once
+        DataVersionPersistenceModel.objects.create(scope="postcode:E14 5AB", version=3)
+        self.assertEqual(query_cache.lookup(("avgprice", 1), "postcode:E14 5AB")[0], first_key)
+        with mock.patch("server_app_api.cache.time.monotonic", return_value=time.monotonic() + 3601):
+            self.assertNotEqual(query_cache.lookup(("avgprice", 1), "postcode:E14 5AB")[0], first_key)
+        get_query_cache().lookup(("avgprice", 1), "")
+        bump_data_version()
+        with self.assertNumQueries(1):
+            get_query_cache().lookup(("avgprice", 1), "")
+
+    def test_lru_backend_bounds(self):
+        query_cache: QueryCache = QueryCache(LRU_CACHE_BACKEND, LRUCacheBackend(max_size=2, ttl=3600))
+        for key in ("a", "b", "a", "c"):
+            query_cache.get_or_compute((key,), lambda: key.upper())
+        self.assertEqual(query_cache.stats()["size"], 2)
+        self.assertEqual((query_cache.hits, query_cache.misses), (1, 3))
+        self.assertEqual(query_cache.get_or_compute(("b",), lambda: "recomputed"), "recomputed")
+
+        query_cache = QueryCache(LRU_CACHE_BACKEND, LRUCacheBackend(max_size=2, ttl=-1))
+        query_cache.get_or_compute(("a",), lambda: "A")
+        self.assertEqual(query_cache.get_or_compute(("a",), lambda: "expired"), "expired")
+
+
+class CacheWarmingTestCase(HouseDataTestCase):
+    def test_top_paths_of_access_logs(self):
+        lines: list[str] = [
+            '127.0.0.1 - - [01/Jan/2021:10:00:00 +0000] "GET /api/avgprice/2020_01/2020_12 HTTP/1.1" 200 512',
+            '127.0.0.1 - - [01/Jan/2021:10:00:01 +0000] "GET /api/transaction/10/2020_06/N1_9GU HTTP/1.1" 200 256 '
+            '"-" "curl/7.68.0"',
+            '127.0.0.1 - - [01/Jan/2021:10:00:02 +0000] "GET /api/transaction/10/2020_06/N1_9GU HTTP/1.1" 200 256',
+            '127.0.0.1 - - [01/Jan/2021:10:00:03 +0000] "GET /api/transaction/0/2020_06 HTTP/1.1" 400 64',
+            '127.0.0.1 - - [01/Jan/2021:10:00:04 +0000] "GET /api/_metrics HTTP/1.1" 200 1024',
+            '127.0.0.1 - - [01/Jan/2021:10:00:05 +0000] "POST /api/batch HTTP/1.1" 200 2048',
+            "not a request line",
+        ]
+        self.assertEqual(cache_warming.get_top_paths_of_access_logs(lines, 10),
+                         ["/api/transaction/10/2020_06/N1_9GU", "/api/avgprice/2020_01/2020_12"])
+        self.assertEqual(cache_warming.get_top_paths_of_access_logs(lines, 1), ["/api/transaction/10/2020_06/N1_9GU"])
+
+    def test_top_paths_of_postal_codes(self):
+        create_house("E14 5AB", 200000, datetime(2020, 12, 20, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        self.assertEqual(cache_warming.get_top_paths_of_postal_codes(7, 5, 6),
+                         ["/api/avgprice/2020_07/2020_12", "/api/transaction/5/2020_07/2020_12",
+                          "/api/transaction/5/2020_12", "/api/avgprice/2020_07/2020_12/E14_5AB",
+                          "/api/transaction/5/2020_07/2020_12/E14_5AB", "/api/transaction/5/2020_12/E14_5AB",
+                          "/api/avgprice/2020_07/2020_12/N1_9GU"])
+
+    def test_warmed_queries_are_cache_hits(self):
+        paths: list[str] = cache_warming.get_top_paths_of_postal_codes(12) + ["/api/async/avgprice/2020_01/2020_12"]
+        results: list[tuple[str, int, float]] = cache_warming.warm_cache(paths, 1)
+        self.assertEqual([(path, status_code) for path, status_code, _ in results],
+                         [(path, 200) for path in paths])
+        misses: int = get_query_cache().stats()["misses"]
+        for path in paths:
+            self.client.get(path)
+        self.assertEqual(get_query_cache().stats()["misses"], misses)
+        # Results are given in the order of the paths by the threads
+        self.assertEqual([(path, status_code) for path, status_code, _ in cache_warming.warm_cache(
+            ["/a", "/bb", "/ccc", "/dddd"], 3, len)], [("/a", 2), ("/bb", 3), ("/ccc", 4), ("/dddd", 5)])
+
+    def test_command(self):
+        with self.assertRaises(CommandError):
+            call_command("warm_cache", stdout=io.StringIO())
+        # Django cache without CACHES setting is the local memory cache of the process
+        with mock.patch("server_app_api.cache._query_cache", QueryCache(DJANGO_CACHE_BACKEND,
+                                                                        DjangoCacheBackend("default", 60))):
+            with self.assertRaises(CommandError):
+                call_command("warm_cache", stdout=io.StringIO())
+        with tempfile.NamedTemporaryFile("w", suffix=".log") as access_log:
+            access_log.write('127.0.0.1 - - [01/Jan/2021:10:00:00 +0000] "GET /api/avgprice/2020_01/2020_12 '
+                             'HTTP/1.1" 200 512\n')
+            access_log.flush()
+            with mock.patch.object(cache_warming, "urlopen") as urlopen:
+                urlopen.return_value.__enter__.return_value.status = 200
+                call_command("warm_cache", "--access-log", access_log.name, "--base-url", "http://localhost:8000/",
+                             "--server-workers", "1", stdout=io.StringIO())
+                # Other workers of the server would not get the entries of the process local cache
+                with self.assertRaises(CommandError):
+                    call_command("warm_cache", "--access-log", access_log.name, "--base-url",
+                                 "http://localhost:8000/", "--server-workers", "4", stdout=io.StringIO())
+            urlopen.assert_called_once_with("http://localhost:8000/api/avgprice/2020_01/2020_12", timeout=60.0)
+
+
+class MetricsTestCase(HouseDataTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics_registry.clear()
+
+    def test_request_metrics_by_route(self):
+        self.client.get("/api/avgprice/2020_01/2020_12")
+        self.client.get("/api/avgprice/2020_01/2020_12")
+        self.client.get("/api/transaction/10/2020_06/SW1A_1AA")
+        response = self.client.get("/api/_metrics")
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        lines: list[str] = response.content.decode().splitlines()
+        route: str = 'route="api/avgprice/<yyyy_mm:start_date>/<yyyy_mm:end_date>"'
+        self.assertIn(f'http_requests_total{{{route},method="GET",status="200"}} 2', lines)
+        self.assertIn(f"http_request_duration_seconds_count{{{route}}} 2", lines)
+        self.assertIn(f"http_request_db_queries_count{{{route}}} 2", lines)
+        # Data version lookup of the cached request, and rollup query of the first request
+        self.assertIn(f'http_request_db_queries_bucket{{{route},le="1"}} 1', lines)
+        self.assertIn(f'http_request_db_queries_bucket{{{route},le="2"}} 2', lines)
+        self.assertIn('query_cache_hits_total{backend="lru"} 1', lines)
+        self.assertIn('query_cache_misses_total{backend="lru"} 2', lines)
+
+    def test_server_timing(self):
+        self.assertNotIn("Server-Timing", self.client.get("/api/avgprice/2020_01/2020_12"))
+        with override_settings(SERVER_TIMING=True):
+            response = self.client.get("/api/transaction/10/2020_06")
+        self.assertRegex(response["Server-Timing"],
+                         r"^db;dur=\d+\.\d\d, serialize;dur=\d+\.\d\d, total;dur=\d+\.\d\d$")
+
+
+class ReadReplicaTestCase(HouseDataTestCase):
+    REPLICA_ALIAS: str = "replica_0"
+
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.add_replica(os.path.join(self.temp_dir.name, "replica.sqlite3"))
+        with connections[self.REPLICA_ALIAS].schema_editor() as schema_editor:
+            for model in (GeographicAreaPersistenceModel, HousePersistenceModel, DataVersionPersistenceModel):
+                schema_editor.create_model(model)
+        # Replica lags behind the primary, it has a single house
+        HousePersistenceModel.objects.using(self.REPLICA_ALIAS).create(
+            house_uuid="replica", postal_code="SW1A 1AA", sell_price=100000, house_type=FLATS_HOME_TYPE,
+            sell_date=datetime(2020, 6, 2, tzinfo=timezone.utc))
+
+    def add_replica(self, path: str):
+        # Connection settings are the database settings
+        connections.settings[self.REPLICA_ALIAS] = {**connections.settings["default"], "NAME": path,
+                                                    "TEST": {**connections.settings["default"]["TEST"]}}
+        self.addCleanup(self.remove_replica)
+
+    def remove_replica(self):
+        connections[self.REPLICA_ALIAS].close()
+        del connections[self.REPLICA_ALIAS]
+        del connections.settings[self.REPLICA_ALIAS]
+        routers._unhealthy_replicas.clear()
+
+    def get_transaction_count(self) -> int:
+        get_query_cache().clear()
+        return sum(self.client.get("/api/transaction/1/2020_06?binning=edges&edges=0,10000000").json()["data"])
+
+    def test_services_read_from_replica(self):
+        self.assertEqual(self.get_transaction_count(), 1)
+        self.assertEqual(b"".join(self.client.get("/api/transactions/export/ndjson/2020_06/2020_06").streaming_content)
+                         .count(b"\n"), 1)
+        # Reads out of the requests of the services, and writes, use the primary
+        self.assertEqual(HousePersistenceModel.objects.filter(sell_date__month=6).count(), 9)
+        bump_data_version()
+        self.assertEqual(DataVersionPersistenceModel.objects.using(self.REPLICA_ALIAS).count(), 0)
+
+    def test_fallback_to_primary(self):
+        self.doCleanups()
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.add_replica(os.path.join(self.temp_dir.name, "missing", "replica.sqlite3"))
+        self.assertEqual(self.get_transaction_count(), 9)
+        self.assertIn(self.REPLICA_ALIAS, routers._unhealthy_replicas)
+
+    def test_pool_settings(self):
+        database: dict = {"ENGINE": "django.db.backends.postgresql", "NAME": "houses", "CONN_MAX_AGE": 600}
+        self.assertEqual(get_database_settings(database), database)
+        self.assertTrue(get_database_settings(database, "pgbouncer")["DISABLE_SERVER_SIDE_CURSORS"])
+        self.assertEqual(get_database_settings({"ENGINE": "django.db.backends.sqlite3"}, "pgbouncer"),
+                         {"ENGINE": "django.db.backends.sqlite3"})
+        with self.assertRaises(ImproperlyConfigured):
+            get_database_settings(database, "unknown")
+        self.assertFalse(routers.ReadReplicaRouter().allow_migrate(self.REPLICA_ALIAS, "server_app_api"))
+
+
+class BatchQueryViewTestCase(HouseDataTestCase):
+    QUERIES: list[tuple[dict, str]] = [
+        ({"type": "avgprice", "start_date": "2020_02", "end_date": "2020_11"}, "avgprice/2020_02/2020_11"),
+        ({"type": "avgprice", "start_date": "2020_01", "end_date": "2020_06", "postal_code": "SW1A_1AA"},
+         "avgprice/2020_01/2020_06/SW1A_1AA"),
+        ({"type": "avgprice", "start_date": "2020_03", "end_date": "2020_12", "postal_code": "E14 5AB"},
+         "avgprice/2020_03/2020_12/E14_5AB"),
+        ({"type": "transaction", "bin_count": 10, "date": "2020_06"}, "transaction/10/2020_06"),
+        ({"type": "transaction", "bin_count": 4, "date": "2020_01"}, "transaction/4/2020_01"),
+        ({"type": "transaction", "bin_count": 3, "date": "2020_04", "postal_code": "N1_9GU"},
+         "transaction/3/2020_04/N1_9GU"),
+        ({"type": "transaction", "bin_count": 5, "date": "2020_09", "postal_code": "E14_5AB"},
+         "transaction/5/2020_09/E14_5AB"),
+        ({"type": "transaction", "bin_count": 5, "date": "2010_01", "postal_code": "E14_5AB"},
+         "transaction/5/2010_01/E14_5AB"),
+    ]
+
+    def post_batch(self, queries: list[dict]):
+        return self.client.post("/api/batch", {"queries": queries}, content_type="application/json")
+
+    def test_batch_gives_same_results_as_services(self):
+        response = self.post_batch([query for query, _ in self.QUERIES])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [self.client.get(f"/api/{url}").json()
+                                                      for _, url in self.QUERIES])
+
+    def test_query_count_does_not_depend_on_query_count(self):
+        with self.assertNumQueries(6):
+            self.post_batch([query for query, _ in self.QUERIES])
+        with self.assertNumQueries(6):
+            self.post_batch([query for query, _ in self.QUERIES] * 10)
+
+    def test_histograms_read_only_requested_months(self):
+        houses = BatchQueryView.get_houses_of_months({datetime(2020, 1, 1), datetime(2020, 2, 1),
+                                                      datetime(2020, 6, 1)})
+        self.assertEqual(sorted({house.sell_date.month for house in houses}), [1, 2, 6])
+        # Consecutive months are one range
+        self.assertEqual(str(houses.query).count("sell_date\" >="), 2)
+
+    @override_settings(QUERY_ENGINE=COLUMNAR_QUERY_ENGINE)
+    def test_batch_with_columnar_engine(self):
+        reset_columnar_house_data()
+        self.assertEqual(self.post_batch([query for query, _ in self.QUERIES]).json()["results"],
+                         [self.client.get(f"/api/{url}").json() for _, url in self.QUERIES])
+        reset_columnar_house_data()
+
+    def test_invalid_queries(self):
+        for queries in ([], [{"type": "avgprice", "start_date": "2020_05", "end_date": "2020_01"}],
+                        [{"type": "transaction", "bin_count": 0, "date": "2020_05"}],
+                        [{"type": "transaction", "date": "2020-05"}], [{"type": "unknown"}]):
+            self.assertEqual(self.post_batch(queries).status_code, 400)
+
+
+class NumberOfTransactionsViewTestCase(HouseDataTestCase):
+    def get_histogram(self, url: str) -> tuple[list, list]:
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()["bins_range"], response.json()["data"]
+
+    def test_bins_are_half_open(self):
+        for price in (100, 150, 199, 200, 250, 300):
+            create_house("W1 1AA", price, datetime(2021, 3, 10, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        bins, histogram = self.get_histogram("/api/transaction/2/2021_03/W1_1AA")
+        self.assertEqual(bins, [[100, 200], [200, 300]])
+        self.assertEqual(histogram, [3, 3])
+        bins, histogram = self.get_histogram("/api/transaction/4/2021_03/W1_1AA")
+        self.assertEqual(histogram, [1, 2, 1, 2])
+
+    def test_bins_contain_the_prices_they_count(self):
+        for price in (0, 3, 4, 6, 7, 10):
+            create_house("W1 1AA", price, datetime(2021, 3, 10, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        bins, histogram = self.get_histogram("/api/transaction/3/2021_03/W1_1AA")
+        self.assertEqual(bins, [[0, 4], [4, 7], [7, 10]])
+        self.assertEqual(histogram, [2, 2, 2])
+
+    def test_many_bins_of_wide_price_range(self):
+        # Products of the price offsets and the bin count do not fit 32-bit integers
+        for price in (100000, 2500000, 5000000):
+            create_house("W1 1AA", price, datetime(2021, 3, 10, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        bins, histogram = self.get_histogram("/api/transaction/1000/2021_03/W1_1AA")
+        self.assertEqual((bins[0][0], bins[-1][1], len(bins)), (100000, 5000000, 1000))
+        self.assertEqual([(bins[idx], count) for idx, count in enumerate(histogram) if count],
+                         [([100000, 104900], 1), ([2496100, 2501000], 1), ([4995100, 5000000], 1)])
+
+    def test_histogram_counts_all_transactions(self):
+        for bin_count in (1, 3, 10, 1000):
+            bins, histogram = self.get_histogram(f"/api/transaction/{bin_count}/2020_06")
+            self.assertEqual(len(bins), bin_count)
+            self.assertEqual(sum(histogram), 9)
+
+    def test_single_price(self):
+        create_house("W1 1AA", 500, datetime(2021, 3, 10, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        create_house("W1 1AA", 500, datetime(2021, 3, 11, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        self.assertEqual(self.get_histogram("/api/transaction/3/2021_03/W1_1AA")[1], [2, 0, 0])
+        for binning in ("log", "quantile"):
+            self.assertEqual(self.get_histogram(f"/api/transaction/3/2021_03/W1_1AA?binning={binning}"),
+                             ([[500, 500]], [2]))
+
+    def test_query_count_does_not_depend_on_bin_count(self):
+        with self.assertNumQueries(3):
+            self.client.get("/api/transaction/1000/2020_06")
+
+    def test_empty_result(self):
+        response = self.client.get("/api/transaction/10/2010_01")
+        self.assertEqual(response.json(), {"bins_range": [], "data": []})
+
+    def test_legacy_format(self):
+        bins, histogram = self.get_histogram("/api/transaction/3/2020_06/E14_5AB")
+        with override_settings(LEGACY_HISTOGRAM_FORMAT=True):
+            legacy_bins, legacy_histogram = self.get_histogram("/api/transaction/3/2020_06/E14_5AB")
+            empty_response = self.client.get("/api/transaction/10/2010_01").json()
+        self.assertEqual((json.loads(legacy_bins), json.loads(legacy_histogram)), (bins, histogram))
+        self.assertEqual(empty_response, {"bins_range": "", "data": ""})
+
+    def test_invalid_bin_count(self):
+        self.assertEqual(self.client.get("/api/transaction/0/2020_06").status_code, 400)
+
+    def test_binning_strategies(self):
+        # Skewed prices, a single outlier squashes all other transactions into the first linear bin
+        for idx in range(0, 99):
+            create_house("W1 1AA", 200000 + idx * 1000, datetime(2021, 3, 10, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        create_house("W1 1AA", 50000000, datetime(2021, 3, 10, tzinfo=timezone.utc), DETACHED_HOME_TYPE)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+        self.assertEqual(self.get_histogram("/api/transaction/4/2021_03/W1_1AA?binning=linear")[1], [99, 0, 0, 1])
+
+        bins, histogram = self.get_histogram("/api/transaction/4/2021_03/W1_1AA?binning=log")
+        self.assertEqual([bins[0][0], bins[-1][1]], [200000, 50000000])
+        self.assertAlmostEqual(bins[1][1] / bins[1][0], bins[2][1] / bins[2][0], places=3)
+        self.assertEqual(sum(histogram), 100)
+
+        bins, histogram = self.get_histogram("/api/transaction/4/2021_03/W1_1AA?binning=quantile")
+        self.assertEqual(len(bins), 4)
+        # Edges are within the relative accuracy of the sketch, a few prices around each of them
+        self.assertTrue(all(abs(count - 25) <= 5 for count in histogram), histogram)
+
+        bins, histogram = self.get_histogram(
+            "/api/transaction/3/2021_03/W1_1AA?binning=edges&edges=150000,250000,290000,1000000")
+        self.assertEqual(bins, [[150000, 250000], [250000, 290000], [290000, 1000000]])
+        # Prices out of the edges are not counted
+        self.assertEqual(histogram, [50, 40, 9])
+        self.assertEqual(self.get_histogram("/api/transaction/2/2010_01?binning=edges&edges=1,2,3"),
+                         ([[1, 2], [2, 3]], [0, 0]))
+
+    def test_binning_uses_precomputed_bounds(self):
+        # Data versions of the cache key are read once
+        self.client.get("/api/transaction/10/2020_06")
+        for binning in ("linear", "log", "quantile"):
+            with self.assertNumQueries(2):
+                # Bounds of the rollups and the histogram
+                self.client.get(f"/api/transaction/100/2020_06?binning={binning}")
+        with self.assertNumQueries(1):
+            self.client.get("/api/transaction/1/2020_06?binning=edges&edges=0,1000000")
+
+    def test_invalid_binning(self):
+        for query in ("binning=cubic", "binning=edges", "binning=edges&edges=1,2,2", "binning=edges&edges=1,a",
+                      "binning=edges&edges=1,2,3"):
+            self.assertEqual(self.client.get(f"/api/transaction/3/2020_06?{query}").status_code, 400)
+
+    def test_postal_district_and_prefix(self):
+        self.assertEqual(self.get_histogram("/api/transaction/5/2020_06/district/E14"),
+                         self.get_histogram("/api/transaction/5/2020_06/E14_5AB"))
+        self.assertEqual(self.get_histogram("/api/transaction/5/2020_06/prefix/n"),
+                         self.get_histogram("/api/transaction/5/2020_06/N1_9GU"))
+        self.assertEqual(self.client.get("/api/transaction/5/2020_06/district/E1").json(),
+                         {"bins_range": [], "data": []})
+
+
+class MonthlyTransactionsViewTestCase(HouseDataTestCase):
+    def test_months_share_bins(self):
+        response = self.client.get("/api/transaction/4/2020_01/2020_12/E14_5AB").json()
+        self.assertEqual(len(response["months"]), 12)
+        self.assertEqual(response["months"][0]["month_year_date"], "2020-01-01T00:00:00Z")
+        self.assertEqual(sum(month["transaction_count"] for month in response["months"]), 36)
+        prices: list[int] = list(HousePersistenceModel.objects.filter(postal_code="E14 5AB").values_list(
+            "sell_price", flat=True))
+        self.assertEqual([response["bins_range"][0][0], response["bins_range"][-1][1]], [min(prices), max(prices)])
+        for month in response["months"]:
+            self.assertEqual(sum(month["data"]), month["transaction_count"])
+
+        # Histograms of the months are the same as the histograms of the single months with the same bins
+        edges: str = ",".join(str(edge) for edge in (0, *[bins[1] for bins in response["bins_range"]]))
+        response = self.client.get(f"/api/transaction/4/2020_01/2020_12/E14_5AB?binning=edges&edges={edges}").json()
+        for month_number, month in enumerate(response["months"], 1):
+            self.assertEqual(month["data"], self.client.get(
+                f"/api/transaction/4/2020_{month_number:02}/E14_5AB?binning=edges&edges={edges}").json()["data"])
+
+    def test_query_count_does_not_depend_on_month_count(self):
+        with self.assertNumQueries(3):
+            # Data versions of the cache key, bounds of the rollups and the histograms
+            self.client.get("/api/transaction/10/2020_01/2020_12/district/SW1A?binning=quantile")
+
+    def test_empty_months(self):
+        response = self.client.get("/api/transaction/3/2020_12/2021_02").json()
+        self.assertEqual([month["transaction_count"] for month in response["months"]], [9, 0, 0])
+        self.assertEqual(response["months"][1]["data"], [0, 0, 0])
+        self.assertEqual(self.client.get("/api/transaction/3/2010_01/2010_02").json(), {
+            "bins_range": [],
+            "months": [{"month_year_date": "2010-01-01T00:00:00Z", "transaction_count": 0, "data": []},
+                       {"month_year_date": "2010-02-01T00:00:00Z", "transaction_count": 0, "data": []}]})
+
+    def test_invalid_parameters(self):
+        for url in ("transaction/0/2020_01/2020_12", "transaction/3/2020_05/2020_01",
+                    "transaction/3/2020_01/2020_12?binning=cubic"):
+            self.assertEqual(self.client.get(f"/api/{url}").status_code, 400)
+
+
+PRICE_PAID_LINES: list[str] = [
+    '"{5B8E5B1A-0D1C-4C5B-E053-6B04A8C0A1B1}","350000","2021-03-04 00:00","SW1A 1AA","F","N","L","10",'
+    '"FLAT 2","DOWNING STREET","","LONDON","CITY OF WESTMINSTER","GREATER LONDON","A","A"',
+    '"{5B8E5B1A-0D1C-4C5B-E053-6B04A8C0A1B2}","925000","2021-03-18 00:00","E14 5AB","D","N","F","ROSE COTTAGE, 4",'
+    '"","CANADA SQUARE","","LONDON","TOWER HAMLETS","GREATER LONDON","A","A"',
+    '"{5B8E5B1A-0D1C-4C5B-E053-6B04A8C0A1B3}","410000","2021-04-01 00:00","E14 5AB","T","N","F","6","",'
+    '"CANADA SQUARE","","LONDON","TOWER HAMLETS","GREATER LONDON","A","A"',
+]
+
+
+class HouseImporterTestCase(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source_path: str = os.path.join(self.temp_dir.name, "price_paid.csv")
+        with open(self.source_path, "w") as source_file:
+            source_file.write("\n".join(PRICE_PAID_LINES) + "\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_quoted_commas_are_parsed(self):
+        values = dict(zip(HOUSE_FIELDS, parse_house_lines(PRICE_PAID_LINES[1:2])[0]))
+        # Columns after the quoted comma are not shifted
+        self.assertEqual(values["sell_price"], 925000)
+        self.assertEqual(values["address_street"], "CANADA SQUARE")
+        self.assertEqual(values["address_county"], "TOWER HAMLETS")
+        self.assertEqual(values["house_type"], DETACHED_HOME_TYPE)
+
+    def test_copy_keeps_empty_strings_and_nulls(self):
+        writer: HouseBatchWriter = HouseBatchWriter(HousePersistenceModel, connections["default"])
+        rows: list[tuple] = writer.area_dictionary.encode(parse_house_lines(PRICE_PAID_LINES))
+        copied: dict = {}
+        raw_cursor = mock.Mock(spec=["copy_expert"])
+        raw_cursor.copy_expert.side_effect = lambda statement, buffer: copied.update(statement=statement,
+                                                                                     data=buffer.read())
+        writer.copy(mock.Mock(cursor=raw_cursor), rows)
+        self.assertIn(f"NULL '{COPY_NULL}'", copied["statement"])
+        # Fields which are not the null marker are read as they are written, empty secondary names and
+        # localities are empty strings, houses without a locality have no locality area
+        copied_rows: list[list] = [[None if value == COPY_NULL else value for value in fields]
+                                   for fields in csv.reader(io.StringIO(copied["data"]))]
+        self.assertEqual(copied_rows, [[None if value is None else str(value) for value in row] for row in rows])
+        self.assertEqual(copied_rows[1][HOUSE_FIELDS.index("secondary_addressable_object_name")], "")
+        self.assertIsNone(copied_rows[1][len(HOUSE_FIELDS) + HOUSE_AREA_FIELDS.index("locality_area")])
+
+    def test_parsing_reads_bounded_batches_ahead(self):
+        read_counts: list[int] = [0]
+
+        def read_batches():
+            for _ in range(100):
+                read_counts[0] = read_counts[0] + 1
+                yield PRICE_PAID_LINES
+
+        with Pool(2) as pool:
+            parsed_batches = parse_batches_in_pool(pool, parse_house_lines, read_batches(), 4)
+            self.assertEqual(len(next(parsed_batches)), 3)
+            self.assertEqual(read_counts[0], 4)
+            self.assertEqual(len(list(parsed_batches)), 99)
+
+    def test_import_command(self):
+        call_command("import_houses", self.source_path, "--batch-size", "2", "--workers", "2", stdout=io.StringIO())
+        house = HousePersistenceModel.objects.get(house_uuid="5B8E5B1A-0D1C-4C5B-E053-6B04A8C0A1B2")
+        self.assertEqual((house.postal_code, house.sell_price, house.sell_date),
+                         ("E14 5AB", 925000, datetime(2021, 3, 18, tzinfo=timezone.utc)))
+        self.assertEqual(HousePersistenceModel.objects.count(), 3)
+        self.assertEqual(MonthlyRollupPersistenceModel.objects.count(), 3)
+        self.assertEqual(house.county_area.name, "TOWER HAMLETS")
+        self.assertEqual(GeographicAreaPersistenceModel.objects.count(), 4)
+        self.assertEqual(validate_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel),
+                         [])
+        self.assertEqual(get_data_version(), 1)
+        lines: list[str] = self.client.get("/api/_metrics").content.decode().splitlines()
+        self.assertIn('house_import_rows{incremental="false"} 3', lines)
+        self.assertTrue(any(line.startswith('house_import_rows_per_second{incremental="false"} ') for line in lines))
+
+    def test_import_resumes_from_checkpoint(self):
+        checkpoint_path: str = os.path.join(self.temp_dir.name, "checkpoint.json")
+        ImportCheckpoint(checkpoint_path, self.source_path).save(2)
+        call_command("import_houses", self.source_path, "--workers", "1", "--checkpoint", checkpoint_path,
+                     stdout=io.StringIO())
+        self.assertEqual(list(HousePersistenceModel.objects.values_list("sell_price", flat=True)), [410000])
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+    def test_incremental_import(self):
+        call_command("import_houses", self.source_path, "--workers", "1", stdout=io.StringIO())
+        update_path: str = os.path.join(self.temp_dir.name, "price_paid_update.csv")
+        with open(update_path, "w") as update_file:
+            update_file.write("\n".join([
+                PRICE_PAID_LINES[1].replace('"925000"', '"950000"')[:-len('"A"')] + '"C"',
+                PRICE_PAID_LINES[2][:-len('"A"')] + '"D"',
+                PRICE_PAID_LINES[2].replace("A1B3", "A1B4").replace("2021-04-01", "2021-05-02"),
+            ]) + "\n")
+        get_query_cache().clear()
+        self.client.get("/api/avgprice/2021_01/2021_12/SW1A_1AA")
+        changed_response = self.client.get("/api/avgprice/2021_01/2021_12/E14_5AB").json()
+
+        call_command("import_houses", update_path, "--workers", "1", "--incremental", stdout=io.StringIO())
+        self.assertEqual(sorted(HousePersistenceModel.objects.filter(postal_code="E14 5AB").values_list(
+            "house_uuid", "sell_price")), [("5B8E5B1A-0D1C-4C5B-E053-6B04A8C0A1B2", 950000),
+                                           ("5B8E5B1A-0D1C-4C5B-E053-6B04A8C0A1B4", 410000)])
+        self.assertEqual(validate_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel), [])
+        self.assertEqual(validate_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel),
+                         [])
+        self.assertEqual(get_data_version(), 1)
+
+        # Cached queries of the unchanged postal code are still served
+        self.client.get("/api/avgprice/2021_01/2021_12/SW1A_1AA")
+        self.assertEqual(get_query_cache().stats()["hits"], 1)
+        self.assertNotEqual(self.client.get("/api/avgprice/2021_01/2021_12/E14_5AB").json(), changed_response)
+
+
+class ImportMigrationTestCase(TransactionTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source_path: str = os.path.join(self.temp_dir.name, "price_paid.csv")
+        with open(self.source_path, "w") as source_file:
+            source_file.write("\n".join(PRICE_PAID_LINES) + "\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_import_with_historical_models(self):
+        executor: MigrationExecutor = MigrationExecutor(connections["default"])
+        # Import migration runs with the models of 0002, the later migrations fill the fields they add
+        import_target: list[tuple[str, str]] = [("server_app_api", "0003_auto_20220412_1334")]
+        latest_target: list[tuple[str, str]] = executor.loader.graph.leaf_nodes("server_app_api")
+        executor.migrate(import_target)
+        try:
+            executor.loader.build_graph()
+            import_house_items(executor.loader.project_state(import_target).apps, None, import_limit=-1,
+                               bulk_commit_size=2, file_url=self.source_path)
+        finally:
+            executor.loader.build_graph()
+            executor.migrate(latest_target)
+        self.assertEqual(sorted(HousePersistenceModel.objects.values_list("postal_district", "sell_price")),
+                         [("E14", 410000), ("E14", 925000), ("SW1A", 350000)])
+        self.assertEqual(validate_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel), [])
+        self.assertEqual(validate_area_monthly_rollups(HousePersistenceModel, AreaMonthlyRollupPersistenceModel),
+                         [])
+
+
+class ColumnarEngineParityTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rnd: random.Random = random.Random(7)
+        postal_codes: list[str] = ["SW1A 1AA", "E14 5AB", "N1 9GU", "W2 3XY", "SE1 7PB", "SE17 1AA", "E14 9ZZ"]
+        # Other property type of the price paid data is not one of HOUSE_TYPES
+        house_types: list[str] = [house_type for house_type, _ in HOUSE_TYPES] + ["O"]
+        houses: list[HousePersistenceModel] = []
+        for idx in range(0, 2000):
+            postal_code: str = rnd.choice(postal_codes)
+            houses.append(HousePersistenceModel(
+                house_uuid=str(idx), postal_code=postal_code, postal_district=get_postal_district(postal_code),
+                sell_price=rnd.randint(50000, 3000000), house_type=rnd.choice(house_types),
+                sell_date=datetime(rnd.randint(2018, 2021), rnd.randint(1, 12), rnd.randint(1, 28),
+                                   tzinfo=timezone.utc)))
+        HousePersistenceModel.objects.bulk_create(houses)
+        rebuild_monthly_rollups(HousePersistenceModel, MonthlyRollupPersistenceModel)
+
+    def test_engines_give_same_results_on_random_queries(self):
+        columnar_data: ColumnarHouseData = ColumnarHouseData.load()
+        rnd: random.Random = random.Random(11)
+        for _ in range(0, 80):
+            postal_code, area_level = rnd.choice([
+                ("", POSTAL_CODE_AREA), ("SW1A 1AA", POSTAL_CODE_AREA), ("E14 5AB", POSTAL_CODE_AREA),
+                ("N1 9GU", POSTAL_CODE_AREA), ("W2 3XY", POSTAL_CODE_AREA), ("SE1 7PB", POSTAL_CODE_AREA),
+                ("XX1 1XX", POSTAL_CODE_AREA), ("E14", POSTAL_DISTRICT_AREA), ("SE1", POSTAL_DISTRICT_AREA),
+                ("SE", POSTAL_PREFIX_AREA), ("SE1", POSTAL_PREFIX_AREA), ("E", POSTAL_PREFIX_AREA),
+                ("E14 9", POSTAL_PREFIX_AREA), ("SE1 7P", POSTAL_PREFIX_AREA),
+                ("XX", POSTAL_PREFIX_AREA)])
+            start_date: datetime = datetime(rnd.randint(2017, 2021), rnd.randint(1, 12), 1)
+            end_date: datetime = ViewCommon.get_next_month(datetime(rnd.randint(start_date.year, 2022),
+                                                                    rnd.randint(1, 12), 1))
+            if end_date > start_date:
+                self.assertEqual(columnar_data.get_data_for_house_types(start_date, end_date, postal_code, area_level),
+                                 GetAveragePricesView.get_data_for_house_types(start_date, end_date, postal_code,
+                                                                               area_level=area_level))
+            bin_count: int = rnd.choice([1, 2, 7, 10, 100])
+            binning: str = rnd.choice(BINNING_STRATEGIES)
+            bin_edges: Optional[list[int]] = sorted(rnd.sample(range(0, 3000000, 1000), bin_count + 1)) \
+                if binning == EDGES_BINNING else None
+            self.assertEqual(columnar_data.get_data_for_histogram(bin_count, start_date, postal_code, area_level,
+                                                                  binning, bin_edges),
+                             NumberOfTransactionsView.get_data_for_histogram(bin_count, start_date, postal_code,
+                                                                             area_level, binning, bin_edges))
+            if end_date > start_date:
+                self.assertEqual(columnar_data.get_data_for_histograms(bin_count, start_date, end_date, postal_code,
+                                                                       area_level, binning, bin_edges),
+                                 MonthlyTransactionsView.get_data_for_histograms(bin_count, start_date, end_date,
+                                                                                 postal_code, area_level, binning,
+                                                                                 bin_edges))
+
+    def test_snapshot_gives_same_results(self):
+        columnar_data: ColumnarHouseData = ColumnarHouseData.load()
+        with tempfile.TemporaryDirectory() as directory:
+            first_path: str = columnar_data.save_snapshot(directory)
+            snapshot_data: ColumnarHouseData = ColumnarHouseData.open_snapshot(directory)
+            self.assertIsInstance(snapshot_data.sell_prices, np.memmap)
+            for postal_code in ("", "E14 5AB", "XX1 1XX"):
+                self.assertEqual(snapshot_data.get_data_for_house_types(datetime(2018, 3, 1), datetime(2021, 5, 1),
+                                                                         postal_code),
+                                 columnar_data.get_data_for_house_types(datetime(2018, 3, 1), datetime(2021, 5, 1),
+                                                                        postal_code))
+                self.assertEqual(snapshot_data.get_data_for_histogram(20, datetime(2019, 7, 1), postal_code),
+                                 columnar_data.get_data_for_histogram(20, datetime(2019, 7, 1), postal_code))
+            columnar_data.save_snapshot(directory)
+            third_path: str = columnar_data.save_snapshot(directory)
+            self.assertEqual(get_current_snapshot_name(directory), os.path.basename(third_path))
+            self.assertFalse(os.path.exists(first_path))
+
+    @override_settings(QUERY_ENGINE=COLUMNAR_QUERY_ENGINE, COLUMNAR_REFRESH_INTERVAL=0)
+    def test_workers_swap_to_new_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(COLUMNAR_SNAPSHOT_DIR=directory):
+            reset_columnar_house_data()
+            export_columnar_snapshot()
+            first_data: ColumnarHouseData = get_columnar_house_data()
+            self.assertIs(get_columnar_house_data(), first_data)
+            export_columnar_snapshot()
+            self.assertIsNot(get_columnar_house_data(), first_data)
+            reset_columnar_house_data()
+
+    @override_settings(QUERY_ENGINE=COLUMNAR_QUERY_ENGINE)
+    def test_views_use_columnar_engine(self):
+        get_query_cache().clear()
+        reset_columnar_house_data()
+        # Data is loaded at worker startup
+        get_columnar_house_data()
+        with self.assertNumQueries(1):
+            # Data versions of the cache key
+            self.client.get("/api/transaction/10/2020_06")
+        self.assertEqual(len(self.client.get("/api/transaction/10/2020_06").json()["data"]), 10)
+
+
+class ColumnarReloadTestCase(TransactionTestCase):
+    @override_settings(QUERY_ENGINE=COLUMNAR_QUERY_ENGINE, COLUMNAR_REFRESH_INTERVAL=0)
+    def test_previous_data_is_served_while_reloading(self):
+        create_house("E14 5AB", 300000, datetime(2020, 6, 1, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        reset_columnar_house_data()
+        first_data: ColumnarHouseData = get_columnar_house_data()
+        create_house("E14 5AB", 500000, datetime(2020, 6, 2, tzinfo=timezone.utc), FLATS_HOME_TYPE)
+        bump_data_version()
+        load_started: threading.Event = threading.Event()
+        load_allowed: threading.Event = threading.Event()
+        load = ColumnarHouseData.load
+
+        def wait_and_load(data_version: Optional[int] = None) -> ColumnarHouseData:
+            load_started.set()
+            load_allowed.wait(10)
+            return load(data_version)
+
+        with mock.patch.object(ColumnarHouseData, "load", side_effect=wait_and_load):
+            self.assertIs(get_columnar_house_data(), first_data)
+            self.assertTrue(load_started.wait(10))
+            # Requests are not blocked by the reload
+            self.assertIs(get_columnar_house_data(), first_data)
+            reloading: threading.Thread = columnar._columnar_house_data_reloading
+            load_allowed.set()
+            reloading.join(10)
+        self.assertEqual(get_columnar_house_data().sell_prices.tolist(), [300000, 500000])
+        reset_columnar_house_data()
+
+
+class AsyncViewsTestCase(TransactionTestCase):
+    def setUp(self):
+        get_query_cache().clear()
+        HouseDataTestCase.setUpTestData()
+
+    async def get_async(self, url: str):
+        return await self.async_client.get(url)
+
+    def test_async_views_give_same_results(self):
+        for url in ("avgprice/2020_02/2020_11", "avgprice/2020_01/2020_12/SW1A_1AA", "avgprice/2020_05/2020_01",
+                    "avgprice/2020_01/2020_12/prefix/SW", "transaction/10/2020_06", "transaction/3/2020_06/E14_5AB",
+                    "transaction/4/2020_06/district/N1", "transaction/10/2010_01", "transaction/0/2020_06",
+                    "transaction/5/2020_06?binning=quantile", "transaction/2/2020_06?binning=edges&edges=0,5e5,1e6",
+                    "transaction/2/2020_06?binning=edges&edges=0,500000,1000000",
+                    "avgprice/2020_01/2020_12/town/LONDON", "transaction/5/2020_06/county/GREATER_LONDON"):
+            get_query_cache().clear()
+            sync_response = self.client.get(f"/api/{url}")
+            get_query_cache().clear()
+            async_response = async_to_sync(self.get_async)(f"/api/async/{url}")
+            self.assertEqual(async_response.status_code, sync_response.status_code)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_queries_of_async_views_are_counted(self):
+        metrics_registry.clear()
+        async_to_sync(self.get_async)("/api/async/transaction/10/2020_06")
+        route: str = 'route="api/async/transaction/<int:bin_count>/<yyyy_mm:date>"'
+        lines: list[str] = self.client.get("/api/_metrics").content.decode().splitlines()
+        # Queries run in the threads of the async views
+        self.assertIn(f'http_request_db_queries_bucket{{{route},le="0"}} 0', lines)
+        self.assertIn(f"http_request_db_queries_count{{{route}}} 1", lines)
+
+    async def get_async_content(self, url: str) -> bytes:
+        response = await self.async_client.get(url)
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    def test_export_is_streamed_under_asgi(self):
+        url: str = "/api/transactions/export/ndjson/2020_01/2020_12/district/SW1A"
+        self.assertEqual(async_to_sync(self.get_async_content)(url), b"".join(self.client.get(url).streaming_content))
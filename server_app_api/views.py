@@ -1,18 +1,57 @@
-import json
-from datetime import datetime
+import asyncio
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, tzinfo, timezone as dt_timezone
+from typing import Optional, Callable, Any, Iterable, Iterator, AsyncIterator
 
-from django.db.models import Avg, QuerySet, Max, Min, Q, Count
-from django.db.models.functions import TruncMonth
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, router
+
+from django.db.models import QuerySet, Max, Min, Count, Sum, F, Q, Value, ExpressionWrapper, IntegerField, \
+    BigIntegerField, Case, When
+from django.db.models.functions import Cast, Least, TruncMonth
+from django.http import HttpResponse, JsonResponse, QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
 from rest_framework import views, status
 from rest_framework.response import Response
 
 # Create your views here.
-from .models import AveragePriceBusinessModel, HousePersistenceModel, HOUSE_TYPES
-from .serializers import AveragePricesBusinessModelSerializer
+from .cache import get_query_cache, get_postal_code_scope, QueryCache, CACHE_MISS
+from .columnar import ColumnarHouseData, get_columnar_house_data, COLUMNAR_QUERY_ENGINE
+from .metrics import get_metrics_text, PROMETHEUS_CONTENT_TYPE
+from .histograms import get_linear_bin_ranges, get_histogram_of_price_counts, get_bin_edges, get_bin_ranges_of_edges, \
+    parse_bin_edges, LINEAR_BINNING, QUANTILE_BINNING, EDGES_BINNING, BINNING_STRATEGIES
+from .models import HousePersistenceModel, MonthlyRollupPersistenceModel, AreaMonthlyRollupPersistenceModel, \
+    GeographicAreaPersistenceModel, HOUSE_TYPES, POSTAL_CODE_AREA, POSTAL_DISTRICT_AREA, POSTAL_PREFIX_AREA, \
+    GEOGRAPHIC_AREA_LEVELS, GEOGRAPHIC_AREA_FIELDS, PriceQuantilesBusinessModel
+from .renderers import FastJSONResponse, dumps, format_datetime, get_histogram_data, get_monthly_means_data, \
+    get_monthly_histograms_data
+from .serializers import BatchQuerySerializer, AVERAGE_PRICE_QUERY, \
+    TRANSACTION_QUERY, PriceQuantilesBusinessModelSerializer
+from .sketches import PriceSketch, QUANTILES
 
 MIN_PRICE_FIELD = "min_price"
 MAX_PRICE_FIELD = "max_price"
 
+NDJSON_EXPORT_FORMAT = "ndjson"
+CSV_EXPORT_FORMAT = "csv"
+EXPORT_CONTENT_TYPES: dict[str, str] = {
+    NDJSON_EXPORT_FORMAT: "application/x-ndjson",
+    CSV_EXPORT_FORMAT: "text/csv",
+}
+# Id is given first, it is the tie breaker of the sell date in the export cursors
+EXPORT_FIELDS: tuple[str, ...] = ("id", "house_uuid", "sell_date", "sell_price", "house_type", "postal_code",
+                                  "primary_addressable_object_name", "secondary_addressable_object_name",
+                                  "address_street", "address_locality", "address_town", "address_county",
+                                  "address_city")
+EXPORT_SELL_DATE_INDEX: int = EXPORT_FIELDS.index("sell_date")
+EXPORT_PAGE_SIZE: int = 10000
+EXPORT_CHUNK_SIZE: int = 1000
+
 
 class ViewCommon:
     @staticmethod
@@ -25,20 +64,147 @@ class ViewCommon:
         return datetime(date.year + int(date.month / 12), ((date.month % 12) + 1), 1)
 
     @staticmethod
-    def get_houses_filtered_by_date(start_date: datetime, end_date: datetime, postal_code: str) -> \
-            QuerySet[HousePersistenceModel]:
+    def get_houses_filtered_by_date(start_date: datetime, end_date: datetime, postal_code: str,
+                                    area_level: str = POSTAL_CODE_AREA) -> QuerySet[HousePersistenceModel]:
         """
         Common filter method to be used for both average price and histogram capabilities.
         :param start_date: Start date
         :param end_date: End date
-        :param postal_code: Postal code, empty string to select all
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
         :return: Query set for results
         """
         filtered_data: QuerySet[HousePersistenceModel] = HousePersistenceModel.objects.filter(sell_date__gte=start_date,
                                                                                               sell_date__lt=end_date)
-        if postal_code:
-            filtered_data = filtered_data.filter(postal_code__exact=postal_code)
-        return filtered_data
+        return ViewCommon.filter_by_area(filtered_data, postal_code, area_level)
+
+    @staticmethod
+    def filter_by_area(filtered_data: QuerySet, postal_code: str, area_level: str) -> QuerySet:
+        """
+        Filters houses or rollups by the postal or geographic area. Districts and prefixes are filtered with ranges
+        over the indexed postal district column, so that they are index range scans. Prefixes which reach into the
+        inward code are ranges over the postal codes, as in the columnar engine. Geographic areas are filtered by
+        the id of their name, houses with their dimension columns and area rollups with their areas.
+        :param filtered_data: Query set of houses, or rollups of the area level
+        :param postal_code: Postal code, or the postal area code or geographic area name of the area level, empty
+        string to select all
+        :param area_level: Postal or geographic area level of the postal code
+        :return: Filtered query set
+        """
+        if not postal_code:
+            return filtered_data
+        if area_level in GEOGRAPHIC_AREA_LEVELS:
+            areas: QuerySet = GeographicAreaPersistenceModel.objects.filter(level=area_level, name=postal_code)
+            area_field: str = GEOGRAPHIC_AREA_FIELDS[area_level][1] \
+                if filtered_data.model is HousePersistenceModel else "area"
+            return filtered_data.filter(**{f"{area_field}__in": areas.values("pk")})
+        if area_level == POSTAL_DISTRICT_AREA:
+            return filtered_data.filter(postal_district__exact=postal_code)
+        if area_level == POSTAL_PREFIX_AREA:
+            # Prefixes with a part of the inward code are beginnings of the postal codes, not of their districts
+            prefix_field: str = "postal_code" if " " in postal_code else "postal_district"
+            return filtered_data.filter(**{f"{prefix_field}__gte": postal_code,
+                                           f"{prefix_field}__lt": postal_code[:-1] + chr(ord(postal_code[-1]) + 1)})
+        return filtered_data.filter(postal_code__exact=postal_code)
+
+    @staticmethod
+    def get_area_code(postal_code: str, area_level: str) -> str:
+        """
+        Normalizes the postal area code given in the url, districts, prefixes and geographic area names are matched
+        in upper case
+        :param postal_code: Postal code, or the postal area code or geographic area name of the area level
+        :param area_level: Postal or geographic area level of the postal code
+        :return: Postal area code
+        """
+        return postal_code if area_level == POSTAL_CODE_AREA else postal_code.strip().upper()
+
+    @staticmethod
+    def get_rollups(area_level: str) -> QuerySet:
+        """
+        Gets the monthly rollups that the queries of the area level are aggregated from
+        :param area_level: Postal or geographic area level
+        :return: Query set of the rollups of the geographic areas for the geographic levels, or of the postal codes
+        """
+        if area_level in GEOGRAPHIC_AREA_LEVELS:
+            return AreaMonthlyRollupPersistenceModel.objects.all()
+        return MonthlyRollupPersistenceModel.objects.all()
+
+    @staticmethod
+    def get_columnar_data(area_level: str) -> Optional[ColumnarHouseData]:
+        """
+        Gets the columnar house data when the columnar engine is selected. Columns do not have the geographic areas,
+        so their queries are run on the rollups and the indexed dimension columns of the database.
+        :param area_level: Postal or geographic area level
+        :return: Columnar house data, None if ORM engine is selected or the area level is geographic
+        """
+        if area_level in GEOGRAPHIC_AREA_LEVELS:
+            return None
+        return get_columnar_house_data()
+
+    @staticmethod
+    def group_by_postal_code(groups: Iterable[dict]) -> dict[str, list[dict]]:
+        """
+        Splits the grouped query results by their postal codes
+        :param groups: Query results with postal code
+        :return: Query results of each postal code
+        """
+        postal_code_groups: dict[str, list[dict]] = {}
+        for group in groups:
+            postal_code_groups.setdefault(group["postal_code"], []).append(group)
+        return postal_code_groups
+
+    @staticmethod
+    def get_binning(query_params: QueryDict, bin_count: int) -> tuple[str, Optional[list[int]]]:
+        """
+        Gets the binning strategy of a histogram from the binning and edges query parameters
+        :param query_params: Query parameters of the request
+        :param bin_count: Bin count
+        :return: Binning strategy, and bin edges for the caller supplied edges
+        :raise ValueError: If the binning strategy is unknown, or the edges are invalid or do not give the bin count
+        """
+        binning: str = query_params.get("binning", LINEAR_BINNING)
+        if binning not in BINNING_STRATEGIES:
+            raise ValueError(f"Binning parameter should be one of {', '.join(BINNING_STRATEGIES)}.")
+        if binning != EDGES_BINNING:
+            return binning, None
+        bin_edges: list[int] = parse_bin_edges(query_params.get("edges", ""))
+        if len(bin_edges) - 1 != bin_count:
+            raise ValueError("Bin count parameter should be the count of the bins between the edges.")
+        return binning, bin_edges
+
+    @staticmethod
+    def get_binning_key(binning: str, bin_edges: Optional[list[int]]) -> tuple[str, ...]:
+        """
+        Gets the normalized form of the binning strategy to be used in cache keys
+        :param binning: Binning strategy
+        :param bin_edges: Caller supplied bin edges, None for the other strategies
+        :return: Binning strategy and the bin edges
+        """
+        return binning, ",".join(str(bin_edge) for bin_edge in bin_edges or ())
+
+    @staticmethod
+    def get_months(start_date: datetime, end_date: datetime) -> list[datetime]:
+        """
+        Gets the months of a period
+        :param start_date: Start date
+        :param end_date: End date, included
+        :return: First day of each month
+        """
+        months: list[datetime] = []
+        month: datetime = datetime(start_date.year, start_date.month, 1)
+        while month <= end_date:
+            months.append(month)
+            month = ViewCommon.get_next_month(month)
+        return months
+
+    @staticmethod
+    def get_cache_key_date(date: datetime) -> str:
+        """
+        Gets the normalized form of the month date to be used in cache keys
+        :param date: Date
+        :return: Year and month of the date
+        """
+        return date.strftime("%Y_%m")
 
 
 class GetAveragePricesView(views.APIView):
@@ -48,85 +214,789 @@ class GetAveragePricesView(views.APIView):
     """
 
     @staticmethod
-    def get_data_for_house_type(start_date: datetime, end_date: datetime, house_type: str,
-                                postal_code: str = "") -> str:
+    def get_data_for_house_types(start_date: datetime, end_date: datetime, postal_code: str = "",
+                                 house_types: tuple[str, ...] = (), area_level: str = POSTAL_CODE_AREA) -> \
+            dict[str, list]:
         """
-        Common method for filtering data using house type
+        Common method for getting monthly means of all house types with a single grouped query over monthly rollups.
+        When no postal code is given, rollups of all postal codes are summed for each month.
         :param start_date: Start date
         :param end_date: End date
-        :param house_type: House type
-        :param postal_code: Postal code, empty string to select all
-        :return: Filtered and serialized data
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param house_types: House types to query, empty to query all, other house types are given empty
+        :param area_level: Postal area level of the postal code
+        :return: Serialized data of each house type, keyed by house type description
         """
-        filtered_data: QuerySet = ViewCommon.get_houses_filtered_by_date(start_date, end_date, postal_code)
-        filtered_data: QuerySet = filtered_data.filter(house_type__exact=house_type)
-        month_grouped_data: QuerySet = filtered_data.annotate(month_year_date=TruncMonth("sell_date")).values(
+        columnar_data: Optional[ColumnarHouseData] = ViewCommon.get_columnar_data(area_level)
+        if columnar_data is not None:
+            return columnar_data.get_data_for_house_types(start_date, end_date, postal_code, area_level)
+
+        filtered_data: QuerySet = ViewCommon.get_rollups(area_level).filter(month_year_date__gte=start_date,
+                                                                            month_year_date__lt=end_date)
+        filtered_data = ViewCommon.filter_by_area(filtered_data, postal_code, area_level)
+        if house_types:
+            filtered_data = filtered_data.filter(house_type__in=house_types)
+        result: QuerySet = filtered_data.values("month_year_date", "house_type").annotate(
+            total_transaction_count=Sum("transaction_count"), total_sell_price=Sum("sum_sell_price")).order_by(
             "month_year_date")
-        result: QuerySet = month_grouped_data.annotate(mean_sell_price=Avg("sell_price"))
-        model_outputs: list[AveragePriceBusinessModel] = []
-        for data in result:
-            model_outputs.append(AveragePriceBusinessModel(**data))
-        return AveragePricesBusinessModelSerializer(model_outputs, many=True).data
+        return GetAveragePricesView.serialize_monthly_means(result)
 
-    def get(self, request, start_date: datetime, end_date: datetime, postal_code: str = "", *args, **kwargs):
+    @staticmethod
+    def serialize_monthly_means(monthly_groups: Iterable[dict]) -> dict[str, list]:
+        """
+        Serializes the monthly means of the house types, straight from the grouped values without creating models
+        :param monthly_groups: Month ordered groups with month_year_date, house_type, total_transaction_count and
+        total_sell_price
+        :return: Serialized data of each house type, keyed by house type description
+        """
+        return get_monthly_means_data(
+            (data["house_type"], data["month_year_date"], data["total_sell_price"] / data["total_transaction_count"])
+            for data in monthly_groups)
+
+    def get(self, request, start_date: datetime, end_date: datetime, postal_code: str = "",
+            area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
         # Validate at start
         if end_date < start_date:
             return Response({"message": "End date should be later than start date."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        result_response: dict[str, str] = {}
-        # We lift the front end developers' job easier by querying data for each home types.
-        # But we are compromising performance.
-        # For better performance we can do it in one query and shift the segmentation job to the front-end side.
-        for home_type_and_desc in HOUSE_TYPES:
-            result_response[home_type_and_desc[1]] = self.get_data_for_house_type(start_date=start_date,
-                                                                                  end_date=ViewCommon.get_next_month(
-                                                                                      end_date),
-                                                                                  house_type=home_type_and_desc[0],
-                                                                                  postal_code=postal_code)
+        postal_code = ViewCommon.get_area_code(postal_code, area_level)
+        # Data of all house types is fetched in one query grouped by month and house type, then it is segmented
+        # by the house type here to keep the front end developers' job easier.
+        result_response: dict[str, list] = get_query_cache().get_or_compute(
+            ("avgprice", ViewCommon.get_cache_key_date(start_date), ViewCommon.get_cache_key_date(end_date),
+             area_level, postal_code),
+            lambda: self.get_data_for_house_types(start_date=start_date, end_date=ViewCommon.get_next_month(end_date),
+                                                  postal_code=postal_code, area_level=area_level),
+            scope=get_postal_code_scope(postal_code, area_level))
 
-        return Response(result_response, status=status.HTTP_200_OK)
+        return FastJSONResponse(result_response, status=status.HTTP_200_OK)
 
 
 class NumberOfTransactionsView(views.APIView):
     """
     Service for getting transaction histogram for a given month/year point.
     It takes date as year-month, postal code and bin count to fetch the data and calculate the histogram.
+    Bins are equal width between the min and max prices by default, the binning query parameter selects log scale
+    bins, equal count quantile bins or caller supplied edges given with the edges query parameter.
     """
 
-    def get(self, request, bin_count: int, date: datetime, postal_code: str = "", *args, **kwargs):
+    def get(self, request, bin_count: int, date: datetime, postal_code: str = "",
+            area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
         # Validate at start
         if bin_count < 1:
             return Response({"message": "Bin count parameter should be at least 1."},
                             status=status.HTTP_400_BAD_REQUEST)
+        try:
+            binning, bin_edges = ViewCommon.get_binning(request.query_params, bin_count)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        postal_code = ViewCommon.get_area_code(postal_code, area_level)
+        histogram_data: Optional[tuple[list[tuple[int, int]], list[int]]] = get_query_cache().get_or_compute(
+            ("transaction", bin_count, ViewCommon.get_cache_key_date(date), area_level, postal_code,
+             *ViewCommon.get_binning_key(binning, bin_edges)),
+            lambda: self.get_data_for_histogram(bin_count, date, postal_code, area_level, binning, bin_edges),
+            scope=get_postal_code_scope(postal_code, area_level))
 
-        # First query for getting the min and max prices
+        return FastJSONResponse(get_histogram_data(histogram_data), status=status.HTTP_200_OK)
+
+    @classmethod
+    def get_data_for_histogram(cls, bin_count: int, date: datetime, postal_code: str,
+                               area_level: str = POSTAL_CODE_AREA, binning: str = LINEAR_BINNING,
+                               bin_edges: Optional[list[int]] = None) -> \
+            Optional[tuple[list[tuple[int, int]], list[int]]]:
+        """
+        Gets the histogram of the transactions of the month. Bin edges are found from the price bounds and sketches of
+        the monthly rollups, so the houses are read with a single grouped query.
+        :param bin_count: Bin count
+        :param date: Date of the month
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :param binning: Binning strategy
+        :param bin_edges: Caller supplied bin edges of the edges binning strategy
+        :return: Bin ranges and transaction counts of each bin, None if there is no transaction
+        """
+        columnar_data: Optional[ColumnarHouseData] = ViewCommon.get_columnar_data(area_level)
+        if columnar_data is not None:
+            return columnar_data.get_data_for_histogram(bin_count, date, postal_code, area_level, binning, bin_edges)
+
+        if binning != EDGES_BINNING:
+            bin_edges = cls.get_bin_edges(bin_count, date, ViewCommon.get_next_month(date), postal_code, area_level,
+                                          binning)
+            if bin_edges is None:
+                return None
         filtered_data: QuerySet = ViewCommon.get_houses_filtered_by_date(start_date=date,
                                                                          end_date=ViewCommon.get_next_month(date),
-                                                                         postal_code=postal_code)
-        min_max_range: QuerySet = filtered_data.aggregate(max_price=Max("sell_price"), min_price=Min("sell_price"))
-        max_price: int = min_max_range[MAX_PRICE_FIELD]
-        min_price: int = min_max_range[MIN_PRICE_FIELD]
-        response: Response = Response({"bins_range": "", "data": ""}, status=status.HTTP_200_OK)
-        if min_price is not None and max_price is not None:
-            # Keep bins and histogram params with same keys to preserve order
-            histogram_aggregate_params: dict[str, Count] = {}
-            bins: dict[str, tuple[int, int]] = dict()
-
-            # Create query dynamically for getting the histogram
-            step: float = (max_price - min_price) / bin_count
-            for idx in range(0, bin_count):
-                bin_price_start: float = min_price + (idx * step)
-                bin_price_end: float = bin_price_start + step
-                key_val_for_query: str = f"bin_{idx}"
-                bins[key_val_for_query] = (int(bin_price_start), int(bin_price_end))
-                histogram_aggregate_params[key_val_for_query] = Count("pk", filter=Q(
-                    sell_price__gte=bin_price_start) and Q(sell_price__lte=bin_price_end))
-
-            # Get the data
-            histogram: dict[str, int] = filtered_data.aggregate(**histogram_aggregate_params)
-            response = Response(
-                {"bins_range": json.dumps(list(bins.values())), "data": json.dumps(list(histogram.values()))},
-                status=status.HTTP_200_OK)
+                                                                         postal_code=postal_code,
+                                                                         area_level=area_level)
+        return cls.get_histogram_of_bins(filtered_data, bin_count, binning, bin_edges)
+
+    @staticmethod
+    def get_bin_edges(bin_count: int, start_date: datetime, end_date: datetime, postal_code: str, area_level: str,
+                      binning: str) -> Optional[list[int]]:
+        """
+        Gets the bin edges of the period from the min and max prices of the monthly rollups, and from their merged
+        price sketches for quantile bins
+        :param bin_count: Bin count
+        :param start_date: Start date
+        :param end_date: End date, excluded
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :param binning: Binning strategy, other than caller supplied edges
+        :return: Ascending bin edges, None if there is no transaction
+        """
+        filtered_data: QuerySet = ViewCommon.filter_by_area(ViewCommon.get_rollups(area_level).filter(
+            month_year_date__gte=start_date, month_year_date__lt=end_date), postal_code, area_level)
+        if binning != QUANTILE_BINNING:
+            min_max_range: dict = filtered_data.aggregate(max_price=Max("max_sell_price"),
+                                                          min_price=Min("min_sell_price"))
+            if min_max_range[MIN_PRICE_FIELD] is None or min_max_range[MAX_PRICE_FIELD] is None:
+                return None
+            return get_bin_edges(binning, bin_count, min_max_range[MIN_PRICE_FIELD], min_max_range[MAX_PRICE_FIELD])
+
+        sketch: PriceSketch = PriceSketch()
+        min_price: Optional[int] = None
+        max_price: Optional[int] = None
+        for group_min_price, group_max_price, sketch_data in filtered_data.values_list(
+                "min_sell_price", "max_sell_price", "price_sketch").iterator():
+            sketch.merge(sketch_data)
+            min_price = group_min_price if min_price is None else min(min_price, group_min_price)
+            max_price = group_max_price if max_price is None else max(max_price, group_max_price)
+        if min_price is None:
+            return None
+        return get_bin_edges(binning, bin_count, min_price, max_price, sketch)
+
+    @classmethod
+    def get_histogram_of_bins(cls, filtered_data: QuerySet, bin_count: int, binning: str, bin_edges: list[int]) -> \
+            tuple[list[tuple[int, int]], list[int]]:
+        """
+        Calculates the histogram of the bins of the binning strategy with one grouped query
+        :param filtered_data: Query set of the houses to calculate histogram
+        :param bin_count: Bin count
+        :param binning: Binning strategy
+        :param bin_edges: Ascending bin edges, min and max prices for linear bins
+        :return: Bin ranges and transaction counts of each bin
+        """
+        bins, binned_data = cls.annotate_bin_index(filtered_data, bin_count, binning, bin_edges)
+        bin_counts: QuerySet = binned_data.values("bin_index").annotate(transaction_count=Count("pk")).order_by()
+
+        histogram: list[int] = [0] * len(bins)
+        for data in bin_counts:
+            histogram[data["bin_index"]] = data["transaction_count"]
+        return bins, histogram
+
+    @staticmethod
+    def annotate_bin_index(filtered_data: QuerySet, bin_count: int, binning: str, bin_edges: list[int]) -> \
+            tuple[list[tuple[int, int]], QuerySet]:
+        """
+        Assigns each house its bin index in the database. Bins are half-open [start, end), except the last one which
+        also includes the max price. Prices out of caller supplied edges are filtered out.
+        :param filtered_data: Query set of the houses to calculate histogram
+        :param bin_count: Bin count
+        :param binning: Binning strategy
+        :param bin_edges: Ascending bin edges, min and max prices for linear bins
+        :return: Bin ranges, and the houses annotated with bin_index
+        """
+        if binning == LINEAR_BINNING:
+            min_price, max_price = bin_edges[0], bin_edges[-1]
+            # Integer floor division of (price - min) * bin_count / (max - min) gives exact bin index of the price,
+            # only the max price falls out of the range, so it is clamped into the last bin.
+            price_range: int = max(max_price - min_price, 1)
+            # Prices are 32-bit integers, the product with the bin count is calculated with 64-bit integers
+            bin_index = ExpressionWrapper((Cast(F("sell_price"), BigIntegerField()) - Value(min_price)) *
+                                          Value(bin_count) / Value(price_range), output_field=IntegerField())
+            return get_linear_bin_ranges(bin_count, min_price, max_price), filtered_data.annotate(
+                bin_index=Least(bin_index, Value(bin_count - 1)))
+
+        bins: list[tuple[int, int]] = get_bin_ranges_of_edges(bin_edges)
+        # Cases are tested in order, so each price gets the first bin that ends after it
+        bin_index = Case(*[When(sell_price__lt=bin_edge, then=Value(idx))
+                           for idx, bin_edge in enumerate(bin_edges[1:-1])],
+                         default=Value(len(bins) - 1), output_field=IntegerField())
+        return bins, filtered_data.filter(sell_price__gte=bin_edges[0], sell_price__lte=bin_edges[-1]).annotate(
+            bin_index=bin_index)
+
+
+class MonthlyTransactionsView(views.APIView):
+    """
+    Service for getting transaction histograms of each month of a period, with bins shared by all months.
+    It takes start date, end date, postal code and bin count, and the binning strategy of NumberOfTransactionsView.
+    Histograms of all months are counted with one grouped query by month and bin, so charts of a period need a single
+    request.
+    """
+
+    def get(self, request, bin_count: int, start_date: datetime, end_date: datetime, postal_code: str = "",
+            area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
+        # Validate at start
+        if bin_count < 1:
+            return Response({"message": "Bin count parameter should be at least 1."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if end_date < start_date:
+            return Response({"message": "End date should be later than start date."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            binning, bin_edges = ViewCommon.get_binning(request.query_params, bin_count)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        postal_code = ViewCommon.get_area_code(postal_code, area_level)
+        histogram_data: Optional[tuple[list[tuple[int, int]], list[list[int]]]] = get_query_cache().get_or_compute(
+            ("transactions", bin_count, ViewCommon.get_cache_key_date(start_date),
+             ViewCommon.get_cache_key_date(end_date), area_level, postal_code,
+             *ViewCommon.get_binning_key(binning, bin_edges)),
+            lambda: self.get_data_for_histograms(bin_count, start_date, ViewCommon.get_next_month(end_date),
+                                                 postal_code, area_level, binning, bin_edges),
+            scope=get_postal_code_scope(postal_code, area_level))
+
+        return FastJSONResponse(get_monthly_histograms_data(ViewCommon.get_months(start_date, end_date),
+                                                            histogram_data), status=status.HTTP_200_OK)
+
+    @staticmethod
+    def get_data_for_histograms(bin_count: int, start_date: datetime, end_date: datetime, postal_code: str,
+                                area_level: str = POSTAL_CODE_AREA, binning: str = LINEAR_BINNING,
+                                bin_edges: Optional[list[int]] = None) -> \
+            Optional[tuple[list[tuple[int, int]], list[list[int]]]]:
+        """
+        Gets the histograms of the transactions of each month with the bins of the whole period
+        :param bin_count: Bin count
+        :param start_date: Start date
+        :param end_date: End date, excluded
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :param binning: Binning strategy
+        :param bin_edges: Caller supplied bin edges of the edges binning strategy
+        :return: Bin ranges and transaction counts of each bin of each month, None if there is no transaction
+        """
+        columnar_data: Optional[ColumnarHouseData] = ViewCommon.get_columnar_data(area_level)
+        if columnar_data is not None:
+            return columnar_data.get_data_for_histograms(bin_count, start_date, end_date, postal_code, area_level,
+                                                         binning, bin_edges)
+
+        if binning != EDGES_BINNING:
+            bin_edges = NumberOfTransactionsView.get_bin_edges(bin_count, start_date, end_date, postal_code,
+                                                               area_level, binning)
+            if bin_edges is None:
+                return None
+        filtered_data: QuerySet = ViewCommon.get_houses_filtered_by_date(start_date, end_date, postal_code,
+                                                                         area_level)
+        bins, binned_data = NumberOfTransactionsView.annotate_bin_index(filtered_data, bin_count, binning, bin_edges)
+        months: list[datetime] = ViewCommon.get_months(start_date, end_date - timedelta(days=1))
+        # Month index is found with comparisons of the indexed sell date, instead of truncating each date
+        month_index = Case(*[When(sell_date__lt=ViewCommon.get_next_month(month), then=Value(idx))
+                             for idx, month in enumerate(months[:-1])],
+                           default=Value(len(months) - 1), output_field=IntegerField())
+        bin_counts: QuerySet = binned_data.annotate(month_index=month_index).values(
+            "month_index", "bin_index").annotate(transaction_count=Count("pk")).order_by()
+
+        histograms: list[list[int]] = [[0] * len(bins) for _ in months]
+        for data in bin_counts:
+            histograms[data["month_index"]][data["bin_index"]] = data["transaction_count"]
+        return bins, histograms
+
+
+class PriceQuantilesView(views.APIView):
+    """
+    Service for getting the 10th, 50th and 90th percentiles of the sell prices for a given period.
+    Percentiles are estimated from the price sketches of the monthly rollups, sketches of the postal codes are merged
+    for the postal areas and for all postal codes, instead of sorting the prices of the houses.
+    """
+
+    @staticmethod
+    def get_data_for_house_types(start_date: datetime, end_date: datetime, postal_code: str = "",
+                                 area_level: str = POSTAL_CODE_AREA) -> dict[str, list]:
+        """
+        Gets the monthly price quantiles of all house types by merging the sketches of the monthly rollups
+        :param start_date: Start date
+        :param end_date: End date
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :return: Serialized data of each house type, keyed by house type description
+        """
+        filtered_data: QuerySet = ViewCommon.get_rollups(area_level).filter(month_year_date__gte=start_date,
+                                                                            month_year_date__lt=end_date)
+        filtered_data = ViewCommon.filter_by_area(filtered_data, postal_code, area_level)
+        # Sketch and price range of each month and house type
+        merged_groups: dict[tuple[datetime, str], list] = {}
+        for month_year_date, house_type, min_price, max_price, sketch_data in filtered_data.values_list(
+                "month_year_date", "house_type", "min_sell_price", "max_sell_price", "price_sketch").order_by(
+                "month_year_date").iterator():
+            merged_group: Optional[list] = merged_groups.get((month_year_date, house_type))
+            if merged_group is None:
+                merged_groups[(month_year_date, house_type)] = merged_group = [PriceSketch(), min_price, max_price]
+            merged_group[0].merge(sketch_data)
+            merged_group[1] = min(merged_group[1], min_price)
+            merged_group[2] = max(merged_group[2], max_price)
+
+        model_outputs: dict[str, list[PriceQuantilesBusinessModel]] = {house_type: []
+                                                                       for house_type, _ in HOUSE_TYPES}
+        for (month_year_date, house_type), (sketch, min_price, max_price) in merged_groups.items():
+            if house_type in model_outputs:
+                # Estimates are clamped to the exact price range, which can only make them closer to the real prices
+                p10_price, p50_price, p90_price = [min(max(round(sketch.get_quantile(quantile)), min_price), max_price)
+                                                   for quantile in QUANTILES]
+                model_outputs[house_type].append(PriceQuantilesBusinessModel(
+                    month_year_date=month_year_date, transaction_count=sketch.count, p10_sell_price=p10_price,
+                    p50_sell_price=p50_price, p90_sell_price=p90_price))
+        return {house_type_desc: PriceQuantilesBusinessModelSerializer(model_outputs[house_type], many=True).data
+                for house_type, house_type_desc in HOUSE_TYPES}
+
+    def get(self, request, start_date: datetime, end_date: datetime, postal_code: str = "",
+            area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
+        # Validate at start
+        if end_date < start_date:
+            return Response({"message": "End date should be later than start date."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        postal_code = ViewCommon.get_area_code(postal_code, area_level)
+        result_response: dict[str, list] = get_query_cache().get_or_compute(
+            ("quantiles", ViewCommon.get_cache_key_date(start_date), ViewCommon.get_cache_key_date(end_date),
+             area_level, postal_code),
+            lambda: self.get_data_for_house_types(start_date=start_date, end_date=ViewCommon.get_next_month(end_date),
+                                                  postal_code=postal_code, area_level=area_level),
+            scope=get_postal_code_scope(postal_code, area_level))
 
+        return Response(result_response, status=status.HTTP_200_OK)
+
+
+_query_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def run_query(func: Callable[..., Any], *args) -> Any:
+    """
+    Runs a blocking query function on the bounded thread pool of async views, so that slow queries wait on the pool
+    instead of blocking the event loop. Pool size is given by ASYNC_QUERY_WORKERS setting.
+    :param func: Query function
+    :param args: Arguments of the function
+    :return: Result of the function
+    """
+    global _query_executor
+    if _query_executor is None:
+        _query_executor = ThreadPoolExecutor(max_workers=settings.ASYNC_QUERY_WORKERS,
+                                             thread_name_prefix="async-query")
+
+    def run() -> Any:
+        # Pool threads keep their own connections, they are recycled using the connection max age
+        close_old_connections()
+        return func(*args)
+
+    return await sync_to_async(run, thread_sensitive=False, executor=_query_executor)()
+
+
+class AsyncGetAveragePricesView(View):
+    """
+    Async variant of GetAveragePricesView for ASGI servers, averages of each house type are queried concurrently.
+    """
+
+    async def get(self, request, start_date: datetime, end_date: datetime, postal_code: str = "",
+                  area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
+        # Validate at start
+        if end_date < start_date:
+            return JsonResponse({"message": "End date should be later than start date."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        postal_code = ViewCommon.get_area_code(postal_code, area_level)
+        query_cache: QueryCache = get_query_cache()
+        key, result_response = await run_query(query_cache.lookup, (
+            "avgprice", ViewCommon.get_cache_key_date(start_date), ViewCommon.get_cache_key_date(end_date),
+            area_level, postal_code), get_postal_code_scope(postal_code, area_level))
+        if result_response is CACHE_MISS:
+            next_month: datetime = ViewCommon.get_next_month(end_date)
+            if settings.QUERY_ENGINE == COLUMNAR_QUERY_ENGINE:
+                result_response = await run_query(GetAveragePricesView.get_data_for_house_types, start_date,
+                                                  next_month, postal_code, (), area_level)
+            else:
+                house_type_results: list[dict[str, list]] = await asyncio.gather(*[
+                    run_query(GetAveragePricesView.get_data_for_house_types, start_date, next_month, postal_code,
+                              (house_type,), area_level) for house_type, _ in HOUSE_TYPES])
+                result_response = {house_type_desc: house_type_result[house_type_desc]
+                                   for (_, house_type_desc), house_type_result in zip(HOUSE_TYPES, house_type_results)}
+            query_cache.store(key, result_response)
+
+        return FastJSONResponse(result_response, status=status.HTTP_200_OK)
+
+
+class AsyncNumberOfTransactionsView(View):
+    """
+    Async variant of NumberOfTransactionsView for ASGI servers, after the bin edges are found, histograms of
+    each house type are queried concurrently and summed.
+    """
+
+    async def get(self, request, bin_count: int, date: datetime, postal_code: str = "",
+                  area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
+        # Validate at start
+        if bin_count < 1:
+            return JsonResponse({"message": "Bin count parameter should be at least 1."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            binning, bin_edges = ViewCommon.get_binning(request.GET, bin_count)
+        except ValueError as error:
+            return JsonResponse({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        postal_code = ViewCommon.get_area_code(postal_code, area_level)
+        query_cache: QueryCache = get_query_cache()
+        key, histogram_data = await run_query(query_cache.lookup, (
+            "transaction", bin_count, ViewCommon.get_cache_key_date(date), area_level, postal_code,
+            *ViewCommon.get_binning_key(binning, bin_edges)), get_postal_code_scope(postal_code, area_level))
+        if histogram_data is CACHE_MISS:
+            if settings.QUERY_ENGINE == COLUMNAR_QUERY_ENGINE:
+                histogram_data = await run_query(NumberOfTransactionsView.get_data_for_histogram, bin_count, date,
+                                                 postal_code, area_level, binning, bin_edges)
+            else:
+                histogram_data = await self.get_data_for_histogram(bin_count, date, postal_code, area_level, binning,
+                                                                   bin_edges)
+            query_cache.store(key, histogram_data)
+
+        return FastJSONResponse(get_histogram_data(histogram_data), status=status.HTTP_200_OK)
+
+    @staticmethod
+    async def get_data_for_histogram(bin_count: int, date: datetime, postal_code: str,
+                                     area_level: str = POSTAL_CODE_AREA, binning: str = LINEAR_BINNING,
+                                     bin_edges: Optional[list[int]] = None) -> \
+            Optional[tuple[list[tuple[int, int]], list[int]]]:
+        """
+        Gets the histogram of the transactions of the month with concurrent queries
+        :param bin_count: Bin count
+        :param date: Date of the month
+        :param postal_code: Postal code, or the postal area code of the area level, empty string to select all
+        :param area_level: Postal area level of the postal code
+        :param binning: Binning strategy
+        :param bin_edges: Caller supplied bin edges of the edges binning strategy
+        :return: Bin ranges and transaction counts of each bin, None if there is no transaction
+        """
+        if binning != EDGES_BINNING:
+            bin_edges = await run_query(NumberOfTransactionsView.get_bin_edges, bin_count, date,
+                                        ViewCommon.get_next_month(date), postal_code, area_level, binning)
+            if bin_edges is None:
+                return None
+        filtered_data: QuerySet = ViewCommon.get_houses_filtered_by_date(start_date=date,
+                                                                         end_date=ViewCommon.get_next_month(date),
+                                                                         postal_code=postal_code,
+                                                                         area_level=area_level)
+        # Houses of the types out of HOUSE_TYPES are counted in their own part
+        house_type_codes: list[str] = [house_type for house_type, _ in HOUSE_TYPES]
+        partitions: list[QuerySet] = [filtered_data.filter(house_type=house_type) for house_type in house_type_codes]
+        partitions.append(filtered_data.exclude(house_type__in=house_type_codes))
+        partition_results: list[tuple[list[tuple[int, int]], list[int]]] = await asyncio.gather(*[
+            run_query(NumberOfTransactionsView.get_histogram_of_bins, partition, bin_count, binning, bin_edges)
+            for partition in partitions])
+        return partition_results[0][0], [sum(counts) for counts in zip(*[result[1] for result in partition_results])]
+
+
+class BatchQueryView(views.APIView):
+    """
+    Service for running many average price and transaction queries in one request.
+    Queries are answered with a few grouped queries for all postal codes together, instead of separate queries for
+    each of them. Results are given in the order of the queries, in the form of their own services.
+    """
+
+    def post(self, request, *args, **kwargs):
+        batch_serializer: BatchQuerySerializer = BatchQuerySerializer(data=request.data)
+        if not batch_serializer.is_valid():
+            return Response(batch_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        queries: list[dict] = batch_serializer.validated_data["queries"]
+        average_price_queries: list[tuple[int, dict]] = [(idx, query) for idx, query in enumerate(queries)
+                                                         if query["type"] == AVERAGE_PRICE_QUERY]
+        transaction_queries: list[tuple[int, dict]] = [(idx, query) for idx, query in enumerate(queries)
+                                                       if query["type"] == TRANSACTION_QUERY]
+
+        results: dict[int, Any] = {}
+        columnar_data: Optional[ColumnarHouseData] = get_columnar_house_data()
+        if columnar_data is not None:
+            # Columnar engine answers each query in memory, without any database round trip
+            for idx, query in average_price_queries:
+                results[idx] = columnar_data.get_data_for_house_types(
+                    query["start_date"], ViewCommon.get_next_month(query["end_date"]), query["postal_code"])
+            for idx, query in transaction_queries:
+                results[idx] = columnar_data.get_data_for_histogram(query["bin_count"], query["date"],
+                                                                    query["postal_code"])
+        else:
+            results.update(self.get_average_prices(average_price_queries))
+            results.update(self.get_histograms(transaction_queries))
+
+        for idx, _ in transaction_queries:
+            results[idx] = get_histogram_data(results[idx])
+        return FastJSONResponse({"results": [results[idx] for idx in range(0, len(queries))]},
+                                status=status.HTTP_200_OK)
+
+    @staticmethod
+    def get_rollup_groups(queries: list[dict], start_date: datetime, end_date: datetime,
+                          group_fields: tuple[str, ...], **aggregates) -> dict[str, list[dict]]:
+        """
+        Queries the monthly rollups of all postal codes of the queries, with one query for the specific postal codes
+        and one query for all postal codes if any query needs it
+        :param queries: Queries
+        :param start_date: Start date of all queries
+        :param end_date: End date of all queries, excluded
+        :param group_fields: Fields to group the rollups by, besides the postal code
+        :param aggregates: Aggregates of each group
+        :return: Groups of each postal code, all postal codes are keyed with empty string
+        """
+        postal_codes: set[str] = {query["postal_code"] for query in queries}
+        filtered_data: QuerySet = MonthlyRollupPersistenceModel.objects.filter(month_year_date__gte=start_date,
+                                                                               month_year_date__lt=end_date)
+        groups: dict[str, list[dict]] = {postal_code: [] for postal_code in postal_codes}
+        if postal_codes - {""}:
+            groups.update(ViewCommon.group_by_postal_code(filtered_data.filter(
+                postal_code__in=postal_codes - {""}).values("postal_code", *group_fields).annotate(
+                **aggregates).order_by(*group_fields)))
+        if "" in postal_codes:
+            groups[""] = list(filtered_data.values(*group_fields).annotate(**aggregates).order_by(*group_fields))
+        return groups
+
+    @classmethod
+    def get_average_prices(cls, queries: list[tuple[int, dict]]) -> dict[int, dict[str, list]]:
+        """
+        Gets the monthly means of all average price queries
+        :param queries: Indexes and parameters of the queries
+        :return: Serialized data of each query, keyed by query index
+        """
+        if not queries:
+            return {}
+        groups: dict[str, list[dict]] = cls.get_rollup_groups(
+            [query for _, query in queries], min(query["start_date"] for _, query in queries),
+            ViewCommon.get_next_month(max(query["end_date"] for _, query in queries)),
+            ("month_year_date", "house_type"), total_transaction_count=Sum("transaction_count"),
+            total_sell_price=Sum("sum_sell_price"))
+        return {idx: GetAveragePricesView.serialize_monthly_means(
+            group for group in groups[query["postal_code"]]
+            if query["start_date"] <= group["month_year_date"].replace(tzinfo=None) <
+            ViewCommon.get_next_month(query["end_date"])) for idx, query in queries}
+
+    @staticmethod
+    def get_houses_of_months(months: set[datetime]) -> QuerySet:
+        """
+        Filters the houses sold in the months, consecutive months are merged into one range of the indexed sell date
+        :param months: First day of each month
+        :return: Query set of the houses annotated with the month of their sell date
+        """
+        month_ranges: list[list[datetime]] = []
+        for month in sorted(months):
+            if month_ranges and month_ranges[-1][1] == month:
+                month_ranges[-1][1] = ViewCommon.get_next_month(month)
+            else:
+                month_ranges.append([month, ViewCommon.get_next_month(month)])
+        month_filter: Q = Q()
+        for start_date, end_date in month_ranges:
+            month_filter |= Q(sell_date__gte=start_date, sell_date__lt=end_date)
+        return HousePersistenceModel.objects.filter(month_filter).annotate(month_year_date=TruncMonth("sell_date"))
+
+    @classmethod
+    def get_histograms(cls, queries: list[tuple[int, dict]]) -> \
+            dict[int, Optional[tuple[list[tuple[int, int]], list[int]]]]:
+        """
+        Gets the histograms of all transaction queries. Price ranges are read from the monthly rollups, then
+        transaction counts of each price in the requested months are read with one grouped query and assigned to bins.
+        :param queries: Indexes and parameters of the queries
+        :return: Bin ranges and transaction counts of each query, None for queries without transactions
+        """
+        if not queries:
+            return {}
+        start_date: datetime = min(query["date"] for _, query in queries)
+        end_date: datetime = ViewCommon.get_next_month(max(query["date"] for _, query in queries))
+        price_range_groups: dict[str, list[dict]] = cls.get_rollup_groups(
+            [query for _, query in queries], start_date, end_date, ("month_year_date",),
+            min_price=Min("min_sell_price"), max_price=Max("max_sell_price"))
+        price_ranges: dict[tuple[str, datetime], tuple[int, int]] = {
+            (postal_code, group["month_year_date"].replace(tzinfo=None)): (group["min_price"], group["max_price"])
+            for postal_code, groups in price_range_groups.items() for group in groups}
+
+        price_count_groups: dict[str, list[dict]] = {}
+        postal_codes: set[str] = {query["postal_code"] for _, query in queries} - {""}
+        # Only the requested months are read, not all months between the first and the last one
+        postal_code_months: set[datetime] = {query["date"] for _, query in queries if query["postal_code"]}
+        all_postal_code_months: set[datetime] = {query["date"] for _, query in queries if not query["postal_code"]}
+        if postal_codes:
+            price_count_groups.update(ViewCommon.group_by_postal_code(
+                cls.get_houses_of_months(postal_code_months).filter(postal_code__in=postal_codes).values(
+                    "postal_code", "month_year_date", "sell_price").annotate(transaction_count=Count("pk")).order_by()))
+        if all_postal_code_months:
+            price_count_groups[""] = list(cls.get_houses_of_months(all_postal_code_months).values(
+                "month_year_date", "sell_price").annotate(transaction_count=Count("pk")).order_by())
+
+        results: dict[int, Optional[tuple[list[tuple[int, int]], list[int]]]] = {}
+        for idx, query in queries:
+            price_range: Optional[tuple[int, int]] = price_ranges.get((query["postal_code"], query["date"]))
+            if price_range is None:
+                results[idx] = None
+                continue
+            price_counts: list[tuple[int, int]] = [
+                (group["sell_price"], group["transaction_count"])
+                for group in price_count_groups.get(query["postal_code"], [])
+                if group["month_year_date"].replace(tzinfo=None) == query["date"]]
+            results[idx] = (get_linear_bin_ranges(query["bin_count"], *price_range),
+                            get_histogram_of_price_counts(price_counts, query["bin_count"], *price_range))
+        return results
+
+
+def get_export_cursor(sell_date: datetime, house_id: int) -> str:
+    """
+    Gets the keyset cursor of an exported house, exports continue after it
+    :param sell_date: Sell date of the house
+    :param house_id: Id of the house
+    :return: Cursor with the microseconds of the sell date since epoch and the id
+    """
+    return f"{(sell_date - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)) // timedelta(microseconds=1)}_{house_id}"
+
+
+def parse_export_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Parses the keyset cursor of an exported house
+    :param cursor: Cursor given by get_export_cursor
+    :return: Sell date and id of the house
+    """
+    microseconds, house_id = cursor.split("_")
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=int(microseconds)), int(house_id)
+
+
+async def iterate_async(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Iterates the chunks of a streaming response under ASGI, each chunk is read in the thread of the sync views so
+    that server-side cursors stay on their connection, and the response is not consumed into memory at once
+    :param chunks: Chunks
+    :return: Async iterator of the chunks
+    """
+    get_next_chunk: Callable = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk: Optional[bytes] = await get_next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class TransactionsExportView(views.APIView):
+    """
+    Service for exporting the raw transactions of a period as NDJSON or CSV, with the same filters as the other
+    services. Rows are streamed in pages ordered by sell date and id, each page is read with keyset pagination and a
+    server-side cursor, so memory of the export does not depend on the row count. Export can be limited with the
+    limit parameter, then the cursor of the next rows is given in the X-Next-Cursor header, to be passed with the
+    after parameter.
+    """
+
+    def get(self, request, export_format: str, start_date: datetime, end_date: datetime, postal_code: str = "",
+            area_level: str = POSTAL_CODE_AREA, *args, **kwargs):
+        # Validate at start
+        if end_date < start_date:
+            return Response({"message": "End date should be later than start date."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            after: Optional[tuple[datetime, int]] = parse_export_cursor(request.query_params["after"]) \
+                if "after" in request.query_params else None
+            limit: Optional[int] = int(request.query_params["limit"]) if "limit" in request.query_params else None
+        except ValueError:
+            return Response({"message": "Cursor should be given as returned in X-Next-Cursor header, and limit should "
+                                        "be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit is not None and limit < 1:
+            return Response({"message": "Limit parameter should be at least 1."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows are read while the response is streamed after the request, so the database of the request is kept
+        houses: QuerySet = ViewCommon.get_houses_filtered_by_date(
+            start_date, ViewCommon.get_next_month(end_date), ViewCommon.get_area_code(postal_code, area_level),
+            area_level).using(router.db_for_read(HousePersistenceModel))
+        chunks: Iterator[bytes] = self.get_chunks(self.get_rows(houses, after, limit), export_format)
+        response: StreamingHttpResponse = StreamingHttpResponse(
+            iterate_async(chunks) if isinstance(request._request, ASGIRequest) else chunks,
+            content_type=EXPORT_CONTENT_TYPES[export_format], status=status.HTTP_200_OK)
+        response["Content-Disposition"] = f'attachment; filename="transactions.{export_format}"'
+        if limit is not None:
+            next_cursor: Optional[str] = self.get_next_cursor(houses, after, limit)
+            if next_cursor is not None:
+                response["X-Next-Cursor"] = next_cursor
         return response
+
+    @staticmethod
+    def filter_after(houses: QuerySet, after: Optional[tuple[datetime, int]]) -> QuerySet:
+        """
+        Filters the houses after the keyset cursor, in the order of sell date and id
+        :param houses: Query set of houses
+        :param after: Sell date and id of the last exported house, None to start from the beginning
+        :return: Ordered query set of houses
+        """
+        if after is not None:
+            houses = houses.filter(Q(sell_date__gt=after[0]) | Q(sell_date=after[0], id__gt=after[1]))
+        return houses.order_by("sell_date", "id")
+
+    @classmethod
+    def get_next_cursor(cls, houses: QuerySet, after: Optional[tuple[datetime, int]], limit: int) -> Optional[str]:
+        """
+        Gets the cursor of the last exported house when there are more houses after the limit
+        :param houses: Query set of houses
+        :param after: Sell date and id of the last exported house before this export
+        :param limit: Count of exported houses
+        :return: Cursor, None if all houses are exported
+        """
+        keys: list[tuple[datetime, int]] = list(cls.filter_after(houses, after).values_list(
+            "sell_date", "id")[limit - 1:limit + 1])
+        return get_export_cursor(*keys[0]) if len(keys) == 2 else None
+
+    @classmethod
+    def get_rows(cls, houses: QuerySet, after: Optional[tuple[datetime, int]], limit: Optional[int]) -> \
+            Iterator[tuple]:
+        """
+        Reads the houses page by page, each page continues after the last house of the previous one
+        :param houses: Query set of houses
+        :param after: Sell date and id of the last exported house, None to start from the beginning
+        :param limit: Count of houses to read, None to read all
+        :return: Values of the export fields of each house
+        """
+        read_count: int = 0
+        while limit is None or read_count < limit:
+            page_size: int = EXPORT_PAGE_SIZE if limit is None else min(EXPORT_PAGE_SIZE, limit - read_count)
+            page_count: int = 0
+            for row in cls.filter_after(houses, after).values_list(*EXPORT_FIELDS)[:page_size].iterator(
+                    chunk_size=EXPORT_CHUNK_SIZE):
+                page_count = page_count + 1
+                yield row
+            if page_count < page_size:
+                return
+            read_count = read_count + page_count
+            after = (row[EXPORT_SELL_DATE_INDEX], row[0])
+
+    @staticmethod
+    def get_chunks(rows: Iterator[tuple], export_format: str) -> Iterator[bytes]:
+        """
+        Encodes the rows in chunks, so that the response is not written row by row
+        :param rows: Values of the export fields of each house
+        :param export_format: NDJSON or CSV
+        :return: UTF-8 encoded chunks
+        """
+        time_zone: Optional[tzinfo] = timezone.get_current_timezone() if settings.USE_TZ else None
+        buffer: io.StringIO = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == CSV_EXPORT_FORMAT:
+            writer.writerow(EXPORT_FIELDS)
+        chunk_row_count: int = 0
+        for row in rows:
+            values: list = list(row)
+            values[EXPORT_SELL_DATE_INDEX] = format_datetime(values[EXPORT_SELL_DATE_INDEX], time_zone)
+            if export_format == CSV_EXPORT_FORMAT:
+                writer.writerow(values)
+            else:
+                buffer.write(dumps(dict(zip(EXPORT_FIELDS, values))).decode("utf-8"))
+                buffer.write("\n")
+            chunk_row_count = chunk_row_count + 1
+            if chunk_row_count == EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+                chunk_row_count = 0
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+
+class CacheStatsView(views.APIView):
+    """
+    Service for getting the hit/miss statistics of the query cache of the serving process.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_query_cache().stats(), status=status.HTTP_200_OK)
+
+
+class MetricsView(views.APIView):
+    """
+    Service for getting the request, query cache and import metrics of the serving process in Prometheus text format.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(get_metrics_text(), content_type=PROMETHEUS_CONTENT_TYPE)